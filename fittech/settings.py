@@ -23,6 +23,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero: mide también el tiempo y las consultas del resto de middlewares (sesión, autenticación)
+    'gestion.middleware.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,9 +55,13 @@ TEMPLATES = [
 WSGI_APPLICATION = 'fittech.wsgi.application'
 
 # Database - Usando variables de entorno
+# DB_POOL=True usa un pool de conexiones por proceso (recomendado con ASGI);
+# si no, las conexiones persisten DB_CONN_MAX_AGE segundos por hilo (WSGI)
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'gestion.backends.mysql_pool' if DB_POOL else 'django.db.backends.mysql',
         'NAME': config('DB_NAME', default='fittech'),
         'USER': config('DB_USER', default='root'),
         'PASSWORD': config('DB_PASSWORD', default=''),
@@ -65,6 +71,10 @@ DATABASES = {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
             'charset': 'utf8mb4',
         },
+        # Con el pool la conexión se devuelve al final de cada petición
+        'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'POOL_SIZE': config('DB_POOL_SIZE', default=10, cast=int),
     }
 }
 
@@ -103,6 +113,24 @@ LOGOUT_REDIRECT_URL = 'login'
 
 AUTH_USER_MODEL = 'gestion.Usuario'
 
+# Cache: locmem por defecto; CACHE_BACKEND=file o redis para compartirlo entre workers
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+BACKENDS_CACHE = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'fittech'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.path.join(BASE_DIR, 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+CACHES = {
+    'default': {
+        'BACKEND': BACKENDS_CACHE[CACHE_BACKEND][0],
+        'LOCATION': config('CACHE_LOCATION', default=BACKENDS_CACHE[CACHE_BACKEND][1]),
+        'TIMEOUT': 300,
+    }
+}
+
+# Segundos que se guarda el contexto de las vistas cacheadas por rol
+VISTAS_CACHE_TIMEOUT = config('VISTAS_CACHE_TIMEOUT', default=60, cast=int)
+
 # Configuración de Email - Usando variables de entorno
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -114,3 +142,29 @@ DEFAULT_FROM_EMAIL = f'FITTECH <{EMAIL_HOST_USER}>'
 
 # Configuración de notificaciones
 DIAS_AVISO_VENCIMIENTO = 7  # Días antes del vencimiento para enviar notificación
+
+# Alias del cache donde se versiona el catálogo de membresías.
+# Con varios workers debe ser un backend compartido (archivo, memcached, redis)
+CATALOGO_MEMBRESIAS_CACHE = config('CATALOGO_MEMBRESIAS_CACHE', default='default')
+
+# Ocupación estimada: sin registro de salida, cada asistencia cuenta como
+# presente durante OCUPACION_DURACION_SESION minutos
+OCUPACION_DURACION_SESION = config('OCUPACION_DURACION_SESION', default=90, cast=int)
+OCUPACION_RESINCRONIZAR = 60  # Segundos entre recargas del contador en memoria desde la base de datos
+
+# Antigüedad en meses a partir de la cual `archivar_datos` mueve asistencias y
+# pagos resueltos a las tablas de archivo
+ARCHIVO_MESES = config('ARCHIVO_MESES', default=24, cast=int)
+# Meses futuros con partición creada de antemano en asistencias (MySQL); ver
+# `particionar_asistencias`
+ASISTENCIAS_PARTICIONES_FUTURAS = config('ASISTENCIAS_PARTICIONES_FUTURAS', default=3, cast=int)
+
+# Métricas por vista (expuestas en /metrics)
+METRICAS_VENTANA = 500  # Peticiones recientes que se conservan por vista
+METRICAS_MAX_CONSULTAS = config('METRICAS_MAX_CONSULTAS', default=30, cast=int)
+METRICAS_MAX_MS = config('METRICAS_MAX_MS', default=500, cast=int)
+# Querysets de clientes, pagos y asistencias que tardan al menos estos ms se
+# registran con su SQL en el logger 'gestion.consultas' (0 desactiva la medición)
+CONSULTAS_LENTAS_MS = config('CONSULTAS_LENTAS_MS', default=300, cast=int)
+# Token opcional para que Prometheus lea /metrics sin sesión (Authorization: Bearer <token>)
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
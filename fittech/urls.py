@@ -31,10 +31,14 @@ urlpatterns = [
     path('clientes/<str:documento>/eliminar/', controllers.clientes_eliminar, name='clientes_eliminar'),
     path('clientes/<str:documento>/renovar/', controllers.clientes_renovar, name='clientes_renovar'),
     path('clientes/<str:documento>/asistencias/', controllers.cliente_asistencias, name='cliente_asistencias'),
+    path('clientes/<str:documento>/asistencias/estadisticas/', controllers.cliente_asistencias_estadisticas, name='cliente_asistencias_estadisticas'),
+    path('clientes/<str:documento>/perfil.json', controllers.clientes_perfil_json, name='clientes_perfil_json'),
     
     # ============= ASISTENCIAS =============
     path('asistencias/', controllers.asistencias_listar, name='asistencias_listar'),
     path('asistencias/registrar/', controllers.asistencias_registrar, name='asistencias_registrar'),
+    path('asistencias/ocupacion/', controllers.asistencias_ocupacion, name='asistencias_ocupacion'),
+    path('asistencias/ocupacion/actual/', controllers.asistencias_ocupacion_actual, name='asistencias_ocupacion_actual'),
     path('asistencias/exportar/excel/', controllers.asistencias_exportar_excel, name='asistencias_exportar_excel'),
     path('asistencias/exportar/pdf/', controllers.asistencias_exportar_pdf, name='asistencias_exportar_pdf'),
     
@@ -43,6 +47,7 @@ urlpatterns = [
     path('pagos/crear/', controllers.pagos_crear, name='pagos_crear'),
     path('pagos/registrar/<str:documento>/', controllers.pagos_registrar, name='pagos_registrar'),  # ✅ Solo una vez, no duplicar
     path('pagos/reportes/', controllers.pagos_reportes, name='pagos_reportes'),
+    path('pagos/conciliar/', controllers.pagos_conciliar, name='pagos_conciliar'),
     path('pagos/exportar/excel/', controllers.pagos_exportar_excel, name='pagos_exportar_excel'),
     path('pagos/exportar/pdf/', controllers.pagos_exportar_pdf, name='pagos_exportar_pdf'),
     path('pagos/<int:id>/', controllers.pagos_ver, name='pagos_ver'),
@@ -57,6 +62,11 @@ urlpatterns = [
     path('usuarios/<int:id>/editar/', controllers.usuarios_editar, name='usuarios_editar'),
     path('usuarios/<int:id>/eliminar/', controllers.usuarios_eliminar, name='usuarios_eliminar'),
     
+    # ============= SEDES =============
+    path('sedes/', controllers.sedes_listar, name='sedes_listar'),
+    path('sedes/seleccionar/', controllers.sedes_seleccionar, name='sedes_seleccionar'),
+    path('sedes/<int:id>/editar/', controllers.sedes_editar, name='sedes_editar'),
+
     # ============= BONOS =============
     path('bonos/', controllers.bonos_listar, name='bonos_listar'),
     path('bonos/crear/', controllers.bonos_crear, name='bonos_crear'),
@@ -73,6 +83,8 @@ urlpatterns = [
     path('reportes/usuarios/excel/', controllers.reportes_usuarios_excel, name='reportes_usuarios_excel'),
     path('reportes/usuarios/pdf/', controllers.reportes_usuarios_pdf, name='reportes_usuarios_pdf'),
     path('reportes/consolidado/excel/', controllers.reporte_consolidado_excel, name='reporte_consolidado_excel'),
+    path('reportes/cohortes/', controllers.reportes_cohortes, name='reportes_cohortes'),
+    path('reportes/cohortes/excel/', controllers.reportes_cohortes_excel, name='reportes_cohortes_excel'),
     
     # ============= EMAILS =============
     path('emails/panel/', controllers.emails_panel, name='emails_panel'),
@@ -82,4 +94,8 @@ urlpatterns = [
     path('emails/clientes-inactivos/', controllers.emails_clientes_inactivos, name='emails_clientes_inactivos'),
     path('emails/enviar-inactivos/', controllers.enviar_emails_inactivos, name='enviar_emails_inactivos'),
     path('emails/reactivacion/<str:documento>/', controllers.enviar_email_reactivacion_individual, name='enviar_email_reactivacion_individual'),
+    
+    # ============= CACHE =============
+    path('cache/estadisticas/', controllers.cache_estadisticas, name='cache_estadisticas'),
+    path('metrics', controllers.metricas, name='metricas'),
 ]
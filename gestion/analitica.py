@@ -0,0 +1,346 @@
+"""
+Analítica de retención por cohortes y pronóstico de ingresos.
+
+El historial de membresías, los pagos validados y los vencimientos se cargan
+una sola vez en DataFrames; las matrices de retención, el churn, las
+probabilidades de renovación y el pronóstico se calculan con operaciones
+vectorizadas de NumPy/pandas, sin recorrer clientes en Python. Los resultados
+se cachean por día.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.utils import timezone
+
+from .cache import CatalogoMembresias
+from .dao import ArchivoDAO, por_sede
+from .models import Cliente, HistorialMembresia
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# Días después del vencimiento en los que un nuevo periodo todavía cuenta como renovación
+DIAS_GRACIA_RENOVACION = 30
+
+# Horizontes del pronóstico de ingresos, en días
+HORIZONTES_PRONOSTICO = (30, 60, 90)
+
+MESES_ES = ('Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic')
+
+
+def _indice_mes(fechas):
+    """Meses transcurridos desde el año 0 (permite restar meses como enteros)"""
+    fechas = pd.to_datetime(fechas)
+    return (fechas.dt.year * 12 + fechas.dt.month - 1).to_numpy()
+
+
+def _etiqueta_mes(indice):
+    return f'{MESES_ES[indice % 12]} {indice // 12}'
+
+
+def _porcentaje(valor):
+    return None if valor is None or np.isnan(valor) else round(float(valor) * 100, 1)
+
+
+def cargar_historial():
+    """Periodos de membresía de todos los clientes: una sola consulta"""
+    filas = HistorialMembresia.objects.order_by().values_list(
+        'cliente_id', 'membresia_id', 'fecha_inicio', 'fecha_fin'
+    )
+    historial = pd.DataFrame.from_records(
+        list(filas), columns=['cliente_id', 'membresia_id', 'fecha_inicio', 'fecha_fin']
+    )
+    historial['fecha_inicio'] = pd.to_datetime(historial['fecha_inicio'])
+    historial['fecha_fin'] = pd.to_datetime(historial['fecha_fin'])
+    return historial
+
+
+def cargar_pagos():
+    """Pagos validados (cliente, monto), incluidos los archivados: una consulta por tabla"""
+    filas = []
+    for modelo in ArchivoDAO.modelos('pagos'):
+        filas += modelo.objects.filter(estado='validado').order_by().values_list('cliente_id', 'monto')
+    pagos = pd.DataFrame.from_records(filas, columns=['cliente_id', 'monto'])
+    pagos['monto'] = pagos['monto'].astype(float)
+    return pagos
+
+
+def matriz_actividad(codigos, mes_inicio, mes_fin, primer_mes, total_meses, total_clientes):
+    """
+    Matriz booleana clientes x meses: True si algún periodo del cliente cubre
+    algún día del mes. Los periodos se expanden a meses con np.repeat.
+    """
+    desde = np.maximum(mes_inicio, primer_mes) - primer_mes
+    hasta = np.minimum(mes_fin, primer_mes + total_meses - 1) - primer_mes
+    validos = desde <= hasta
+    codigos, desde, hasta = codigos[validos], desde[validos], hasta[validos]
+
+    largos = hasta - desde + 1
+    filas = np.repeat(codigos, largos)
+    # Posición de cada mes dentro de su periodo: 0, 1, 2... reiniciando en cada periodo
+    desplazamiento = np.arange(largos.sum()) - np.repeat(np.cumsum(largos) - largos, largos)
+    columnas = np.repeat(desde, largos) + desplazamiento
+
+    actividad = np.zeros((total_clientes, total_meses), dtype=bool)
+    actividad[filas, columnas] = True
+    return actividad
+
+
+def periodos_cerrados(historial, hoy):
+    """
+    Periodos cuyo resultado ya se conoce, con `renovo` (el cliente inició otro
+    periodo antes de que pasara la gracia del vencimiento) y `numero` (1°, 2°,
+    3° o 4° y siguientes periodos del cliente).
+    """
+    periodos = pd.DataFrame({
+        'cliente_id': historial['cliente_id'].to_numpy(),
+        'membresia_id': historial['membresia_id'].to_numpy(),
+        'inicio': historial['fecha_inicio'].to_numpy(),
+        'fin': historial['fecha_fin'].to_numpy(),
+    }).sort_values(['cliente_id', 'inicio'], kind='stable')
+    siguiente = periodos.groupby('cliente_id')['inicio'].shift(-1)
+    limite = periodos['fin'] + pd.Timedelta(days=DIAS_GRACIA_RENOVACION)
+    periodos['renovo'] = siguiente.notna() & (siguiente <= limite)
+    periodos['numero'] = periodos.groupby('cliente_id').cumcount().clip(upper=3) + 1
+    return periodos[(limite < pd.Timestamp(hoy)) | periodos['renovo']]
+
+
+def calcular_cohortes(historial, pagos, hoy, meses=12):
+    """
+    Cohortes por mes de alta (primer periodo de membresía) de los últimos
+    `meses` meses, con la retención mes a mes, el churn mensual, la
+    probabilidad de renovar cada periodo y el ingreso por cliente de cada cohorte.
+    """
+    mes_actual = hoy.year * 12 + hoy.month - 1
+    primer_mes = mes_actual - meses + 1
+    etiquetas = [_etiqueta_mes(primer_mes + m) for m in range(meses)]
+    resultado = {
+        'generado': hoy.isoformat(),
+        'meses': meses,
+        'etiquetas': etiquetas,
+        'cohortes': [],
+        'churn': [],
+        'renovacion_por_periodo': [],
+        'renovacion_por_membresia': [],
+        'resumen': {'clientes': 0, 'churn_promedio': None, 'probabilidad_renovacion': None},
+    }
+    if historial.empty:
+        return resultado
+
+    codigos, clientes = pd.factorize(historial['cliente_id'])
+    mes_inicio = _indice_mes(historial['fecha_inicio'])
+    mes_fin = _indice_mes(historial['fecha_fin'])
+
+    # Cohorte = mes del primer periodo de cada cliente
+    cohorte = np.full(len(clientes), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(cohorte, codigos, mes_inicio)
+
+    actividad = matriz_actividad(codigos, mes_inicio, mes_fin, primer_mes, meses, len(clientes))
+
+    # Retención: fracción de cada cohorte activa k meses después del alta
+    en_ventana = np.flatnonzero(cohorte >= primer_mes)
+    cohorte_relativa = cohorte[en_ventana] - primer_mes
+    columnas = cohorte_relativa[:, None] + np.arange(meses)[None, :]
+    dentro = columnas < meses
+    activos = actividad[en_ventana[:, None], np.minimum(columnas, meses - 1)] & dentro
+    tamanos = np.bincount(cohorte_relativa, minlength=meses)
+    retenidos = np.zeros((meses, meses))
+    np.add.at(retenidos, cohorte_relativa, activos.astype(np.int64))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        retencion = retenidos / tamanos[:, None]
+
+    # Ingreso validado por cliente de cada cohorte
+    cohorte_por_cliente = pd.Series(cohorte, index=clientes)
+    ingresos = np.zeros(meses)
+    if not pagos.empty:
+        pagos_cohorte = cohorte_por_cliente.reindex(pagos['cliente_id']).to_numpy() - primer_mes
+        validos = (pagos_cohorte >= 0) & (pagos_cohorte < meses)
+        ingresos = np.bincount(
+            pagos_cohorte[validos].astype(np.int64), weights=pagos['monto'].to_numpy()[validos], minlength=meses
+        )
+
+    for c in range(meses):
+        if not tamanos[c]:
+            continue
+        resultado['cohortes'].append({
+            'mes': etiquetas[c],
+            'clientes': int(tamanos[c]),
+            'retencion': [_porcentaje(retencion[c, k]) for k in range(meses - c)],
+            'ingreso_por_cliente': round(float(ingresos[c] / tamanos[c]), 2),
+        })
+
+    # Churn: activos en el mes anterior que no siguen activos en el mes
+    anteriores = actividad[:, :-1]
+    perdidos = (anteriores & ~actividad[:, 1:]).sum(axis=0)
+    base = anteriores.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        tasas = perdidos / base
+    for m in range(1, meses):
+        resultado['churn'].append({
+            'mes': etiquetas[m],
+            'activos_inicio': int(base[m - 1]),
+            'perdidos': int(perdidos[m - 1]),
+            'tasa': _porcentaje(tasas[m - 1]),
+        })
+
+    cerrados = periodos_cerrados(historial, hoy)
+    por_numero = cerrados.groupby('numero')['renovo'].agg(['size', 'mean'])
+    for numero, fila in por_numero.iterrows():
+        resultado['renovacion_por_periodo'].append({
+            'periodo': f'{numero}°' if numero < 4 else '4° o más',
+            'periodos': int(fila['size']),
+            'probabilidad': _porcentaje(fila['mean']),
+        })
+
+    nombres = {m.id: m.nombre for m in CatalogoMembresias.todas()}
+    por_membresia = cerrados.groupby('membresia_id', dropna=False)['renovo'].agg(['size', 'mean']).sort_values('size', ascending=False)
+    for membresia_id, fila in por_membresia.iterrows():
+        resultado['renovacion_por_membresia'].append({
+            'membresia': nombres.get(membresia_id, 'Sin membresía'),
+            'periodos': int(fila['size']),
+            'probabilidad': _porcentaje(fila['mean']),
+        })
+
+    tasas_validas = tasas[~np.isnan(tasas)]
+    resultado['resumen'] = {
+        'clientes': int(len(clientes)),
+        'churn_promedio': _porcentaje(tasas_validas.mean()) if tasas_validas.size else None,
+        'probabilidad_renovacion': _porcentaje(cerrados['renovo'].mean()) if len(cerrados) else None,
+    }
+    return resultado
+
+
+def cargar_vencimientos(sede_id=None):
+    """Membresía y fecha de vencimiento de los clientes activos (de una sede o de todas): una sola consulta"""
+    filas = por_sede(Cliente.objects.filter(
+        estado='activo', fecha_fin_membresia__isnull=False
+    ), sede_id).order_by().values_list('membresia_actual_id', 'fecha_fin_membresia')
+    vencimientos = pd.DataFrame.from_records(list(filas), columns=['membresia_id', 'fecha_fin'])
+    vencimientos['fecha_fin'] = pd.to_datetime(vencimientos['fecha_fin'])
+    return vencimientos
+
+
+def calcular_pronostico(vencimientos, historial, membresias, hoy, horizonte=HORIZONTES_PRONOSTICO[-1]):
+    """
+    Ingreso esperado de los próximos `horizonte` días por renovaciones.
+
+    Cada cliente activo renueva al vencer con la probabilidad histórica de su
+    plan (o la global si el plan no tiene periodos cerrados) y paga el precio
+    actual del plan. Las renovaciones encadenadas dentro del horizonte (un
+    plan mensual puede renovarse varias veces en 90 días) se suman con
+    probabilidad p^k. `membresias` es una lista de instancias de Membresia.
+    """
+    semanas = -(-horizonte // 7)
+    resultado = {
+        'generado': hoy.isoformat(),
+        'horizonte': horizonte,
+        'totales': [{'dias': dias, 'esperado': 0.0, 'potencial': 0.0, 'renovaciones': 0.0}
+                    for dias in HORIZONTES_PRONOSTICO if dias <= horizonte],
+        'semanas': [(hoy + timedelta(days=7 * semana)).strftime('%d/%m') for semana in range(semanas)],
+        'esperado_por_semana': [0.0] * semanas,
+        'potencial_por_semana': [0.0] * semanas,
+        'por_membresia': [],
+    }
+    if vencimientos.empty or not membresias:
+        return resultado
+
+    planes = pd.DataFrame(
+        [(m.id, m.nombre, float(m.precio), m.duracion_dias) for m in membresias],
+        columns=['membresia_id', 'nombre', 'precio', 'duracion'],
+    ).set_index('membresia_id')
+
+    por_plan = pd.Series(dtype=float)
+    probabilidad_global = 0.0
+    if not historial.empty:
+        cerrados = periodos_cerrados(historial, hoy)
+        if len(cerrados):
+            por_plan = cerrados.groupby('membresia_id')['renovo'].mean().astype(float)
+            probabilidad_global = float(cerrados['renovo'].mean())
+    planes['probabilidad'] = por_plan.reindex(planes.index).fillna(probabilidad_global)
+
+    # Solo clientes con un plan conocido que vence dentro del horizonte
+    clientes = vencimientos[vencimientos['membresia_id'].isin(planes.index)]
+    dias = (clientes['fecha_fin'] - pd.Timestamp(hoy)).dt.days.to_numpy()
+    en_horizonte = (dias >= 0) & (dias < horizonte)
+    dias = dias[en_horizonte]
+    codigo_plan = planes.index.get_indexer(clientes['membresia_id'].to_numpy()[en_horizonte])
+
+    precio = planes['precio'].to_numpy()[codigo_plan]
+    duracion = np.maximum(planes['duracion'].to_numpy()[codigo_plan], 1)
+    probabilidad = planes['probabilidad'].to_numpy()[codigo_plan]
+
+    esperado = np.zeros(horizonte)
+    # Potencial: todos los clientes renuevan siempre (p = 1)
+    potencial = np.zeros(horizonte)
+    renovaciones = np.zeros(horizonte)
+    esperado_por_plan = np.zeros(len(planes))
+    renovaciones_por_plan = np.zeros(len(planes))
+
+    # Renovación k-ésima: pago al terminar el periodo k-1, con probabilidad p^k
+    k = 1
+    while True:
+        dia_pago = dias + (k - 1) * duracion
+        dentro = dia_pago < horizonte
+        if not dentro.any():
+            break
+        peso = probabilidad[dentro] ** k
+        esperado += np.bincount(dia_pago[dentro], weights=peso * precio[dentro], minlength=horizonte)
+        potencial += np.bincount(dia_pago[dentro], weights=precio[dentro], minlength=horizonte)
+        renovaciones += np.bincount(dia_pago[dentro], weights=peso, minlength=horizonte)
+        esperado_por_plan += np.bincount(codigo_plan[dentro], weights=peso * precio[dentro], minlength=len(planes))
+        renovaciones_por_plan += np.bincount(codigo_plan[dentro], weights=peso, minlength=len(planes))
+        k += 1
+
+    for total in resultado['totales']:
+        total['esperado'] = round(float(esperado[:total['dias']].sum()), 2)
+        total['potencial'] = round(float(potencial[:total['dias']].sum()), 2)
+        total['renovaciones'] = round(float(renovaciones[:total['dias']].sum()), 1)
+
+    relleno = semanas * 7 - horizonte
+    resultado['esperado_por_semana'] = [
+        round(float(v), 2) for v in np.pad(esperado, (0, relleno)).reshape(semanas, 7).sum(axis=1)
+    ]
+    resultado['potencial_por_semana'] = [
+        round(float(v), 2) for v in np.pad(potencial, (0, relleno)).reshape(semanas, 7).sum(axis=1)
+    ]
+
+    vencen = np.bincount(codigo_plan, minlength=len(planes))
+    for codigo in np.argsort(-esperado_por_plan, kind='stable'):
+        if not vencen[codigo]:
+            continue
+        resultado['por_membresia'].append({
+            'membresia': planes['nombre'].iloc[codigo],
+            'vencen': int(vencen[codigo]),
+            'probabilidad': _porcentaje(planes['probabilidad'].iloc[codigo]),
+            'renovaciones': round(float(renovaciones_por_plan[codigo]), 1),
+            'esperado': round(float(esperado_por_plan[codigo]), 2),
+        })
+    return resultado
+
+
+def reporte_cohortes(meses=12):
+    """Reporte de cohortes del día; se calcula una vez por día y cantidad de meses"""
+    hoy = timezone.localdate()
+    clave = f'analitica:cohortes:{hoy.isoformat()}:{meses}'
+    reporte = cache.get(clave)
+    if reporte is None:
+        reporte = calcular_cohortes(cargar_historial(), cargar_pagos(), hoy, meses)
+        cache.set(clave, reporte, CACHE_TIMEOUT)
+    return reporte
+
+
+def pronostico_ingresos(sede_id=None):
+    """
+    Pronóstico de ingresos del día de una sede (o de la cadena); se calcula una
+    vez por día. Las probabilidades de renovación se aprenden de toda la cadena.
+    """
+    hoy = timezone.localdate()
+    clave = f'analitica:pronostico:{hoy.isoformat()}:{sede_id}'
+    pronostico = cache.get(clave)
+    if pronostico is None:
+        pronostico = calcular_pronostico(
+            cargar_vencimientos(sede_id), cargar_historial(), CatalogoMembresias.todas(), hoy
+        )
+        cache.set(clave, pronostico, CACHE_TIMEOUT)
+    return pronostico
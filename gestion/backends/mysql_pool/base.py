@@ -0,0 +1,78 @@
+"""
+Backend MySQL con pool de conexiones por proceso.
+
+Pensado para el despliegue ASGI, donde CONN_MAX_AGE no sirve: las conexiones se
+abren por hilo y quedan huérfanas. Con este backend Django sigue cerrando la
+conexión al final de cada petición (CONN_MAX_AGE = 0), pero en lugar de cerrarla
+se devuelve al pool y la siguiente petición la reutiliza sin repetir el
+handshake TLS ni la autenticación.
+
+Claves opcionales en DATABASES['default']:
+    POOL_SIZE      conexiones inactivas que se conservan (10)
+    POOL_PING      segundos de inactividad tras los cuales se verifica con ping (30)
+    POOL_RECYCLE   vida máxima de una conexión en segundos (3600)
+"""
+import queue
+import threading
+import time
+
+from django.db.backends.mysql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _pools = {}
+    _pools_lock = threading.Lock()
+    _creada_en = 0
+
+    def _pool(self):
+        with self._pools_lock:
+            pool = self._pools.get(self.alias)
+            if pool is None:
+                pool = queue.LifoQueue(maxsize=self.settings_dict.get('POOL_SIZE', 10))
+                self._pools[self.alias] = pool
+            return pool
+
+    def get_new_connection(self, conn_params):
+        pool = self._pool()
+        ahora = time.monotonic()
+        while True:
+            try:
+                conexion, creada, devuelta = pool.get_nowait()
+            except queue.Empty:
+                conexion = super().get_new_connection(conn_params)
+                self._creada_en = time.monotonic()
+                return conexion
+
+            if ahora - creada > self.settings_dict.get('POOL_RECYCLE', 3600):
+                self._descartar(conexion)
+                continue
+            if ahora - devuelta > self.settings_dict.get('POOL_PING', 30):
+                try:
+                    conexion.ping()
+                except base.Database.Error:
+                    self._descartar(conexion)
+                    continue
+            self._creada_en = creada
+            return conexion
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Dentro de un atomic() Django conserva la referencia; tras un error la
+        # conexión puede estar rota. En ambos casos se cierra de verdad.
+        if self.in_atomic_block or self.errors_occurred:
+            return super()._close()
+        try:
+            # No devolver al pool una transacción a medias
+            if not self.autocommit:
+                self.connection.rollback()
+            self._pool().put_nowait((self.connection, self._creada_en, time.monotonic()))
+        except (queue.Full, base.Database.Error):
+            super()._close()
+
+    @staticmethod
+    def _descartar(conexion):
+        try:
+            conexion.close()
+        except base.Database.Error:
+            pass
@@ -0,0 +1,61 @@
+import numpy as np
+
+# Conteo de bits encendidos por cada valor posible de un byte
+_BITS_POR_BYTE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def activar_bit(bitmap, bit):
+    """Retorna una copia del bitmap con el bit indicado encendido (crece si hace falta)"""
+    datos = bytearray(bitmap or b'')
+    byte, desplazamiento = divmod(bit, 8)
+    if len(datos) <= byte:
+        datos.extend(b'\x00' * (byte + 1 - len(datos)))
+    datos[byte] |= 1 << desplazamiento
+    return bytes(datos)
+
+
+def apagar_bit(bitmap, bit):
+    """Retorna una copia del bitmap con el bit indicado apagado"""
+    datos = bytearray(bitmap or b'')
+    byte, desplazamiento = divmod(bit, 8)
+    if byte < len(datos):
+        datos[byte] &= ~(1 << desplazamiento) & 0xFF
+    return bytes(datos)
+
+
+def construir(bits):
+    """Construye un bitmap con todos los bits indicados encendidos"""
+    bits = np.fromiter(bits, dtype=np.int64)
+    if not bits.size:
+        return b''
+    datos = np.zeros(int(bits.max()) // 8 + 1, dtype=np.uint8)
+    np.bitwise_or.at(datos, bits // 8, (1 << (bits % 8)).astype(np.uint8))
+    return datos.tobytes()
+
+
+def unir(bitmaps):
+    """OR de varios bitmaps de distinta longitud como arreglo de bytes"""
+    arreglos = [np.frombuffer(bytes(b), dtype=np.uint8) for b in bitmaps if b]
+    if not arreglos:
+        return np.zeros(0, dtype=np.uint8)
+    resultado = np.zeros(max(a.size for a in arreglos), dtype=np.uint8)
+    for arreglo in arreglos:
+        resultado[:arreglo.size] |= arreglo
+    return resultado
+
+
+def intersecar(arreglo, mascara):
+    """AND de un arreglo de bytes con un bitmap de máscara"""
+    mascara = np.frombuffer(bytes(mascara), dtype=np.uint8)
+    largo = min(arreglo.size, mascara.size)
+    return arreglo[:largo] & mascara[:largo]
+
+
+def contar(arreglo):
+    """Cantidad de bits encendidos (popcount)"""
+    return int(_BITS_POR_BYTE[arreglo].sum())
+
+
+def bits_encendidos(arreglo):
+    """Posiciones de los bits encendidos"""
+    return np.flatnonzero(np.unpackbits(arreglo, bitorder='little')).tolist()
@@ -0,0 +1,248 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache as cache_default, caches
+from django.core.paginator import Page, Paginator
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models import QuerySet
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+from .models import Membresia
+from .sedes import sede_actual
+
+
+class CatalogoMembresias:
+    """
+    Catálogo de membresías en memoria del proceso.
+
+    La versión vigente se guarda en el cache de Django (alias configurable con
+    CATALOGO_MEMBRESIAS_CACHE) y se consulta una sola vez por petición. Guardar o
+    eliminar una membresía incrementa la versión cuando la transacción confirma, y
+    todos los procesos que compartan ese cache recargan el catálogo en su
+    siguiente petición. Con un cache locmem la invalidación solo alcanza al
+    proceso actual; para varios workers usar un backend compartido (archivo,
+    memcached, redis).
+
+    El catálogo guarda valores planos y entrega instancias nuevas en cada
+    llamada: ninguna vista comparte ni modifica las de otra.
+    """
+
+    CLAVE_VERSION = 'catalogo_membresias:version'
+    CLAVE_DATOS = 'catalogo_membresias:datos:{version}'
+    TIMEOUT = 60 * 60 * 24
+
+    _lock = threading.Lock()
+    _version = None
+    _por_id = {}
+    _ordenadas = []
+    _peticion = threading.local()
+
+    @classmethod
+    def _cache(cls):
+        return caches[getattr(settings, 'CATALOGO_MEMBRESIAS_CACHE', 'default')]
+
+    @classmethod
+    def _version_actual(cls):
+        cache = cls._cache()
+        version = cache.get(cls.CLAVE_VERSION)
+        if version is None:
+            # Si el cache se vació, la versión nueva no debe coincidir con la que
+            # un proceso ya tenga cargada: se parte de la hora en milisegundos
+            cache.add(cls.CLAVE_VERSION, int(time.time() * 1000), None)
+            version = cache.get(cls.CLAVE_VERSION)
+        return version
+
+    @classmethod
+    def _cargar(cls):
+        # Dentro de una petición la versión se verifica solo la primera vez
+        if getattr(cls._peticion, 'verificado', False) and cls._version is not None:
+            return
+
+        version = cls._version_actual()
+        if version != cls._version:
+            with cls._lock:
+                if version != cls._version:
+                    cache = cls._cache()
+                    clave = cls.CLAVE_DATOS.format(version=version)
+                    filas = cache.get(clave)
+                    if filas is None:
+                        filas = list(Membresia.objects.order_by('-fecha_creacion').values(
+                            *[campo.attname for campo in Membresia._meta.concrete_fields]
+                        ))
+                        cache.set(clave, filas, cls.TIMEOUT)
+                    cls._por_id = {fila['id']: fila for fila in filas}
+                    cls._ordenadas = filas
+                    cls._version = version
+
+        cls._peticion.verificado = True
+
+    @staticmethod
+    def _instancia(fila):
+        return Membresia.from_db(Membresia.objects.db, list(fila), list(fila.values()))
+
+    @classmethod
+    def nueva_peticion(cls, **kwargs):
+        cls._peticion.verificado = False
+
+    @classmethod
+    def invalidar(cls):
+        """
+        Nueva versión al confirmar la transacción en curso (de inmediato si no
+        hay una): antes, otra petición podría recargar y guardar el catálogo
+        anterior, o uno con filas que después se deshacen
+        """
+        transaction.on_commit(cls._incrementar_version)
+
+    @classmethod
+    def _incrementar_version(cls):
+        cache = cls._cache()
+        try:
+            cache.incr(cls.CLAVE_VERSION)
+        except ValueError:
+            cache.add(cls.CLAVE_VERSION, int(time.time() * 1000), None)
+        cls._peticion.verificado = False
+
+    @classmethod
+    def obtener(cls, id):
+        """Membresía por id (activa o no). Lanza Membresia.DoesNotExist si no existe"""
+        cls._cargar()
+        try:
+            fila = cls._por_id[int(id)]
+        except (KeyError, TypeError, ValueError):
+            raise Membresia.DoesNotExist(f'No existe la membresía {id}')
+        return cls._instancia(fila)
+
+    @classmethod
+    def activas(cls):
+        """Membresías activas, de la más reciente a la más antigua"""
+        cls._cargar()
+        return [cls._instancia(fila) for fila in cls._ordenadas if fila['activa']]
+
+    @classmethod
+    def todas(cls):
+        cls._cargar()
+        return [cls._instancia(fila) for fila in cls._ordenadas]
+
+
+request_started.connect(CatalogoMembresias.nueva_peticion, dispatch_uid='catalogo_membresias_peticion')
+
+
+# ============= CACHE DE VISTAS =============
+# Se cachea el contexto de la plantilla, no el HTML: el token CSRF, los mensajes
+# y los datos del usuario se siguen generando en cada petición.
+
+PREFIJO_VISTAS = 'vista_cache'
+
+# Modelos de los que depende alguna vista cacheada -> nombres de las vistas
+DEPENDENCIAS_VISTAS = {}
+
+
+def _clave_version(modelo):
+    return f'{PREFIJO_VISTAS}:version:{modelo._meta.label_lower}'
+
+
+def invalidar_vistas(modelo):
+    """Invalida todas las vistas cacheadas que dependen del modelo"""
+    if modelo not in DEPENDENCIAS_VISTAS:
+        return
+    clave = _clave_version(modelo)
+    try:
+        cache_default.incr(clave)
+    except ValueError:
+        cache_default.set(clave, 2, None)
+
+
+def _contar(vista, resultado):
+    clave = f'{PREFIJO_VISTAS}:{resultado}:{vista}'
+    cache_default.add(clave, 0, None)
+    try:
+        cache_default.incr(clave)
+    except ValueError:
+        pass
+
+
+def estadisticas_vistas():
+    """Aciertos y fallos por vista cacheada"""
+    vistas = sorted({v for nombres in DEPENDENCIAS_VISTAS.values() for v in nombres})
+    claves = [f'{PREFIJO_VISTAS}:{r}:{v}' for v in vistas for r in ('aciertos', 'fallos')]
+    valores = cache_default.get_many(claves)
+    resultado = {}
+    for vista in vistas:
+        aciertos = valores.get(f'{PREFIJO_VISTAS}:aciertos:{vista}', 0)
+        fallos = valores.get(f'{PREFIJO_VISTAS}:fallos:{vista}', 0)
+        total = aciertos + fallos
+        resultado[vista] = {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_aciertos': round(aciertos / total, 3) if total else None,
+        }
+    return resultado
+
+
+def _materializar(valor):
+    if isinstance(valor, QuerySet):
+        return list(valor)
+    if isinstance(valor, Page):
+        # El paginador guarda el queryset completo; se conserva solo la página y el total
+        paginador = Paginator([], valor.paginator.per_page)
+        paginador.__dict__['count'] = valor.paginator.count
+        return Page(list(valor.object_list), valor.number, paginador)
+    if isinstance(valor, dict):
+        return {k: _materializar(v) for k, v in valor.items()}
+    return valor
+
+
+def cache_por_rol(dependencias, timeout=None):
+    """
+    Cachea por rol el contexto de una vista que retorna TemplateResponse.
+
+    La clave incluye el rol y la sede del usuario, los parámetros GET, la fecha y la versión
+    de cada modelo en `dependencias`; guardar o eliminar cualquiera de esos
+    modelos invalida la entrada.
+    """
+    def decorador(vista):
+        nombre = vista.__name__
+        for modelo in dependencias:
+            DEPENDENCIAS_VISTAS.setdefault(modelo, set()).add(nombre)
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method != 'GET':
+                return vista(request, *args, **kwargs)
+
+            claves_version = [_clave_version(m) for m in dependencias]
+            versiones = cache_default.get_many(claves_version)
+            rol = 'superusuario' if request.user.is_superuser else getattr(request.user, 'rol', '')
+            partes = '|'.join([
+                rol, str(sede_actual(request)), timezone.localdate().isoformat(), request.GET.urlencode(),
+                *(str(versiones.get(c, 1)) for c in claves_version),
+                *(str(v) for v in args), *(f'{k}={v}' for k, v in sorted(kwargs.items())),
+            ])
+            clave = f'{PREFIJO_VISTAS}:{nombre}:{hashlib.md5(partes.encode()).hexdigest()}'
+
+            guardado = cache_default.get(clave)
+            if guardado is not None:
+                _contar(nombre, 'aciertos')
+                plantilla, contexto = guardado
+                return TemplateResponse(request, plantilla, contexto)
+
+            _contar(nombre, 'fallos')
+            respuesta = vista(request, *args, **kwargs)
+            if isinstance(respuesta, TemplateResponse) and respuesta.status_code == 200:
+                respuesta.context_data = _materializar(respuesta.context_data or {})
+                cache_default.set(
+                    clave,
+                    (respuesta.template_name, respuesta.context_data),
+                    timeout if timeout is not None else getattr(settings, 'VISTAS_CACHE_TIMEOUT', 60),
+                )
+            return respuesta
+
+        return envoltura
+
+    return decorador
+
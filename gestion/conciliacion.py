@@ -0,0 +1,253 @@
+import csv
+import io
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Pago, Cliente
+from .dao import ResumenClienteDAO
+from .cache import invalidar_vistas
+
+# Métodos de pago que llegan con comprobante y aparecen en extractos
+METODOS_CONCILIABLES = ('transferencia', 'nequi', 'daviplata')
+
+# Días de tolerancia entre la fecha del pago y la del movimiento bancario
+VENTANA_DIAS = 3
+
+# Nombres de columna aceptados en los CSV exportados por cada banco/billetera
+COLUMNAS_REFERENCIA = ('referencia', 'comprobante', 'numero_comprobante', 'reference', 'id_transaccion')
+COLUMNAS_MONTO = ('monto', 'valor', 'amount', 'importe')
+COLUMNAS_FECHA = ('fecha', 'fecha_movimiento', 'date')
+
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%d/%m/%Y %H:%M', '%Y-%m-%d %H:%M:%S')
+
+
+def normalizar_referencia(valor):
+    """Normaliza un comprobante para compararlo sin espacios, guiones ni mayúsculas"""
+    if not valor:
+        return ''
+    return ''.join(c for c in str(valor).upper() if c.isalnum())
+
+
+def _parsear_monto(valor):
+    """
+    Convierte el monto de un extracto a Decimal; None si no es un número.
+    Los extractos en pesos usan punto o coma de miles y a veces centavos:
+    - con ambos separadores, el último es el decimal: '1.234,50', '1,234.50'
+    - un separador repetido es de miles: '1.234.567', '1,234,567'
+    - un solo separador con exactamente 3 dígitos después es de miles
+      ('1.234' y '1,234' son 1234); con 1 o 2 dígitos es decimal ('1234,5')
+    """
+    texto = str(valor or '').upper().replace('$', '').replace('COP', '').replace(' ', '').strip()
+    if not texto:
+        return None
+    if ',' in texto and '.' in texto:
+        decimal = ',' if texto.rfind(',') > texto.rfind('.') else '.'
+        miles = '.' if decimal == ',' else ','
+        texto = texto.replace(miles, '').replace(decimal, '.')
+    else:
+        separador = ',' if ',' in texto else '.'
+        partes = texto.split(separador)
+        if len(partes) > 2 or (len(partes) == 2 and len(partes[1]) == 3):
+            texto = ''.join(partes)
+        elif len(partes) == 2:
+            texto = '.'.join(partes)
+    try:
+        monto = Decimal(texto)
+    except InvalidOperation:
+        return None
+    if not monto.is_finite():
+        return None
+    return monto.quantize(Decimal('0.01'))
+
+
+def _parsear_fecha(valor):
+    texto = str(valor or '').strip()
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _buscar_columna(encabezados, candidatos):
+    for candidato in candidatos:
+        if candidato in encabezados:
+            return encabezados[candidato]
+    return None
+
+
+class ConciliacionService:
+    """Concilia extractos de banco/Nequi/Daviplata contra los pagos pendientes"""
+
+    @staticmethod
+    def leer_extracto(archivo):
+        """Lee un CSV de extracto y retorna (movimientos, errores)"""
+        contenido = archivo.read()
+        if isinstance(contenido, bytes):
+            try:
+                contenido = contenido.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                contenido = contenido.decode('latin-1')
+
+        try:
+            dialecto = csv.Sniffer().sniff(contenido[:2048], delimiters=',;\t|')
+        except csv.Error:
+            dialecto = csv.excel
+
+        lector = csv.reader(io.StringIO(contenido), dialecto)
+        filas = iter(lector)
+        try:
+            encabezados_originales = next(filas)
+        except StopIteration:
+            return [], ['El archivo está vacío']
+
+        encabezados = {
+            h.strip().lower().replace(' ', '_'): i for i, h in enumerate(encabezados_originales)
+        }
+        col_referencia = _buscar_columna(encabezados, COLUMNAS_REFERENCIA)
+        col_monto = _buscar_columna(encabezados, COLUMNAS_MONTO)
+        col_fecha = _buscar_columna(encabezados, COLUMNAS_FECHA)
+
+        if col_monto is None or col_fecha is None:
+            return [], ['El archivo debe tener al menos las columnas de monto y fecha']
+
+        movimientos = []
+        errores = []
+        for numero, fila in enumerate(filas, start=2):
+            if not any(celda.strip() for celda in fila):
+                continue
+            try:
+                monto = _parsear_monto(fila[col_monto])
+                fecha = _parsear_fecha(fila[col_fecha])
+                referencia = fila[col_referencia].strip() if col_referencia is not None else ''
+            except IndexError:
+                errores.append(f'Fila {numero}: columnas incompletas')
+                continue
+
+            if monto is None or fecha is None:
+                errores.append(f'Fila {numero}: monto o fecha inválidos')
+                continue
+
+            movimientos.append({
+                'fila': numero,
+                'referencia': referencia,
+                'monto': monto,
+                'fecha': fecha,
+            })
+
+        return movimientos, errores
+
+    @staticmethod
+    def indexar_pendientes():
+        """Carga los pagos pendientes conciliables en mapas hash por comprobante y por (monto, fecha)"""
+        pagos = Pago.objects.filter(
+            estado='pendiente',
+            metodo_pago__in=METODOS_CONCILIABLES
+        ).values(
+            'id', 'comprobante', 'monto', 'metodo_pago', 'fecha_pago',
+            'cliente_id', 'cliente__nombres', 'cliente__apellidos'
+        )
+
+        por_comprobante = defaultdict(list)
+        por_monto_fecha = defaultdict(list)
+
+        for pago in pagos:
+            pago['fecha'] = timezone.localtime(pago['fecha_pago']).date()
+            referencia = normalizar_referencia(pago['comprobante'])
+            if referencia:
+                por_comprobante[referencia].append(pago)
+            por_monto_fecha[(pago['monto'], pago['fecha'])].append(pago)
+
+        return por_comprobante, por_monto_fecha
+
+    @staticmethod
+    def conciliar(movimientos, ventana_dias=VENTANA_DIAS):
+        """Empareja movimientos con pagos pendientes en una sola pasada O(n+m)"""
+        por_comprobante, por_monto_fecha = ConciliacionService.indexar_pendientes()
+        ventana = timedelta(days=ventana_dias)
+        usados = set()
+        coincidencias = []
+        ambiguos = []
+        sin_conciliar = []
+
+        for movimiento in movimientos:
+            pago_encontrado = None
+            criterio = None
+
+            # 1. Por comprobante: el monto debe coincidir y la fecha estar en la ventana
+            referencia = normalizar_referencia(movimiento['referencia'])
+            if referencia:
+                for pago in por_comprobante.get(referencia, ()):
+                    if (pago['id'] not in usados
+                            and pago['monto'] == movimiento['monto']
+                            and abs(pago['fecha'] - movimiento['fecha']) <= ventana):
+                        pago_encontrado = pago
+                        criterio = 'comprobante'
+                        break
+
+            # 2. Por monto y fecha: solo se acepta si hay un único candidato
+            if pago_encontrado is None:
+                candidatos = []
+                for delta in range(-ventana_dias, ventana_dias + 1):
+                    clave = (movimiento['monto'], movimiento['fecha'] + timedelta(days=delta))
+                    candidatos.extend(p for p in por_monto_fecha.get(clave, ()) if p['id'] not in usados)
+
+                if len(candidatos) == 1:
+                    pago_encontrado = candidatos[0]
+                    criterio = 'monto_fecha'
+                elif len(candidatos) > 1:
+                    ambiguos.append({'movimiento': movimiento, 'candidatos': candidatos})
+                    continue
+
+            if pago_encontrado is None:
+                sin_conciliar.append(movimiento)
+                continue
+
+            usados.add(pago_encontrado['id'])
+            coincidencias.append({
+                'movimiento': movimiento,
+                'pago': pago_encontrado,
+                'criterio': criterio,
+            })
+
+        return {
+            'coincidencias': coincidencias,
+            'ambiguos': ambiguos,
+            'sin_conciliar': sin_conciliar,
+        }
+
+    @staticmethod
+    def validar_en_lote(pago_ids, usuario_validacion):
+        """Valida varios pagos pendientes y activa a sus clientes en una sola transacción"""
+        # Ids que no son números (formulario alterado) se ignoran
+        pago_ids = [int(i) for i in pago_ids if str(i).isdigit()]
+        if not pago_ids:
+            return 0
+
+        with transaction.atomic():
+            pendientes = Pago.objects.select_for_update().filter(id__in=pago_ids, estado='pendiente')
+            montos_por_cliente = defaultdict(lambda: [Decimal('0'), 0])
+            for cliente_id, monto in pendientes.values_list('cliente_id', 'monto'):
+                montos_por_cliente[cliente_id][0] += monto
+                montos_por_cliente[cliente_id][1] += 1
+
+            validados = pendientes.update(
+                estado='validado',
+                fecha_validacion=timezone.now(),
+                usuario_validacion=usuario_validacion,
+            )
+            Cliente.objects.filter(pk__in=montos_por_cliente.keys()).update(estado='activo')
+
+            # update() no dispara señales: se actualiza el resumen por cliente
+            for cliente_id, (total, cantidad) in montos_por_cliente.items():
+                ResumenClienteDAO.sumar_pago(cliente_id, total, cantidad)
+
+        invalidar_vistas(Pago)
+        invalidar_vistas(Cliente)
+
+        return validados
@@ -2,16 +2,33 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.conf import settings
 from django.utils import timezone
 from django.db import models
-from django.db.models import Count, Sum
+from django.db.models import Count, F, Sum
 from django.db.models import Q
 from datetime import timedelta, datetime
-from .models import Usuario, Membresia, Cliente, Asistencia, HistorialMembresia, Pago, Bono
-from .dao import UsuarioDAO, MembresiaDAO, ClienteDAO, AsistenciaDAO, PagoDAO
+from .models import Usuario, Membresia, Cliente, Asistencia, HistorialMembresia, Pago, Bono, Sede
+from .dao import (
+    UsuarioDAO, MembresiaDAO, ClienteDAO, AsistenciaDAO, PagoDAO, ResumenClienteDAO, AsistenciaRollupDAO,
+    VisitantesDAO, OcupacionDAO, SedeDAO, ArchivoDAO, parsear_fecha, por_sede,
+)
 from .email_utils import EmailService
+from .conciliacion import ConciliacionService, METODOS_CONCILIABLES
+from .services import PagoService
+from .analitica import pronostico_ingresos, reporte_cohortes
+from .estadisticas import (
+    agrupar_por_sede, asistencias_por_sede, clientes_por_sede, consolidado, estadisticas_clientes,
+    estadisticas_membresias, estadisticas_pagos, estadisticas_por_sede, estadisticas_usuarios, pagos_por_sede,
+    sumar_sedes,
+)
+from .cache import CatalogoMembresias, cache_por_rol, invalidar_vistas, estadisticas_vistas
+from .middleware import registro as registro_metricas
+from .sedes import SESION_SEDE, sede_actual
 import openpyxl
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, Http404
+from django.template.response import TemplateResponse
+from django.core.paginator import Paginator
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
@@ -21,6 +38,8 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 import pandas as pd
 from datetime import date
+import csv
+import hmac
 import pytz
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
@@ -30,21 +49,67 @@ from io import BytesIO
 def actualizar_estados_clientes():
     """Actualiza automáticamente el estado de los clientes según su fecha de vencimiento"""
     from django.utils import timezone
-    hoy = timezone.now().date()
+    hoy = timezone.localdate()
     
-    # Clientes con membresía vencida pero estado activo
-    clientes_vencidos = Cliente.objects.filter(
-        estado='activo',
-        fecha_fin_membresia__lt=hoy
+    # Activos con membresía vencida e inactivos con membresía vigente (renovaciones)
+    ids = list(
+        Cliente.objects.filter(
+            Q(estado='activo', fecha_fin_membresia__lt=hoy) | Q(estado='inactivo', fecha_fin_membresia__gte=hoy)
+        ).order_by().values_list('pk', flat=True)
     )
-    clientes_vencidos.update(estado='inactivo')
+    if not ids:
+        return
     
-    # Clientes con membresía vigente pero estado inactivo (renovaciones)
-    clientes_activos = Cliente.objects.filter(
-        estado='inactivo',
-        fecha_fin_membresia__gte=hoy
-    )
-    clientes_activos.update(estado='activo')
+    Cliente.objects.filter(pk__in=ids).update(estado=models.Case(
+        models.When(fecha_fin_membresia__lt=hoy, then=models.Value('inactivo')),
+        default=models.Value('activo'),
+    ))
+    
+    # update() no dispara señales: el perfil cacheado también lleva el estado
+    ResumenClienteDAO.invalidar(*ids)
+    invalidar_vistas(Cliente)
+
+def obtener_membresia_o_404(id):
+    """Membresía del catálogo en memoria; 404 si el id no existe"""
+    try:
+        return CatalogoMembresias.obtener(id)
+    except Membresia.DoesNotExist:
+        raise Http404('Membresía no encontrada')
+
+def fechas_de_la_peticion(request, *campos):
+    """Fechas YYYY-MM-DD de request.GET (None si faltan) y los campos que llegaron mal formados"""
+    fechas, invalidas = [], []
+    for campo in campos:
+        valor = request.GET.get(campo)
+        fecha = parsear_fecha(valor)
+        if valor and fecha is None:
+            invalidas.append(campo)
+        fechas.append(fecha)
+    return fechas, invalidas
+
+def avisar_fechas_invalidas(request, invalidas):
+    if invalidas:
+        messages.warning(request, f'Fecha inválida ({", ".join(invalidas)}): se ignoró el filtro')
+
+def rechazar_fechas_invalidas(request, invalidas, vista):
+    """Para las descargas: con fechas mal formadas vuelve a `vista` con el error en vez de generar el archivo"""
+    if invalidas:
+        messages.error(request, f'Fecha inválida ({", ".join(invalidas)}): se espera AAAA-MM-DD')
+        return redirect(vista)
+    return None
+
+# ============= PAGINACIÓN =============
+ASISTENCIAS_POR_PAGINA = 50
+CLIENTES_POR_PAGINA_CORREOS = 25
+
+class PaginadorConTotal(Paginator):
+    """Paginador que reutiliza un total ya calculado en vez de lanzar otro COUNT"""
+
+    def __init__(self, object_list, per_page, total=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if total is not None:
+            self.__dict__['count'] = total
+
 # ============= DECORADORES PERSONALIZADOS =============
 def es_administrador(user):
     return user.is_authenticated and user.rol == 'administrador'
@@ -81,59 +146,35 @@ def logout_view(request):
 @login_required
 def dashboard(request):
     actualizar_estados_clientes()
-    # Estadísticas generales
-    total_membresias = Membresia.objects.filter(activa=True).count()
-    total_clientes = Cliente.objects.count()
-    total_usuarios = Usuario.objects.count()
-    asistencias_hoy = AsistenciaDAO.contar_asistencias_dia()
-
-    hoy = timezone.now().date()
+    # Todo el dashboard se restringe a la sede con la que trabaja el usuario
+    sede_id = sede_actual(request)
+    clientes_sede = Cliente.objects.de_sede(sede_id)
+    pagos_sede = Pago.objects.de_sede(sede_id)
 
-    # Clientes por vencer en los próximos 7 días
-    
-    fecha_limite = hoy + timedelta(days=7)
-    clientes_por_vencer = Cliente.objects.filter(
-    fecha_fin_membresia__gte=hoy,
-    fecha_fin_membresia__lte=fecha_limite,
-    estado='activo'
-    )
-
-    # Clientes con membresías vencidas
-    clientes_vencidos = Cliente.objects.filter(
-    estado='inactivo'
-    )
+    # Estadísticas generales
+    total_membresias = len(CatalogoMembresias.activas())
+    total_usuarios = por_sede(Usuario.objects.all(), sede_id).count()
 
+    # Totales, activos, inactivos (membresías vencidas) y por vencer en 7 días: una consulta
+    # agrupada por sede, que también alimenta la comparación entre sedes
+    clientes = clientes_por_sede(sede_id=sede_id)
+    clientes_stats = estadisticas_clientes(por_sede=clientes)
     
-    pagos_pendientes = Pago.objects.filter(estado='pendiente').count()
-    
-    # CORRECCIÓN DEFINITIVA - Usar rangos de datetime
-    ahora = timezone.now()
+    # Rangos de datetime desde la medianoche local, como los rollups y estadisticas
+    ahora = timezone.localtime()
     inicio_dia = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
     fin_dia = ahora.replace(hour=23, minute=59, second=59, microsecond=999999)
     inicio_mes = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     hoy_date = ahora.date()
     
-    # Ingresos de hoy usando rangos de datetime
-    ingresos_hoy = Pago.objects.filter(
-        fecha_pago__gte=inicio_dia,
-        fecha_pago__lte=fin_dia,
-        estado='validado'
-    ).aggregate(Sum('monto'))['monto__sum'] or 0
-    
-    # Ingresos del mes usando rangos de datetime
-    ingresos_mes_actual = Pago.objects.filter(
-        fecha_pago__gte=inicio_mes,
-        fecha_pago__lte=ahora,
-        estado='validado'
-    ).aggregate(Sum('monto'))['monto__sum'] or 0
-    
-    # Clientes activos vs inactivos
-    clientes_activos = Cliente.objects.filter(estado='activo').count()
-    clientes_inactivos = Cliente.objects.filter(estado='inactivo').count()
-    
-    # Ingresos de los últimos 6 meses
+    # Límites de los últimos 6 meses
+    meses_es = {
+        1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
+        5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
+        9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
+    }
     meses_labels = []
-    meses_ingresos = []
+    meses_rangos = []
     
     for i in range(5, -1, -1):
         fecha = hoy_date - timedelta(days=30*i)
@@ -146,63 +187,84 @@ def dashboard(request):
             fin_mes_iter = siguiente_mes - timedelta(days=siguiente_mes.day)
         
         # Convertir a datetime para la consulta
-        inicio_dt = timezone.make_aware(datetime.combine(inicio_mes_iter, datetime.min.time()))
-        fin_dt = timezone.make_aware(datetime.combine(fin_mes_iter, datetime.max.time()))
-        
-        ingresos_mes = Pago.objects.filter(
-            fecha_pago__gte=inicio_dt,
-            fecha_pago__lte=fin_dt,
-            estado='validado'
-        ).aggregate(Sum('monto'))['monto__sum'] or 0
-        
-        meses_es = {
-            1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
-            5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
-            9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
-        }
-        mes_nombre = meses_es[fecha.month]
-        
-        meses_labels.append(f"{mes_nombre} {fecha.year}")
-        meses_ingresos.append(float(ingresos_mes))
+        meses_rangos.append((
+            timezone.make_aware(datetime.combine(inicio_mes_iter, datetime.min.time())),
+            timezone.make_aware(datetime.combine(fin_mes_iter, datetime.max.time())),
+        ))
+        meses_labels.append(f"{meses_es[fecha.month]} {fecha.year}")
+    
+    # Pendientes, ingresos de hoy, del mes y de cada uno de los 6 meses en una sola
+    # consulta por sede, sobre los pagos pendientes y los del periodo
+    validado = Q(estado='validado')
+    agregados = {
+        'estado_pendiente_total': Count('id', filter=Q(estado='pendiente')),
+        'ingresos_hoy': Sum('monto', filter=validado & Q(fecha_pago__gte=inicio_dia, fecha_pago__lte=fin_dia)),
+        'ingresos_mes': Sum('monto', filter=validado & Q(fecha_pago__gte=inicio_mes, fecha_pago__lte=ahora)),
+    }
+    for indice, (inicio_dt, fin_dt) in enumerate(meses_rangos):
+        agregados[f'mes_{indice}'] = Sum('monto', filter=validado & Q(fecha_pago__gte=inicio_dt, fecha_pago__lte=fin_dt))
+    desde = min(inicio_dia, meses_rangos[0][0])
+    pagos = agrupar_por_sede(pagos_sede.filter(Q(estado='pendiente') | Q(fecha_pago__gte=desde)), None, agregados)
+    pagos_stats = sumar_sedes(pagos, agregados)
     
-    # Asistencias de los últimos 7 días
+    meses_ingresos = [float(pagos_stats[f'mes_{indice}'] or 0) for indice in range(len(meses_rangos))]
+    
+    # Asistencias de los últimos 7 días; la misma consulta cubre el mes para la comparación entre sedes
     dias_labels = []
     dias_asistencias = []
     
+    totales_asistencias = AsistenciaRollupDAO.totales_por_dia_y_sede(
+        min(hoy_date - timedelta(days=6), hoy_date.replace(day=1)), hoy_date, sede_id
+    )
+    asistencias_por_dia = {}
+    for (fecha, _), total in totales_asistencias.items():
+        asistencias_por_dia[fecha] = asistencias_por_dia.get(fecha, 0) + total
+    # Las de hoy ya vienen en la serie (contadas sobre las filas del día)
+    asistencias_hoy = asistencias_por_dia.get(hoy_date, 0)
     for i in range(6, -1, -1):
         fecha = hoy_date - timedelta(days=i)
-        asistencias_dia = Asistencia.objects.filter(fecha=fecha).count()
         dias_labels.append(fecha.strftime('%d/%m'))
-        dias_asistencias.append(asistencias_dia)
+        dias_asistencias.append(asistencias_por_dia.get(fecha, 0))
     
     # Distribución de clientes por membresía
-    membresias_distribucion = Cliente.objects.filter(estado='activo').values('membresia_actual__nombre').annotate(total=Count('documento')).order_by('-total')
+    membresias_distribucion = clientes_sede.activos().values('membresia_actual__nombre').annotate(total=Count('documento')).order_by('-total')
     membresias_labels = [item['membresia_actual__nombre'] or 'Sin membresía' for item in membresias_distribucion]
     membresias_valores = [item['total'] for item in membresias_distribucion]
     
     # Pagos por método de pago (últimos 30 días)
     fecha_hace_30 = ahora - timedelta(days=30)
-    pagos_por_metodo = Pago.objects.filter(
+    pagos_por_metodo = pagos_sede.validados().filter(
         fecha_pago__gte=fecha_hace_30,
         fecha_pago__lte=ahora,
-        estado='validado'
     ).values('metodo_pago').annotate(total=Count('id'), monto_total=Sum('monto')).order_by('-monto_total')
     
     metodos_labels = [dict(Pago.METODOS_PAGO).get(item['metodo_pago'], item['metodo_pago']) for item in pagos_por_metodo]
     metodos_valores = [float(item['monto_total']) for item in pagos_por_metodo]
+
+    # Pronóstico de ingresos por renovaciones (calculado una vez por día)
+    pronostico = pronostico_ingresos(sede_id)
+
+    # Sin sede elegida: comparación entre sedes (todas) y selector (las activas)
+    todas = list(SedeDAO.obtener_todas()) if request.user.sede_id is None else []
+    sedes = [sede for sede in todas if sede.activa]
+    por_sedes = []
+    if sede_id is None and len(sedes) > 1:
+        por_sedes = estadisticas_por_sede(
+            clientes, pagos, asistencias_por_sede(totales=totales_asistencias), todas
+        )
     
     context = {
         'total_membresias': total_membresias,
-        'total_clientes': total_clientes,
+        'total_clientes': clientes_stats['total_clientes'],
         'total_usuarios': total_usuarios,
         'asistencias_hoy': asistencias_hoy,
-        'clientes_por_vencer': clientes_por_vencer,
-        'clientes_vencidos': clientes_vencidos,
-        'pagos_pendientes': pagos_pendientes,
-        'ingresos_hoy': float(ingresos_hoy),
-        'clientes_activos': clientes_activos,
-        'clientes_inactivos': clientes_inactivos,
-        'ingresos_mes_actual': float(ingresos_mes_actual),
+        'clientes_por_vencer': clientes_stats['clientes_por_vencer'],
+        'clientes_vencidos': clientes_stats['clientes_inactivos'],
+        'pagos_pendientes': pagos_stats['estado_pendiente_total'],
+        'ingresos_hoy': float(pagos_stats['ingresos_hoy'] or 0),
+        'clientes_activos': clientes_stats['clientes_activos'],
+        'clientes_inactivos': clientes_stats['clientes_inactivos'],
+        'ingresos_mes_actual': float(pagos_stats['ingresos_mes'] or 0),
         'usuario': request.user,
         
         # Datos para gráficas
@@ -214,15 +276,23 @@ def dashboard(request):
         'membresias_valores': membresias_valores,
         'metodos_labels': metodos_labels,
         'metodos_valores': metodos_valores,
+        'pronostico': pronostico,
+        'pronostico_semanas': pronostico['semanas'],
+        'pronostico_esperado': pronostico['esperado_por_semana'],
+        'pronostico_potencial': pronostico['potencial_por_semana'],
+        'sede_id': sede_id,
+        'sedes': sedes,
+        'por_sedes': por_sedes,
     }
     return render(request, 'dashboard.html', context)
 
 # ============= MEMBRESÍAS =============
 @login_required
 @user_passes_test(es_administrador)
+@cache_por_rol(dependencias=(Membresia,))
 def membresias_listar(request):
     membresias = MembresiaDAO.obtener_todas()
-    return render(request, 'membresias/listar.html', {'membresias': membresias})
+    return TemplateResponse(request, 'membresias/listar.html', {'membresias': membresias})
 
 @login_required
 @user_passes_test(es_administrador)
@@ -277,7 +347,7 @@ def membresias_eliminar(request, id):
 @login_required
 @user_passes_test(es_administrador)
 def membresias_ver(request, id):
-    membresia = get_object_or_404(Membresia, id=id)
+    membresia = obtener_membresia_o_404(id)
     return render(request, 'membresias/ver.html', {'membresia': membresia})
 
 # ============= CLIENTES CON FILTRO DE BÚSQUEDA Y BONOS =============
@@ -287,37 +357,25 @@ def clientes_listar(request):
     estado_filtro = request.GET.get('estado', 'todos')
     
     # Base queryset
-    clientes = Cliente.objects.all()
+    clientes = ClienteDAO.lista(Cliente.objects.de_sede(sede_actual(request)))
     
     # Filtro de búsqueda por texto
     if busqueda:
-        clientes = clientes.filter(
-            Q(documento__icontains=busqueda) |
-            Q(nombres__icontains=busqueda) |
-            Q(apellidos__icontains=busqueda) |
-            Q(email__icontains=busqueda) |
-            Q(celular__icontains=busqueda)
-        )
+        clientes = clientes.buscar(busqueda)
     
     # Filtro por estado
     if estado_filtro == 'activo':
-        clientes = clientes.filter(estado='activo')
+        clientes = clientes.activos()
     elif estado_filtro == 'inactivo':
-        clientes = clientes.filter(estado='inactivo')
+        clientes = clientes.inactivos()
     elif estado_filtro == 'pendiente':
-        clientes = clientes.filter(estado='pendiente')
+        clientes = clientes.pendientes()
     elif estado_filtro == 'por_vencer':
         # Clientes activos cuya membresía vence en los próximos 7 días
-        hoy = datetime.now().date()
-        fecha_limite = hoy + timedelta(days=7)
-        clientes = clientes.filter(
-            estado='activo',
-            fecha_fin_membresia__gte=hoy,
-            fecha_fin_membresia__lte=fecha_limite
-        )
+        clientes = clientes.por_vencer(7)
     
-    # Ordenar por fecha de vencimiento
-    clientes = clientes.order_by('fecha_fin_membresia')
+    # Ordenar por días para vencer (anotados en SQL); sin fecha de fin al final
+    clientes = clientes.order_by(F('dias_restantes').asc(nulls_last=True))
     
     return render(request, 'clientes/listar.html', {
         'clientes': clientes,
@@ -346,7 +404,7 @@ def clientes_crear(request):
                     return render(request, 'clientes/crear.html', {'membresias': membresias})
             
             # Obtener membresía
-            membresia = get_object_or_404(Membresia, id=request.POST.get('membresia'))
+            membresia = obtener_membresia_o_404(request.POST.get('membresia'))
             fecha_inicio = timezone.now().date()
             fecha_fin = fecha_inicio + timedelta(days=membresia.duracion_dias)
             
@@ -379,6 +437,7 @@ def clientes_crear(request):
                 'fecha_inicio_membresia': fecha_inicio,
                 'fecha_fin_membresia': fecha_fin,
                 'estado': estado_cliente,
+                'sede_id': sede_actual(request) or SedeDAO.predeterminada(),
             }
             cliente = ClienteDAO.crear(datos)
             
@@ -413,6 +472,7 @@ def clientes_crear(request):
                     'observaciones': observaciones,
                     'usuario_registro': request.user,
                     'estado': 'pendiente',
+                    'sede_id': cliente.sede_id,
                 }
                 PagoDAO.crear(datos_pago)
                 # Cliente queda en estado 'pendiente' (esperando validación del pago)
@@ -490,11 +550,21 @@ def clientes_eliminar(request, documento):
 
 @login_required
 def clientes_ver(request, documento):
-    cliente = get_object_or_404(Cliente, documento=documento)
-    historial = HistorialMembresia.objects.filter(cliente=cliente)
-    pagos = PagoDAO.obtener_por_cliente(cliente)
-    bonos = Bono.objects.filter(cliente=cliente).order_by('-fecha_otorgado')
-    return render(request, 'clientes/ver.html', {'cliente': cliente, 'historial': historial, 'pagos': pagos, 'bonos': bonos})
+    cliente = get_object_or_404(Cliente.objects.select_related('membresia_actual'), documento=documento)
+    context = {
+        'cliente': cliente,
+        'resumen': ResumenClienteDAO.obtener(cliente),
+        'historial': ResumenClienteDAO.historial_reciente(cliente),
+        'pagos': ResumenClienteDAO.pagos_recientes(cliente),
+        'bonos': ResumenClienteDAO.bonos_recientes(cliente),
+    }
+    return render(request, 'clientes/ver.html', context)
+
+@login_required
+def clientes_perfil_json(request, documento):
+    """Perfil resumido del cliente en JSON (cacheado hasta la siguiente escritura)"""
+    cliente = get_object_or_404(Cliente.objects.select_related('membresia_actual'), documento=documento)
+    return HttpResponse(ResumenClienteDAO.obtener_perfil_json(cliente), content_type='application/json')
 
 @login_required
 def clientes_renovar(request, documento):
@@ -502,7 +572,7 @@ def clientes_renovar(request, documento):
     
     if request.method == 'POST':
         try:
-            membresia = get_object_or_404(Membresia, id=request.POST.get('membresia'))
+            membresia = obtener_membresia_o_404(request.POST.get('membresia'))
             cliente.renovar_membresia(membresia)
             
             # AGREGAR BONO SI SE SELECCIONÓ (máximo 3 días)
@@ -562,10 +632,11 @@ def clientes_importar_excel(request):
         try:
             df = pd.read_excel(archivo)
             count = 0
+            sede_id = sede_actual(request) or SedeDAO.predeterminada()
             
             for index, row in df.iterrows():
                 try:
-                    membresia = Membresia.objects.get(id=int(row['membresia_id']))
+                    membresia = CatalogoMembresias.obtener(row['membresia_id'])
                     fecha_inicio = timezone.now().date()
                     fecha_fin = fecha_inicio + timedelta(days=membresia.duracion_dias)
                     
@@ -580,7 +651,8 @@ def clientes_importar_excel(request):
                         membresia_actual=membresia,
                         fecha_inicio_membresia=fecha_inicio,
                         fecha_fin_membresia=fecha_fin,
-                        estado='activo'
+                        estado='activo',
+                        sede_id=sede_id,
                     )
                     
                     HistorialMembresia.objects.create(
@@ -629,15 +701,27 @@ def asistencias_listar(request):
     else:
         anio = int(anio)
     
-    # Filtrar asistencias por mes y año
-    asistencias = Asistencia.objects.filter(
-        fecha__year=anio,
-        fecha__month=mes
-    ).select_related('cliente', 'usuario_registro').order_by('-fecha')
-    
-    # Calcular estadísticas
-    total_asistencias = asistencias.count()
-    clientes_unicos = asistencias.values('cliente').distinct().count()
+    # Rango semiabierto [inicio, inicio del mes siguiente) sobre fecha: usa el índice
+    # (y en MySQL, solo la partición del mes). Los meses archivados se leen del archivo
+    sede_id = sede_actual(request)
+    inicio_mes = date(anio, mes, 1)
+    siguiente_mes = (inicio_mes + timedelta(days=32)).replace(day=1)
+    fin_mes = siguiente_mes - timedelta(days=1)
+    asistencias = ArchivoDAO.consulta(
+        'asistencias',
+        lambda asistencias: AsistenciaDAO.lista(por_sede(asistencias.filter(
+            fecha__gte=inicio_mes, fecha__lt=siguiente_mes
+        ), sede_id)),
+        inicio_mes, fin_mes,
+    ).order_by('-fecha', '-hora')
+    
+    # Totales desde los rollups (sin recorrer las filas del mes); el paginador
+    # reutiliza el total en vez de lanzar otro COUNT
+    total_asistencias = AsistenciaRollupDAO.contar_rango(inicio_mes, fin_mes, sede_id)
+    # Con sede, los visitantes únicos son los que entraron a ella, desde los bitmaps de la sede
+    clientes_unicos = VisitantesDAO.contar_unicos(inicio_mes, fin_mes, sede_id=sede_id)
+    paginador = PaginadorConTotal(asistencias, ASISTENCIAS_POR_PAGINA, total=total_asistencias)
+    pagina = paginador.get_page(request.GET.get('pagina'))
     
     # Obtener nombre del mes
     meses_nombres = {
@@ -648,7 +732,8 @@ def asistencias_listar(request):
     mes_nombre = meses_nombres.get(mes, 'Mes')
     
     context = {
-        'asistencias': asistencias,
+        'asistencias': pagina,
+        'pagina': pagina,
         'anios_disponibles': anios_disponibles,  # Como lo espera el template
         'mes': mes,
         'anio': anio,  # Sin tilde
@@ -676,7 +761,10 @@ def asistencias_registrar(request):
                 return JsonResponse({'success': False, 'message': 'Membresía vencida'})
             
             # ✅ VALIDACIÓN: No permitir registro antes de 20 minutos
-            ultima_asistencia = Asistencia.objects.filter(cliente=cliente).order_by('-fecha', '-hora').first()
+            # Solo importan las de ayer y hoy: con la tabla particionada se leen dos particiones
+            ultima_asistencia = Asistencia.objects.filter(
+                cliente=cliente, fecha__gte=timezone.localdate() - timedelta(days=1)
+            ).order_by('-fecha', '-hora').first()
             
             if ultima_asistencia:
                 # Combinar fecha y hora de la última asistencia
@@ -694,10 +782,7 @@ def asistencias_registrar(request):
                     })
             
             # Registrar asistencia
-            asistencia = Asistencia.objects.create(
-                cliente=cliente,
-                usuario_registro=request.user
-            )
+            asistencia = AsistenciaDAO.crear(cliente, request.user, sede_actual(request))
             
             return JsonResponse({
                 'success': True,
@@ -714,15 +799,9 @@ def asistencias_registrar(request):
     fecha_hoy = date.today()
     
     # Filtrar SOLO asistencias de HOY
-    asistencias_hoy = Asistencia.objects.filter(
+    asistencias_hoy = por_sede(Asistencia.objects.filter(
         fecha=fecha_hoy
-    ).select_related('cliente').order_by('-hora')
-    
-    # DEBUG: Imprimir en consola para verificar
-    print(f"Fecha de hoy: {fecha_hoy}")
-    print(f"Total asistencias de hoy: {asistencias_hoy.count()}")
-    for a in asistencias_hoy:
-        print(f"  - {a.cliente.nombres}: {a.fecha} {a.hora}")
+    ), sede_actual(request)).select_related('cliente').order_by('-hora')
     
     context = {
         'asistencias_hoy': asistencias_hoy,
@@ -730,6 +809,37 @@ def asistencias_registrar(request):
     
     return render(request, 'asistencias/registrar.html', context)
 
+@login_required
+def asistencias_ocupacion(request):
+    """Ocupación estimada: ahora, por hora de hoy y la típica del mismo día de la semana"""
+    ahora = timezone.localtime()
+    hoy = ahora.date()
+    sede_id = sede_actual(request)
+    promedios, maximos = OcupacionDAO.por_hora(hoy, sede_id)
+    tipica = OcupacionDAO.tipica_por_hora(hoy.weekday(), sede_id=sede_id)
+
+    # Hoy solo hasta la hora en curso; la típica para todo el día
+    horas = list(range(24))
+    context = {
+        'ocupacion_actual': OcupacionDAO.actual(sede_id),
+        'duracion_sesion': settings.OCUPACION_DURACION_SESION,
+        'maxima_hoy': max(maximos[:ahora.hour + 1]),
+        'horas_labels': [f'{hora:02d}:00' for hora in horas],
+        'hoy_promedio': promedios[:ahora.hour + 1],
+        'hoy_maxima': maximos[:ahora.hour + 1],
+        'tipica_promedio': [tipica.get(hora, 0) for hora in horas],
+        'dia_semana': ('Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo')[hoy.weekday()],
+    }
+    return render(request, 'asistencias/ocupacion.html', context)
+
+@login_required
+def asistencias_ocupacion_actual(request):
+    """Ocupación actual en JSON para refrescar la página sin recargarla"""
+    return JsonResponse({
+        'ocupacion': OcupacionDAO.actual(sede_actual(request)),
+        'hora': timezone.localtime().strftime('%H:%M'),
+    })
+
 @login_required
 def asistencias_exportar_excel(request):
     fecha = request.GET.get('fecha', timezone.now().date())
@@ -789,13 +899,14 @@ def asistencias_exportar_pdf(request):
 @login_required
 def pagos_listar(request):
     filtro = request.GET.get('filtro', 'todos')
+    sede_id = sede_actual(request)
     
     if filtro == 'pendientes':
-        pagos = PagoDAO.obtener_pendientes()
+        pagos = PagoDAO.obtener_pendientes(sede_id)
     elif filtro == 'validados':
-        pagos = PagoDAO.obtener_validados()
+        pagos = PagoDAO.obtener_validados(sede_id)
     else:
-        pagos = PagoDAO.obtener_todos()
+        pagos = PagoDAO.obtener_todos(sede_id)
     
     return render(request, 'pagos/listar.html', {'pagos': pagos, 'filtro': filtro})
 
@@ -826,35 +937,18 @@ def pagos_crear(request):
             if not concepto:
                 concepto = f'Pago de membresía {membresia.nombre}'
             
-            # Crear el pago PRIMERO
-            datos = {
-                'cliente': cliente,
-                'membresia': membresia,
-                'concepto': concepto,
-                'tipo_pago': tipo_pago,
-                'monto': float(monto),
-                'metodo_pago': metodo_pago,
-                'comprobante': comprobante,
-                'observaciones': observaciones,
-                'usuario_registro': request.user,
-                'estado': 'pendiente',
-            }
-            
-            PagoDAO.crear(datos)
-            
-            # Actualizar fechas de membresía SI el pago es de tipo membresía
-            if tipo_pago == 'membresia':
-                if cliente.fecha_fin_membresia and cliente.fecha_fin_membresia > timezone.now().date():
-                    # Si tiene membresía activa, sumar días
-                    cliente.fecha_fin_membresia += timedelta(days=membresia.duracion_dias)
-                else:
-                    # Si no tiene o está vencida, iniciar desde hoy
-                    cliente.fecha_inicio_membresia = timezone.now().date()
-                    cliente.fecha_fin_membresia = timezone.now().date() + timedelta(days=membresia.duracion_dias)
-            
-            # IMPORTANTE: Cambiar estado del cliente a PENDIENTE
-            cliente.estado = 'pendiente'
-            cliente.save()
+            PagoService.registrar(
+                cliente=cliente,
+                membresia=membresia,
+                metodo_pago=metodo_pago,
+                usuario=request.user,
+                monto=monto,
+                concepto=concepto,
+                tipo_pago=tipo_pago,
+                comprobante=comprobante,
+                observaciones=observaciones,
+                sede_id=sede_actual(request),
+            )
             
             messages.success(request, f'✓ Pago registrado exitosamente para {cliente.nombres} {cliente.apellidos}. Pendiente de validación.')
             return redirect('pagos_listar')
@@ -928,32 +1022,19 @@ def pagos_registrar(request, documento):
             referencia = request.POST.get('referencia', '')
             observaciones = request.POST.get('observaciones', '')
 
-            membresia = get_object_or_404(Membresia, id=membresia_id)
-
-            datos = {
-                'cliente': cliente,
-                'membresia': membresia,
-                'concepto': concepto,
-                'tipo_pago': 'membresia',
-                'monto': float(monto),
-                'metodo_pago': metodo_pago,
-                'comprobante': referencia,
-                'observaciones': observaciones,
-                'usuario_registro': request.user,
-                'estado': 'pendiente',  # SIEMPRE EN minúscula
-            }
-
-            PagoDAO.crear(datos)
+            membresia = obtener_membresia_o_404(membresia_id)
 
-            # Actualizar fechas de membresía
-            if cliente.fecha_fin_membresia and cliente.fecha_fin_membresia > timezone.now().date():
-                cliente.fecha_fin_membresia += timedelta(days=membresia.duracion_dias)
-            else:
-                cliente.fecha_inicio_membresia = timezone.now().date()
-                cliente.fecha_fin_membresia = timezone.now().date() + timedelta(days=membresia.duracion_dias)
-
-            cliente.estado = 'pendiente'
-            cliente.save()
+            PagoService.registrar(
+                cliente=cliente,
+                membresia=membresia,
+                metodo_pago=metodo_pago,
+                usuario=request.user,
+                monto=monto,
+                concepto=concepto,
+                comprobante=referencia,
+                observaciones=observaciones,
+                sede_id=sede_actual(request),
+            )
 
             messages.success(request, f'Pago registrado exitosamente. Pendiente de validación. Membresía válida hasta {cliente.fecha_fin_membresia.strftime("%d/%m/%Y")}')
             return redirect('clientes_listar')
@@ -971,7 +1052,9 @@ def pagos_registrar(request, documento):
 
 @login_required
 def pagos_ver(request, id):
-    pago = get_object_or_404(Pago, id=id)
+    pago = get_object_or_404(
+        Pago.objects.select_related('cliente', 'membresia', 'usuario_registro', 'usuario_validacion'), id=id
+    )
     return render(request, 'pagos/ver.html', {'pago': pago})
 
 @login_required
@@ -994,7 +1077,7 @@ def pagos_editar(request, id):
             }
             
             if request.POST.get('membresia'):
-                datos['membresia'] = get_object_or_404(Membresia, id=request.POST.get('membresia'))
+                datos['membresia'] = obtener_membresia_o_404(request.POST.get('membresia'))
             
             PagoDAO.actualizar(id, datos)
             messages.success(request, 'Pago actualizado exitosamente')
@@ -1030,6 +1113,37 @@ def pagos_validar(request, id):
     
     return render(request, 'pagos/validar.html', {'pago': pago})
 
+@login_required
+@user_passes_test(es_administrador)
+def pagos_conciliar(request):
+    """Conciliar extractos (CSV) de banco/Nequi/Daviplata contra pagos pendientes"""
+    if request.method == 'POST' and request.POST.get('accion') == 'validar':
+        pago_ids = request.POST.getlist('pagos')
+        validados = ConciliacionService.validar_en_lote(pago_ids, request.user)
+        if validados:
+            messages.success(request, f'✓ {validados} pagos validados por conciliación')
+        else:
+            messages.warning(request, 'No se seleccionó ningún pago pendiente para validar')
+        return redirect('pagos_listar')
+
+    resultado = None
+    errores = []
+    if request.method == 'POST' and request.FILES.get('archivo'):
+        try:
+            movimientos, errores = ConciliacionService.leer_extracto(request.FILES['archivo'])
+        except csv.Error as e:
+            messages.error(request, f'El extracto no es un CSV válido: {e}')
+        else:
+            resultado = ConciliacionService.conciliar(movimientos)
+            resultado['total_movimientos'] = len(movimientos)
+
+    context = {
+        'resultado': resultado,
+        'errores': errores,
+        'metodos': [dict(Pago.METODOS_PAGO)[m] for m in METODOS_CONCILIABLES],
+    }
+    return render(request, 'pagos/conciliar.html', context)
+
 @login_required
 def pagos_eliminar(request, id):
     try:
@@ -1043,17 +1157,17 @@ def pagos_eliminar(request, id):
 def pagos_reportes(request):
     estadisticas = PagoDAO.obtener_estadisticas()
     
+    (fecha_inicio, fecha_fin), invalidas = fechas_de_la_peticion(request, 'fecha_inicio', 'fecha_fin')
+    avisar_fechas_invalidas(request, invalidas)
     pagos_reporte = []
-    if request.GET.get('fecha_inicio') and request.GET.get('fecha_fin'):
-        fecha_inicio = request.GET.get('fecha_inicio')
-        fecha_fin = request.GET.get('fecha_fin')
+    if fecha_inicio and fecha_fin:
         pagos_reporte = PagoDAO.obtener_reporte_fechas(fecha_inicio, fecha_fin)
     
     context = {
         'estadisticas': estadisticas,
         'pagos_reporte': pagos_reporte,
-        'fecha_inicio': request.GET.get('fecha_inicio', ''),
-        'fecha_fin': request.GET.get('fecha_fin', ''),
+        'fecha_inicio': fecha_inicio.isoformat() if fecha_inicio else '',
+        'fecha_fin': fecha_fin.isoformat() if fecha_fin else '',
     }
     
     return render(request, 'pagos/reportes.html', context)
@@ -1136,54 +1250,6 @@ def pagos_exportar_pdf(request):
     p.save()
     return response
 
-@login_required
-def pagos_registrar(request, documento):
-    """Registrar pago de membresía para un cliente"""
-    cliente = get_object_or_404(Cliente, documento=documento)
-    membresias = Membresia.objects.filter(activa=True).order_by('precio')
-    
-    if request.method == 'POST':
-        membresia_id = request.POST.get('membresia_id')
-        metodo_pago = request.POST.get('metodo_pago')
-        monto = request.POST.get('monto')
-        
-        try:
-            membresia = Membresia.objects.get(id=membresia_id)
-            
-            # Crear el pago
-            pago = Pago.objects.create(
-                cliente=cliente,
-                membresia=membresia,
-                monto=monto,
-                metodo_pago=metodo_pago,
-                fecha_pago=timezone.now(),
-                usuario_registro=request.user
-            )
-            
-            # Actualizar la membresía del cliente
-            if cliente.fecha_fin_membresia and cliente.fecha_fin_membresia > timezone.now().date():
-                cliente.fecha_fin_membresia += timedelta(days=membresia.duracion_dias)
-            else:
-                cliente.fecha_inicio_membresia = timezone.now().date()
-                cliente.fecha_fin_membresia = timezone.now().date() + timedelta(days=membresia.duracion_dias)
-            
-            cliente.estado = 'Pendiente'
-            cliente.save()
-            
-            messages.success(request, f'Pago registrado exitosamente. Membresía válida hasta {cliente.fecha_fin_membresia.strftime("%d/%m/%Y")}')
-            return redirect('clientes_listar')
-            
-        except Exception as e:
-            messages.error(request, f'Error al registrar el pago: {str(e)}')
-    
-    context = {
-        'cliente': cliente,
-        'membresias': membresias,
-    }
-    
-    return render(request, 'pagos/registrar.html', context)
-
-
 # ============= USUARIOS =============
 @login_required
 @user_passes_test(es_administrador)
@@ -1201,6 +1267,7 @@ def usuarios_crear(request):
                 'correo': request.POST.get('correo'),
                 'password': request.POST.get('password'),
                 'rol': request.POST.get('rol'),
+                'sede_id': request.POST.get('sede') or None,
             }
             UsuarioDAO.crear(datos)
             messages.success(request, 'Usuario creado exitosamente')
@@ -1208,7 +1275,7 @@ def usuarios_crear(request):
         except Exception as e:
             messages.error(request, f'Error al crear el usuario: {str(e)}')
     
-    return render(request, 'usuarios/crear.html')
+    return render(request, 'usuarios/crear.html', {'sedes': SedeDAO.obtener_activas()})
 
 @login_required
 @user_passes_test(es_administrador)
@@ -1221,6 +1288,7 @@ def usuarios_editar(request, id):
                 'nombre': request.POST.get('nombre'),
                 'correo': request.POST.get('correo'),
                 'rol': request.POST.get('rol'),
+                'sede_id': request.POST.get('sede') or None,
             }
             
             password = request.POST.get('password')
@@ -1233,7 +1301,7 @@ def usuarios_editar(request, id):
         except Exception as e:
             messages.error(request, f'Error al actualizar el usuario: {str(e)}')
     
-    return render(request, 'usuarios/editar.html', {'usuario': usuario})
+    return render(request, 'usuarios/editar.html', {'usuario': usuario, 'sedes': SedeDAO.obtener_activas()})
 
 @login_required
 @user_passes_test(es_administrador)
@@ -1251,6 +1319,62 @@ def usuarios_ver(request, id):
     usuario = get_object_or_404(Usuario, id=id)
     return render(request, 'usuarios/ver.html', {'usuario': usuario})
 
+# ============= SEDES =============
+@login_required
+@user_passes_test(es_administrador)
+def sedes_listar(request):
+    """Sedes de la cadena con sus clientes y usuarios; el formulario crea una sede nueva"""
+    if request.method == 'POST':
+        try:
+            SedeDAO.crear({
+                'nombre': request.POST.get('nombre', '').strip(),
+                'direccion': request.POST.get('direccion', '').strip(),
+            })
+            messages.success(request, 'Sede creada exitosamente')
+            return redirect('sedes_listar')
+        except Exception as e:
+            messages.error(request, f'Error al crear la sede: {str(e)}')
+
+    sedes = SedeDAO.obtener_todas().annotate(
+        total_clientes=Count('clientes', distinct=True),
+        total_usuarios=Count('usuarios', distinct=True),
+    )
+    return render(request, 'sedes/listar.html', {'sedes': sedes})
+
+@login_required
+@user_passes_test(es_administrador)
+def sedes_editar(request, id):
+    sede = get_object_or_404(Sede, id=id)
+
+    if request.method == 'POST':
+        try:
+            datos = {
+                'nombre': request.POST.get('nombre', '').strip(),
+                'direccion': request.POST.get('direccion', '').strip(),
+                'activa': request.POST.get('activa') == 'on',
+            }
+            SedeDAO.actualizar(id, datos)
+            messages.success(request, 'Sede actualizada exitosamente')
+            return redirect('sedes_listar')
+        except Exception as e:
+            messages.error(request, f'Error al actualizar la sede: {str(e)}')
+
+    return render(request, 'sedes/editar.html', {'sede': sede})
+
+@login_required
+def sedes_seleccionar(request):
+    """
+    Elige la sede con la que trabaja un usuario sin sede asignada (vacío = todas).
+    Los usuarios con sede quedan siempre en la suya.
+    """
+    if request.method == 'POST' and request.user.sede_id is None:
+        sede = request.POST.get('sede')
+        if sede and SedeDAO.obtener_activas().filter(id=sede).exists():
+            request.session[SESION_SEDE] = int(sede)
+        else:
+            request.session.pop(SESION_SEDE, None)
+    return redirect(request.META.get('HTTP_REFERER') or 'dashboard')
+
 # ============= BONOS Y REGALOS (1-3 DÍAS) =============
 
 @login_required
@@ -1308,7 +1432,7 @@ def bonos_crear(request):
         except Exception as e:
             messages.error(request, f'Error al crear el bono: {str(e)}')
     
-    clientes = Cliente.objects.filter(estado='activo').order_by('nombres')
+    clientes = Cliente.objects.activos().order_by('nombres')
     return render(request, 'bonos/crear.html', {'clientes': clientes})
 
 @login_required
@@ -1345,6 +1469,7 @@ def bonos_eliminar(request, id):
 
 @login_required
 @user_passes_test(es_administrador)
+@cache_por_rol(dependencias=(Bono,))
 def bonos_estadisticas(request):
     """Estadísticas de bonos otorgados"""
     total_bonos = Bono.objects.count()
@@ -1369,7 +1494,7 @@ def bonos_estadisticas(request):
         'bonos_por_tipo': bonos_por_tipo,
     }
     
-    return render(request, 'bonos/estadisticas.html', context)
+    return TemplateResponse(request, 'bonos/estadisticas.html', context)
 
 # ============= COLORES Y UTILIDADES EXCEL =============
 
@@ -1461,83 +1586,45 @@ def ajustar_ancho_columnas(ws):
 # ============= REPORTES GENERALES (MANTENER ORIGINAL) =============
 
 @login_required
+@cache_por_rol(dependencias=(Membresia, Cliente, Asistencia, Pago, Usuario, Sede))
 def reportes_generales(request):
     """Vista principal de reportes con estadísticas generales - CORREGIDA"""
     
-    # Estadísticas Membresías
-    total_membresias = Membresia.objects.filter(activa=True).count()
-    membresias_stats = Membresia.objects.filter(activa=True).aggregate(
-        total_ingresos_potenciales=models.Sum('precio'),
-        precio_promedio=models.Avg('precio')
-    )
-    
-    # Estadísticas Clientes
-    total_clientes = Cliente.objects.count()
-    clientes_activos = Cliente.objects.filter(estado='activo').count()
-    clientes_inactivos = Cliente.objects.filter(estado='inactivo').count()
+    sede_id = sede_actual(request)
+    # Una consulta agrupada por sede para clientes, pagos y asistencias: de ella
+    # salen los totales y, para toda la cadena, la comparación entre sedes
+    clientes = clientes_por_sede(sede_id=sede_id)
+    pagos = pagos_por_sede(sede_id)
+    asistencias = asistencias_por_sede(sede_id)
+    membresias_stats = estadisticas_membresias()
+    clientes_stats = estadisticas_clientes(por_sede=clientes)
+    pagos_stats = estadisticas_pagos(sede_id=sede_id, por_sede=pagos)
+    usuarios_stats = estadisticas_usuarios(sede_id=sede_id)
     
     # Estadísticas Asistencias
-    ahora = timezone.now()
-    hoy = ahora.date()
-    inicio_mes = hoy.replace(day=1)
-    
-    asistencias_hoy = Asistencia.objects.filter(fecha=hoy).count()
-    asistencias_mes = Asistencia.objects.filter(fecha__gte=inicio_mes).count()
-    
-    # CORRECCIÓN: Estadísticas Pagos usando rangos de datetime
-    inicio_dia = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
-    fin_dia = ahora.replace(hour=23, minute=59, second=59, microsecond=999999)
-    inicio_mes_dt = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # Pagos con rangos de datetime
-    pagos_stats = {
-        'total_pagos': Pago.objects.filter(estado='validado').count(),
-        'total_ingresos': float(Pago.objects.filter(estado='validado').aggregate(Sum('monto'))['monto__sum'] or 0),
-        'pagos_pendientes': Pago.objects.filter(estado='pendiente').count(),
-        'pagos_rechazados': Pago.objects.filter(estado='rechazado').count(),
-        'pagos_hoy': Pago.objects.filter(
-            fecha_pago__gte=inicio_dia,
-            fecha_pago__lte=fin_dia,
-            estado='validado'
-        ).count(),
-        'ingresos_hoy': float(Pago.objects.filter(
-            fecha_pago__gte=inicio_dia,
-            fecha_pago__lte=fin_dia,
-            estado='validado'
-        ).aggregate(Sum('monto'))['monto__sum'] or 0),
-        'ingresos_mes': float(Pago.objects.filter(
-            fecha_pago__gte=inicio_mes_dt,
-            fecha_pago__lte=ahora,
-            estado='validado'
-        ).aggregate(Sum('monto'))['monto__sum'] or 0),
-    }
+    asistencias_stats = sumar_sedes(asistencias, ['asistencias_hoy', 'asistencias_mes'])
+    asistencias_hoy = asistencias_stats['asistencias_hoy']
+    asistencias_mes = asistencias_stats['asistencias_mes']
     
-    # Pagos por método
-    pagos_stats['pagos_por_metodo'] = Pago.objects.filter(estado='validado').values('metodo_pago').annotate(
-        total=Count('id'),
-        monto_total=Sum('monto')
-    ).order_by('-monto_total')
-    
-    # Estadísticas Usuarios
-    total_usuarios = Usuario.objects.count()
-    usuarios_admin = Usuario.objects.filter(rol='administrador').count()
-    usuarios_empleados = Usuario.objects.filter(rol='empleado').count()
+    # Toda la cadena: una fila por sede
+    por_sedes = estadisticas_por_sede(clientes, pagos, asistencias) if sede_id is None else []
     
     context = {
-        'total_membresias': total_membresias,
+        'total_membresias': membresias_stats['total_membresias'],
         'membresias_stats': membresias_stats,
-        'total_clientes': total_clientes,
-        'clientes_activos': clientes_activos,
-        'clientes_inactivos': clientes_inactivos,
+        'total_clientes': clientes_stats['total_clientes'],
+        'clientes_activos': clientes_stats['clientes_activos'],
+        'clientes_inactivos': clientes_stats['clientes_inactivos'],
         'asistencias_hoy': asistencias_hoy,
         'asistencias_mes': asistencias_mes,
         'pagos_stats': pagos_stats,
-        'total_usuarios': total_usuarios,
-        'usuarios_admin': usuarios_admin,
-        'usuarios_empleados': usuarios_empleados,
+        'total_usuarios': usuarios_stats['total_usuarios'],
+        'usuarios_admin': usuarios_stats['administradores'],
+        'usuarios_empleados': usuarios_stats['empleados'],
+        'por_sedes': por_sedes,
     }
     
-    return render(request, 'reportes/generales.html', context)
+    return TemplateResponse(request, 'reportes/generales.html', context)
 
 # ============= REPORTES CLIENTES =============
 
@@ -1554,7 +1641,7 @@ def reportes_clientes_excel(request):
     aplicar_estilos_header(ws, fila, columnas)
     fila += 1
     
-    clientes = Cliente.objects.select_related('membresia_actual').all()
+    clientes = ClienteDAO.lista()
     
     for idx, cliente in enumerate(clientes):
         valores = [
@@ -1610,7 +1697,7 @@ def reportes_clientes_pdf(request):
     elements.append(Paragraph(f"Generado: {timezone.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
     elements.append(Spacer(1, 20))
     
-    clientes = Cliente.objects.select_related('membresia_actual').all()
+    clientes = ClienteDAO.lista()
     
     data = [['Documento', 'Nombre', 'Email', 'Teléfono', 'Membresía', 'Estado']]
     
@@ -1661,10 +1748,10 @@ def reportes_membresias_excel(request):
     aplicar_estilos_header(ws, fila, columnas)
     fila += 1
     
-    membresias = Membresia.objects.all()
+    membresias = CatalogoMembresias.todas()
     
     for idx, membresia in enumerate(membresias):
-        clientes_activos = Cliente.objects.filter(membresia_actual=membresia, estado='activo').count()
+        clientes_activos = Cliente.objects.activos().filter(membresia_actual=membresia).count()
         valores = [
             membresia.nombre,
             membresia.duracion_dias,
@@ -1679,7 +1766,7 @@ def reportes_membresias_excel(request):
     fila += 1
     ws.merge_cells(f'A{fila}:D{fila}')
     cell = ws[f'A{fila}']
-    cell.value = f"TOTAL MEMBRESÍAS: {membresias.count()}"
+    cell.value = f"TOTAL MEMBRESÍAS: {len(membresias)}"
     cell.font = Font(bold=True, size=12, color='FFFFFF')
     cell.fill = PatternFill(start_color=COLOR_TOTAL, end_color=COLOR_TOTAL, fill_type='solid')
     cell.alignment = Alignment(horizontal='right', vertical='center')
@@ -1717,12 +1804,12 @@ def reportes_membresias_pdf(request):
     elements.append(Paragraph(f"Generado: {timezone.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
     elements.append(Spacer(1, 20))
     
-    membresias = Membresia.objects.all()
+    membresias = CatalogoMembresias.todas()
     
     data = [['Nombre', 'Duración', 'Precio', 'Estado', 'Clientes']]
     
     for membresia in membresias:
-        clientes_activos = Cliente.objects.filter(membresia_actual=membresia, estado='activo').count()
+        clientes_activos = Cliente.objects.activos().filter(membresia_actual=membresia).count()
         data.append([
             membresia.nombre,
             f"{membresia.duracion_dias} días",
@@ -1745,7 +1832,7 @@ def reportes_membresias_pdf(request):
     
     elements.append(table)
     elements.append(Spacer(1, 20))
-    elements.append(Paragraph(f"<b>Total Membresías: {membresias.count()}</b>", styles['Normal']))
+    elements.append(Paragraph(f"<b>Total Membresías: {len(membresias)}</b>", styles['Normal']))
     
     doc.build(elements)
     buffer.seek(0)
@@ -1871,7 +1958,7 @@ def pagos_exportar_excel(request):
     filtro_estado = request.GET.get('estado', 'todos')
     
     # Datos
-    pagos = Pago.objects.select_related('cliente', 'usuario_registro').all()
+    pagos = PagoDAO.lista()
     
     if filtro_estado != 'todos':
         pagos = pagos.filter(estado=filtro_estado)
@@ -1959,7 +2046,7 @@ def pagos_exportar_pdf(request):
     # Obtener filtros
     filtro_estado = request.GET.get('estado', 'todos')
     
-    pagos = Pago.objects.select_related('cliente', 'usuario_registro').all()
+    pagos = PagoDAO.lista()
     
     if filtro_estado != 'todos':
         pagos = pagos.filter(estado=filtro_estado)
@@ -2020,8 +2107,10 @@ def asistencias_exportar_excel(request):
     ws.title = "Asistencias"
     
     # Obtener filtros
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
+    (fecha_inicio, fecha_fin), invalidas = fechas_de_la_peticion(request, 'fecha_inicio', 'fecha_fin')
+    rechazo = rechazar_fechas_invalidas(request, invalidas, 'asistencias_listar')
+    if rechazo:
+        return rechazo
     
     subtitulo = ""
     if fecha_inicio and fecha_fin:
@@ -2036,19 +2125,10 @@ def asistencias_exportar_excel(request):
     aplicar_estilos_header(ws, fila, columnas)
     fila += 1
     
-    # Datos
-    asistencias = Asistencia.objects.select_related('cliente', 'usuario_registro').all()
+    # Datos (sin filtros, solo las de hoy; el archivo se une si el rango lo alcanza)
+    asistencias = AsistenciaDAO.obtener_reporte_rango(fecha_inicio, fecha_fin)
     
-    if fecha_inicio:
-        asistencias = asistencias.filter(fecha__gte=fecha_inicio)
-    if fecha_fin:
-        asistencias = asistencias.filter(fecha__lte=fecha_fin)
-    
-    # Si no hay filtros, mostrar solo de hoy
-    if not fecha_inicio and not fecha_fin:
-        asistencias = asistencias.filter(fecha=timezone.now().date())
-    
-    for idx, asistencia in enumerate(asistencias.order_by('-fecha', '-hora')):
+    for idx, asistencia in enumerate(asistencias):
         valores = [
             asistencia.id,
             f"{asistencia.cliente.nombres} {asistencia.cliente.apellidos}",
@@ -2100,26 +2180,19 @@ def asistencias_exportar_pdf(request):
     )
     
     # Obtener filtros
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
+    (fecha_inicio, fecha_fin), invalidas = fechas_de_la_peticion(request, 'fecha_inicio', 'fecha_fin')
+    rechazo = rechazar_fechas_invalidas(request, invalidas, 'asistencias_listar')
+    if rechazo:
+        return rechazo
     
     elements.append(Paragraph("REPORTE DE ASISTENCIAS FITTECH", title_style))
     elements.append(Paragraph(f"Generado: {timezone.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
     elements.append(Spacer(1, 20))
     
-    # Datos
-    asistencias = Asistencia.objects.select_related('cliente', 'usuario_registro').all()
-    
-    if fecha_inicio:
-        asistencias = asistencias.filter(fecha__gte=fecha_inicio)
-    if fecha_fin:
-        asistencias = asistencias.filter(fecha__lte=fecha_fin)
+    # Datos (sin filtros, solo las de hoy; el archivo se une si el rango lo alcanza)
+    asistencias = AsistenciaDAO.obtener_reporte_rango(fecha_inicio, fecha_fin)
     
-    # Si no hay filtros, mostrar solo de hoy
-    if not fecha_inicio and not fecha_fin:
-        asistencias = asistencias.filter(fecha=timezone.now().date())
-    
-    asistencias = asistencias.order_by('-fecha', '-hora')[:50]  # Últimas 50
+    asistencias = asistencias[:50]  # Últimas 50
     
     data = [['Cliente', 'Documento', 'Teléfono', 'Fecha', 'Hora', 'Usuario']]
     
@@ -2148,7 +2221,7 @@ def asistencias_exportar_pdf(request):
     
     elements.append(table)
     elements.append(Spacer(1, 20))
-    elements.append(Paragraph(f"<b>Total Asistencias: {asistencias.count()}</b>", styles['Normal']))
+    elements.append(Paragraph(f"<b>Total Asistencias: {len(asistencias)}</b>", styles['Normal']))
     
     doc.build(elements)
     buffer.seek(0)
@@ -2168,18 +2241,23 @@ def reporte_consolidado_excel(request):
     fila = agregar_titulo_excel(ws, "REPORTE CONSOLIDADO FITTECH")
     
     # Estadísticas
-    total_clientes = Cliente.objects.count()
-    clientes_activos = Cliente.objects.filter(estado='activo').count()
-    clientes_inactivos = Cliente.objects.filter(estado='inactivo').count()
-    total_membresias = Membresia.objects.filter(activa=True).count()
-    total_asistencias = Asistencia.objects.count()
-    asistencias_hoy = Asistencia.objects.filter(fecha=timezone.now().date()).count()
-    total_pagos = Pago.objects.count()
-    ingresos_total = float(Pago.objects.filter(estado='validado').aggregate(Sum('monto'))['monto__sum'] or 0)
-    pagos_pendientes = Pago.objects.filter(estado='pendiente').count()
-    total_usuarios = Usuario.objects.count()
-    administradores = Usuario.objects.filter(rol='administrador').count()
-    empleados = Usuario.objects.filter(rol='empleado').count()
+    estadisticas = consolidado()
+    clientes_stats = estadisticas['clientes']
+    pagos_stats = estadisticas['pagos']
+    usuarios_stats = estadisticas['usuarios']
+    total_membresias = estadisticas['membresias']['total_membresias']
+    total_clientes = clientes_stats['total_clientes']
+    clientes_activos = clientes_stats['clientes_activos']
+    clientes_inactivos = clientes_stats['clientes_inactivos']
+    asistencias_stats = AsistenciaDAO.obtener_estadisticas()
+    total_asistencias = asistencias_stats['total_asistencias']
+    asistencias_hoy = asistencias_stats['asistencias_hoy']
+    total_pagos = pagos_stats['pagos_registrados']
+    ingresos_total = pagos_stats['total_ingresos']
+    pagos_pendientes = pagos_stats['pagos_pendientes']
+    total_usuarios = usuarios_stats['total_usuarios']
+    administradores = usuarios_stats['administradores']
+    empleados = usuarios_stats['empleados']
     
     datos = [
         ['MEMBRESÍAS', '', ''],
@@ -2227,37 +2305,133 @@ def reporte_consolidado_excel(request):
 
 
 
+# ============= ANALÍTICA DE COHORTES =============
+
+def meses_cohortes(request):
+    """Cantidad de meses del reporte de cohortes (3 a 36, por defecto 12)"""
+    try:
+        return min(max(int(request.GET.get('meses', 12)), 3), 36)
+    except ValueError:
+        return 12
+
+@login_required
+@user_passes_test(es_administrador)
+def reportes_cohortes(request):
+    """Retención por cohorte de alta, churn mensual y probabilidad de renovación"""
+    meses = meses_cohortes(request)
+    reporte = reporte_cohortes(meses)
+    return render(request, 'reportes/cohortes.html', {
+        'reporte': reporte,
+        'meses': meses,
+        'opciones_meses': (6, 12, 24, 36),
+        'desplazamientos': range(meses),
+    })
+
+@login_required
+@user_passes_test(es_administrador)
+def reportes_cohortes_excel(request):
+    """Exportar el reporte de cohortes a Excel (una hoja por tabla)"""
+    meses = meses_cohortes(request)
+    reporte = reporte_cohortes(meses)
+    wb = Workbook()
+    
+    ws = wb.active
+    ws.title = "Retención"
+    fila = agregar_titulo_excel(ws, "RETENCIÓN POR COHORTE FITTECH", f"Últimos {meses} meses")
+    aplicar_estilos_header(ws, fila, ['Cohorte', 'Clientes', 'Ingreso por Cliente'] + [f'Mes {k}' for k in range(meses)])
+    fila += 1
+    for idx, cohorte in enumerate(reporte['cohortes']):
+        retencion = [f"{valor}%" if valor is not None else '' for valor in cohorte['retencion']]
+        valores = [cohorte['mes'], cohorte['clientes'], cohorte['ingreso_por_cliente']] + retencion
+        aplicar_estilos_fila(ws, fila, valores, alternado=(idx % 2 == 0))
+        fila += 1
+    ajustar_ancho_columnas(ws)
+    
+    ws = wb.create_sheet("Churn")
+    fila = agregar_titulo_excel(ws, "CHURN MENSUAL FITTECH")
+    aplicar_estilos_header(ws, fila, ['Mes', 'Activos Mes Anterior', 'Perdidos', 'Tasa de Churn'])
+    fila += 1
+    for idx, mes in enumerate(reporte['churn']):
+        tasa = f"{mes['tasa']}%" if mes['tasa'] is not None else 'N/A'
+        aplicar_estilos_fila(ws, fila, [mes['mes'], mes['activos_inicio'], mes['perdidos'], tasa], alternado=(idx % 2 == 0))
+        fila += 1
+    ajustar_ancho_columnas(ws)
+    
+    ws = wb.create_sheet("Renovación")
+    fila = agregar_titulo_excel(ws, "PROBABILIDAD DE RENOVACIÓN FITTECH")
+    aplicar_estilos_header(ws, fila, ['Periodo / Membresía', 'Periodos Cerrados', 'Probabilidad de Renovar'])
+    fila += 1
+    filas_renovacion = (
+        [(r['periodo'], r) for r in reporte['renovacion_por_periodo']]
+        + [(r['membresia'], r) for r in reporte['renovacion_por_membresia']]
+    )
+    for idx, (nombre, renovacion) in enumerate(filas_renovacion):
+        probabilidad = f"{renovacion['probabilidad']}%" if renovacion['probabilidad'] is not None else 'N/A'
+        aplicar_estilos_fila(ws, fila, [nombre, renovacion['periodos'], probabilidad], alternado=(idx % 2 == 0))
+        fila += 1
+    ajustar_ancho_columnas(ws)
+    
+    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    response['Content-Disposition'] = f'attachment; filename="Reporte_Cohortes_{timezone.now().strftime("%d_%m_%Y")}.xlsx"'
+    wb.save(response)
+    return response
+
+
+
 # ============= GESTIÓN DE EMAILS =============
 
 @login_required
 @user_passes_test(es_administrador)
+@cache_por_rol(dependencias=(Cliente,))
 def emails_panel(request):
     """Panel de control de emails - Vista principal"""
     from django.conf import settings
     
     dias_aviso = getattr(settings, 'DIAS_AVISO_VENCIMIENTO', 7)
-    fecha_limite = timezone.now().date() + timedelta(days=dias_aviso)
     
-    # Clientes con membresía por vencer
-    clientes_por_vencer = Cliente.objects.filter(
-        fecha_fin_membresia__lte=fecha_limite,
-        fecha_fin_membresia__gte=timezone.now().date(),
-        estado='activo'
+    # Ambos totales en una sola consulta; la lista se pagina sobre el total ya calculado
+    totales = ClienteDAO.totales_correos(dias_aviso)
+    clientes_por_vencer = ClienteDAO.lista_correos(
+        ClienteDAO.obtener_clientes_por_vencer(dias_aviso), con_membresia=True
     )
-    
-    # Clientes inactivos
-    clientes_inactivos = Cliente.objects.filter(
-        estado='inactivo'
-    ).exclude(email__isnull=True).exclude(email='')
+    paginador = PaginadorConTotal(clientes_por_vencer, CLIENTES_POR_PAGINA_CORREOS, total=totales['por_vencer'])
+    pagina = paginador.get_page(request.GET.get('pagina'))
     
     context = {
-        'clientes_por_vencer_lista': clientes_por_vencer,
-        'total_por_vencer': clientes_por_vencer.count(),
-        'total_inactivos': clientes_inactivos.count(),
+        'clientes_por_vencer_lista': pagina,
+        'pagina': pagina,
+        'total_por_vencer': totales['por_vencer'],
+        'total_inactivos': totales['inactivos'],
         'dias_aviso': dias_aviso,
     }
     
-    return render(request, 'emails/panel.html', context)
+    return TemplateResponse(request, 'emails/panel.html', context)
+
+
+# ============= CACHE =============
+
+@login_required
+@user_passes_test(es_administrador)
+def cache_estadisticas(request):
+    """Aciertos y fallos de las vistas cacheadas, para ajustar los TTL"""
+    return JsonResponse({'success': True, 'vistas': estadisticas_vistas()})
+
+
+# ============= MÉTRICAS =============
+
+def metricas(request):
+    """Histogramas por vista en formato de texto de Prometheus (solo administradores)"""
+    from django.conf import settings
+
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    con_token = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (con_token or es_administrador(request.user)):
+        return HttpResponse('No autorizado', status=403, content_type='text/plain')
+
+    return HttpResponse(
+        registro_metricas.exportar_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
 
 
 # ========== EMAILS PARA CLIENTES CON MEMBRESÍA POR VENCER ==========
@@ -2318,14 +2492,14 @@ def emails_clientes_inactivos(request):
     """Panel para ver y enviar correos masivos a clientes inactivos"""
     
     # Obtener clientes inactivos con email
-    clientes_inactivos = Cliente.objects.filter(
-        estado='inactivo'
-    ).exclude(email__isnull=True).exclude(email='')
-    
-    total_clientes = clientes_inactivos.count()
+    total_clientes = ClienteDAO.totales_correos()['inactivos']
+    clientes_inactivos = ClienteDAO.lista_correos(ClienteDAO.obtener_inactivos_con_email())
+    paginador = PaginadorConTotal(clientes_inactivos, CLIENTES_POR_PAGINA_CORREOS, total=total_clientes)
+    pagina = paginador.get_page(request.GET.get('pagina'))
     
     context = {
-        'clientes_inactivos': clientes_inactivos,
+        'clientes_inactivos': pagina,
+        'pagina': pagina,
         'total_clientes': total_clientes,
     }
     
@@ -2398,38 +2572,46 @@ def cliente_asistencias(request, documento):
     """Ver asistencias de un cliente con filtro por rango de fechas"""
     cliente = get_object_or_404(Cliente, documento=documento)
     
-    # Obtener fechas del filtro
-    fecha_desde = request.GET.get('fecha_desde')
-    fecha_hasta = request.GET.get('fecha_hasta')
-    
-    # Query base
-    asistencias = Asistencia.objects.filter(cliente=cliente).order_by('-fecha', '-hora')
+    # Obtener fechas del filtro (las mal formadas se ignoran)
+    (fecha_desde, fecha_hasta), invalidas = fechas_de_la_peticion(request, 'fecha_desde', 'fecha_hasta')
+    avisar_fechas_invalidas(request, invalidas)
     
-    # Aplicar filtros si existen
-    if fecha_desde:
-        asistencias = asistencias.filter(fecha__gte=fecha_desde)
+    # Estadísticas (incluye el total, así el paginador no repite el COUNT)
+    estadisticas = AsistenciaDAO.obtener_estadisticas_cliente(cliente, fecha_desde, fecha_hasta)
     
-    if fecha_hasta:
-        asistencias = asistencias.filter(fecha__lte=fecha_hasta)
+    asistencias = AsistenciaDAO.historial_cliente(cliente, fecha_desde, fecha_hasta)
     
-    # Estadísticas
-    total_asistencias = asistencias.count()
+    paginador = PaginadorConTotal(asistencias, ASISTENCIAS_POR_PAGINA, total=estadisticas['total_asistencias'])
+    pagina = paginador.get_page(request.GET.get('pagina'))
     
     # Calcular rango de días
     if fecha_desde and fecha_hasta:
-        fecha_desde_obj = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-        fecha_hasta_obj = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-        dias_rango = (fecha_hasta_obj - fecha_desde_obj).days + 1
+        dias_rango = (fecha_hasta - fecha_desde).days + 1
     else:
         dias_rango = None
     
     context = {
         'cliente': cliente,
-        'asistencias': asistencias,
-        'total_asistencias': total_asistencias,
-        'fecha_desde': fecha_desde,
-        'fecha_hasta': fecha_hasta,
+        'asistencias': pagina,
+        'pagina': pagina,
+        'total_asistencias': estadisticas['total_asistencias'],
+        'estadisticas': estadisticas,
+        'fecha_desde': fecha_desde and fecha_desde.isoformat(),
+        'fecha_hasta': fecha_hasta and fecha_hasta.isoformat(),
         'dias_rango': dias_rango,
     }
     
-    return render(request, 'clientes/asistencias.html', context)
\ No newline at end of file
+    return render(request, 'clientes/asistencias.html', context)
+
+@login_required
+def cliente_asistencias_estadisticas(request, documento):
+    """API JSON con las estadísticas de asistencia de un cliente"""
+    cliente = get_object_or_404(Cliente, documento=documento)
+    (fecha_desde, fecha_hasta), invalidas = fechas_de_la_peticion(request, 'fecha_desde', 'fecha_hasta')
+    if invalidas:
+        return JsonResponse(
+            {'success': False, 'message': f'Fecha inválida ({", ".join(invalidas)}): se espera AAAA-MM-DD'},
+            status=400,
+        )
+    estadisticas = AsistenciaDAO.obtener_estadisticas_cliente(cliente, fecha_desde, fecha_hasta)
+    return JsonResponse({'success': True, 'documento': cliente.documento, 'estadisticas': estadisticas})
@@ -1,7 +1,122 @@
+import json
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import Sum, Count, Avg
-from datetime import timedelta, datetime
-from .models import Usuario, Membresia, Cliente, Asistencia, Pago
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Sum, Count, Max, Min, F, Q, Value, DateField
+from django.db.models.functions import Greatest, Coalesce, ExtractHour, ExtractMinute, ExtractYear, ExtractMonth
+from datetime import date, timedelta, datetime, time
+from .models import (
+    Usuario, Membresia, Cliente, Asistencia, Pago, HistorialMembresia, Bono, ResumenCliente,
+    AsistenciaDiaria, AsistenciaMensual, IndiceVisitante, VisitantesDia, OcupacionHoraria, Sede,
+    CorteArchivo, AsistenciaArchivada, PagoArchivado,
+)
+from . import bitmaps, ocupacion, particiones
+from .cache import CatalogoMembresias
+from .querysets import ClienteQuerySet
+
+
+def actualizar_fila(modelo, filtros, **cambios):
+    """
+    UPDATE de la fila de `filtros`; devuelve cuántas filas cambió. Si alguna
+    columna de `filtros` es NULL (rollups sin sede), la llave única no impide
+    filas repetidas: se bloquea y actualiza solo la primera, como VisitantesDAO
+    con sus días, para no sumar dos veces. Los totales se leen sumando todas
+    las filas, así que una repetida no altera el resultado.
+    """
+    filas = modelo.objects.filter(**filtros)
+    if None not in filtros.values():
+        return filas.update(**cambios)
+    with transaction.atomic():
+        pk = filas.select_for_update().order_by('pk').values_list('pk', flat=True).first()
+        return modelo.objects.filter(pk=pk).update(**cambios) if pk is not None else 0
+
+
+def incrementar_o_crear(modelo, filtros, iniciales=None, **cambios):
+    """
+    UPDATE atómico con F() sobre la fila de `filtros`; si aún no existe la
+    inserta con `iniciales` (sin ellos, en cero y luego la actualiza). Si otra
+    petición la insertó al mismo tiempo, la llave única de `filtros` rechaza la
+    segunda inserción y se repite el UPDATE; con columnas NULL la segunda fila
+    queda y actualizar_fila evita contarla dos veces.
+    """
+    if actualizar_fila(modelo, filtros, **cambios):
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**filtros, **(iniciales or {}))
+        if iniciales is not None:
+            return
+    except IntegrityError:
+        pass
+    actualizar_fila(modelo, filtros, **cambios)
+
+
+def parsear_fecha(valor):
+    """Fecha de un parámetro YYYY-MM-DD (o una fecha ya convertida); None si falta o está mal formada"""
+    if isinstance(valor, date):
+        return valor
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def borrar_por_ids(modelo, ids):
+    """
+    DELETE ... WHERE pk IN (...) explícito para un lote acotado de ids: no carga
+    las filas, no dispara pre/post_delete ni sigue los on_delete. Quien lo usa
+    ya tiene resúmenes y rollups al día o borra también las filas relacionadas.
+    """
+    if not ids:
+        return 0
+    conexion = connections[modelo.objects.db]
+    tabla = conexion.ops.quote_name(modelo._meta.db_table)
+    columna = conexion.ops.quote_name(modelo._meta.pk.column)
+    marcadores = ', '.join(['%s'] * len(ids))
+    with conexion.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {tabla} WHERE {columna} IN ({marcadores})', list(ids))
+        return cursor.rowcount
+
+
+def por_sede(queryset, sede_id):
+    """Restringe el queryset a una sede; con None deja todas"""
+    return queryset if sede_id is None else queryset.filter(sede_id=sede_id)
+
+
+class SedeDAO:
+    """Data Access Object para gestionar Sedes"""
+
+    @staticmethod
+    def obtener_todas():
+        return Sede.objects.all()
+
+    @staticmethod
+    def obtener_activas():
+        return Sede.objects.filter(activa=True)
+
+    @staticmethod
+    def obtener_por_id(id):
+        return Sede.objects.get(id=id)
+
+    @staticmethod
+    def crear(datos):
+        return Sede.objects.create(**datos)
+
+    @staticmethod
+    def actualizar(id, datos):
+        sede = Sede.objects.get(id=id)
+        for key, value in datos.items():
+            setattr(sede, key, value)
+        sede.save()
+        return sede
+
+    @staticmethod
+    def predeterminada():
+        """Sede para registros sin sede explícita: la primera sede activa (None si no hay sedes)"""
+        return Sede.objects.filter(activa=True).order_by('id').values_list('id', flat=True).first()
+
 
 class UsuarioDAO:
     """Data Access Object para gestionar Usuarios"""
@@ -24,7 +139,8 @@ class UsuarioDAO:
             correo=datos['correo'],
             password=datos['password'],
             nombre=datos['nombre'],
-            rol=datos['rol']
+            rol=datos['rol'],
+            sede_id=datos.get('sede_id'),
         )
         return usuario
     
@@ -34,6 +150,7 @@ class UsuarioDAO:
         usuario.nombre = datos.get('nombre', usuario.nombre)
         usuario.correo = datos.get('correo', usuario.correo)
         usuario.rol = datos.get('rol', usuario.rol)
+        usuario.sede_id = datos.get('sede_id', usuario.sede_id)
         
         if 'password' in datos and datos['password']:
             usuario.set_password(datos['password'])
@@ -60,11 +177,11 @@ class MembresiaDAO:
     
     @staticmethod
     def obtener_todas():
-        return Membresia.objects.filter(activa=True).order_by('-fecha_creacion')
+        return CatalogoMembresias.activas()
     
     @staticmethod
     def obtener_por_id(id):
-        return Membresia.objects.get(id=id)
+        return CatalogoMembresias.obtener(id)
     
     @staticmethod
     def crear(datos):
@@ -87,24 +204,41 @@ class MembresiaDAO:
     
     @staticmethod
     def obtener_activas():
-        return Membresia.objects.filter(activa=True)
+        return CatalogoMembresias.activas()
     
     @staticmethod
     def obtener_estadisticas():
+        activas = CatalogoMembresias.activas()
         stats = {
-            'total_membresias': Membresia.objects.filter(activa=True).count(),
-            'precio_promedio': Membresia.objects.filter(activa=True).aggregate(Avg('precio'))['precio__avg'] or 0,
-            'duracion_promedio': Membresia.objects.filter(activa=True).aggregate(Avg('duracion_dias'))['duracion_dias__avg'] or 0,
+            'total_membresias': len(activas),
+            'precio_promedio': sum(m.precio for m in activas) / len(activas) if activas else 0,
+            'duracion_promedio': sum(m.duracion_dias for m in activas) / len(activas) if activas else 0,
         }
         return stats
 
 
 class ClienteDAO:
     """Data Access Object para gestionar Clientes"""
+
+    # Columnas que muestran las listas y exportaciones de clientes
+    CAMPOS_LISTA = (
+        'id', 'tipo_documento', 'documento', 'nombres', 'apellidos', 'email', 'celular',
+        'estado', 'fecha_fin_membresia', 'membresia_actual', 'membresia_actual__nombre',
+    )
+
+    @staticmethod
+    def lista(clientes=None):
+        """
+        Proyección para listas: solo las columnas mostradas, la membresía en el
+        mismo JOIN y los días para vencer calculados en SQL
+        """
+        if clientes is None:
+            clientes = Cliente.objects.all()
+        return clientes.con_membresia().only(*ClienteDAO.CAMPOS_LISTA).con_vencimiento()
     
     @staticmethod
-    def obtener_todos():
-        return Cliente.objects.all().order_by('-fecha_registro')
+    def obtener_todos(sede_id=None):
+        return Cliente.objects.de_sede(sede_id).order_by('-fecha_registro')
     
     @staticmethod
     def obtener_por_documento(documento):
@@ -130,152 +264,705 @@ class ClienteDAO:
         cliente.delete()
     
     @staticmethod
-    def obtener_activos():
+    def obtener_activos(sede_id=None):
         """Obtener clientes con estado activo"""
-        return Cliente.objects.filter(estado='activo')
+        return Cliente.objects.de_sede(sede_id).activos()
     
     @staticmethod
-    def obtener_inactivos():
+    def obtener_inactivos(sede_id=None):
         """Obtener clientes con estado inactivo"""
-        return Cliente.objects.filter(estado='inactivo')
+        return Cliente.objects.de_sede(sede_id).inactivos()
     
     @staticmethod
-    def obtener_pendientes():
+    def obtener_pendientes(sede_id=None):
         """Obtener clientes con estado pendiente (esperando validación de pago)"""
-        return Cliente.objects.filter(estado='pendiente')
+        return Cliente.objects.de_sede(sede_id).pendientes()
     
     @staticmethod
     def obtener_por_membresia(membresia):
         """Obtener clientes activos con una membresía específica"""
-        return Cliente.objects.filter(membresia_actual=membresia, estado='activo')
+        return Cliente.objects.activos().filter(membresia_actual=membresia)
     
     @staticmethod
-    def obtener_clientes_por_vencer(dias=7):
+    def filtro_por_vencer(dias, hoy=None):
+        return ClienteQuerySet.filtro_por_vencer(dias, hoy)
+
+    @staticmethod
+    def filtro_inactivos_con_email():
+        return ClienteQuerySet.filtro_inactivos_con_email()
+
+    @staticmethod
+    def obtener_clientes_por_vencer(dias=7, sede_id=None):
         """Obtener clientes cuya membresía vence en los próximos días especificados"""
-        hoy = timezone.now().date()
-        fecha_limite = hoy + timedelta(days=dias)
-        
-        return Cliente.objects.filter(
-            fecha_fin_membresia__lte=fecha_limite,
-            fecha_fin_membresia__gte=hoy,
-            estado='activo'
-        ).order_by('fecha_fin_membresia')
+        return Cliente.objects.de_sede(sede_id).por_vencer(dias).con_vencimiento(dias).order_by('fecha_fin_membresia')
+
+    @staticmethod
+    def obtener_inactivos_con_email(sede_id=None):
+        """Clientes inactivos a los que se les puede escribir"""
+        return Cliente.objects.de_sede(sede_id).inactivos_con_email().order_by('apellidos', 'nombres')
+
+    @staticmethod
+    def totales_correos(dias=7, sede_id=None):
+        """Clientes por vencer e inactivos con email, contados en una sola consulta"""
+        return Cliente.objects.de_sede(sede_id).aggregate(
+            por_vencer=Count('id', filter=ClienteQuerySet.filtro_por_vencer(dias)),
+            inactivos=Count('id', filter=ClienteQuerySet.filtro_inactivos_con_email()),
+        )
+
+    # Columnas que muestran los paneles de correos
+    CAMPOS_CORREO = ('id', 'documento', 'nombres', 'apellidos', 'email', 'fecha_fin_membresia')
+
+    @staticmethod
+    def lista_correos(clientes, con_membresia=False):
+        """Proyección para los paneles de correos; con_membresia agrega el nombre del plan"""
+        campos = ClienteDAO.CAMPOS_CORREO
+        if con_membresia:
+            clientes = clientes.con_membresia()
+            campos += ('membresia_actual', 'membresia_actual__nombre')
+        return clientes.only(*campos)
     
     @staticmethod
     def obtener_clientes_vencidos():
         """Obtener clientes con membresía vencida"""
-        hoy = timezone.now().date()
-        
-        return Cliente.objects.filter(
-            fecha_fin_membresia__lt=hoy,
-            estado='activo'
-        ).order_by('fecha_fin_membresia')
+        return Cliente.objects.vencidos().order_by('fecha_fin_membresia')
     
     @staticmethod
-    def obtener_estadisticas():
-        """Obtener estadísticas generales de clientes"""
-        hoy = timezone.now().date()
-        
-        stats = {
-            'total_clientes': Cliente.objects.count(),
-            'clientes_activos': Cliente.objects.filter(estado='activo').count(),
-            'clientes_inactivos': Cliente.objects.filter(estado='inactivo').count(),
-            'clientes_pendientes': Cliente.objects.filter(estado='pendiente').count(),
-            'clientes_por_vencer': ClienteDAO.obtener_clientes_por_vencer().count(),
-            'clientes_vencidos': ClienteDAO.obtener_clientes_vencidos().count(),
-        }
-        return stats
+    def obtener_estadisticas(sede_id=None):
+        """Obtener estadísticas generales de clientes (una sola consulta)"""
+        from .estadisticas import estadisticas_clientes
+        return estadisticas_clientes(sede_id=sede_id)
     
     @staticmethod
     def buscar(query):
         """Buscar clientes por nombre, apellido, documento o email"""
-        from django.db.models import Q
-        return Cliente.objects.filter(
-            Q(documento__icontains=query) |
-            Q(nombres__icontains=query) |
-            Q(apellidos__icontains=query) |
-            Q(email__icontains=query) |
-            Q(celular__icontains=query)
-        ).order_by('-fecha_registro')
+        return Cliente.objects.buscar(query).order_by('-fecha_registro')
 
 class AsistenciaDAO:
     """Data Access Object para gestionar Asistencias"""
+
+    # Columnas que muestran la lista y las exportaciones de asistencias
+    CAMPOS_LISTA = (
+        'id', 'fecha', 'hora', 'cliente', 'cliente__documento', 'cliente__nombres',
+        'cliente__apellidos', 'cliente__celular', 'cliente__membresia_actual',
+        'cliente__membresia_actual__nombre', 'usuario_registro', 'usuario_registro__nombre',
+    )
+
+    @staticmethod
+    def lista(asistencias=None):
+        """Proyección para listas: cliente, membresía y usuario en un solo JOIN"""
+        if asistencias is None:
+            asistencias = Asistencia.objects.all()
+        return asistencias.select_related(
+            'cliente__membresia_actual', 'usuario_registro'
+        ).only(*AsistenciaDAO.CAMPOS_LISTA)
     
     @staticmethod
     def obtener_todas():
         return Asistencia.objects.all().order_by('-fecha', '-hora')
     
     @staticmethod
-    def obtener_por_fecha(fecha):
-        return Asistencia.objects.filter(fecha=fecha).order_by('-hora')
+    def obtener_por_fecha(fecha, sede_id=None):
+        return Asistencia.objects.de_sede(sede_id).del_dia(fecha).order_by('-hora')
     
     @staticmethod
     def obtener_por_cliente(cliente):
-        return Asistencia.objects.filter(cliente=cliente).order_by('-fecha', '-hora')
+        return Asistencia.objects.de_cliente(cliente).order_by('-fecha', '-hora')
     
     @staticmethod
-    def crear(cliente, usuario_registro):
-        asistencia = Asistencia.objects.create(
-            cliente=cliente,
-            usuario_registro=usuario_registro
-        )
+    def crear(cliente, usuario_registro, sede_id=None):
+        """
+        Registra la entrada en la sede indicada (por defecto, la del cliente).
+        Las señales actualizan el resumen y los rollups dentro de la misma
+        transacción, con el cliente bloqueado: dos entradas simultáneas del
+        mismo cliente no cuentan los dos como visitante nuevo del mes
+        """
+        with transaction.atomic():
+            list(Cliente.objects.select_for_update().filter(pk=cliente.pk).values_list('pk', flat=True))
+            asistencia = Asistencia.objects.create(
+                cliente=cliente,
+                usuario_registro=usuario_registro,
+                sede_id=sede_id,
+            )
         return asistencia
     
     @staticmethod
-    def contar_asistencias_dia(fecha=None):
+    def contar_asistencias_dia(fecha=None, sede_id=None):
         """Contar asistencias de un día específico (por defecto hoy)"""
         if fecha is None:
-            fecha = timezone.now().date()
-        return Asistencia.objects.filter(fecha=fecha).count()
+            fecha = timezone.localdate()
+        return Asistencia.objects.de_sede(sede_id).del_dia(fecha).count()
     
     @staticmethod
-    def contar_asistencias_mes(fecha=None):
+    def contar_asistencias_mes(fecha=None, sede_id=None):
         """Contar asistencias del mes actual"""
         if fecha is None:
-            fecha = timezone.now().date()
+            fecha = timezone.localdate()
         
         inicio_mes = fecha.replace(day=1)
-        return Asistencia.objects.filter(fecha__gte=inicio_mes, fecha__lte=fecha).count()
+        return AsistenciaRollupDAO.contar_rango(inicio_mes, fecha, sede_id)
     
     @staticmethod
-    def obtener_estadisticas():
-        hoy = timezone.now().date()
+    def obtener_estadisticas(sede_id=None):
+        """
+        Totales histórico, del mes y de hoy: las filas de hoy se cuentan una vez y
+        se suman a los días cerrados del mes, y el mes a los meses cerrados
+        """
+        hoy = timezone.localdate()
         inicio_mes = hoy.replace(day=1)
-        
-        stats = {
-            'total_asistencias': Asistencia.objects.count(),
-            'asistencias_hoy': AsistenciaDAO.contar_asistencias_dia(),
-            'asistencias_mes': Asistencia.objects.filter(fecha__gte=inicio_mes).count(),
+        asistencias_hoy = AsistenciaDAO.contar_asistencias_dia(hoy, sede_id)
+        asistencias_mes = asistencias_hoy
+        if inicio_mes < hoy:
+            asistencias_mes += AsistenciaRollupDAO.contar_rango(inicio_mes, hoy - timedelta(days=1), sede_id)
+        return {
+            'total_asistencias': AsistenciaRollupDAO.contar_meses_cerrados(sede_id) + asistencias_mes,
+            'asistencias_hoy': asistencias_hoy,
+            'asistencias_mes': asistencias_mes,
         }
-        return stats
     
     @staticmethod
-    def obtener_reporte_rango(fecha_inicio, fecha_fin):
-        """Obtener asistencias en un rango de fechas"""
-        return Asistencia.objects.filter(
-            fecha__gte=fecha_inicio,
-            fecha__lte=fecha_fin
+    def obtener_reporte_rango(fecha_inicio=None, fecha_fin=None):
+        """
+        Asistencias entre dos fechas opcionales (sin ninguna, las de hoy) con la
+        proyección de listas; incluye el archivo si el rango empieza antes del corte.
+        """
+        fecha_inicio, fecha_fin = AsistenciaDAO._fecha(fecha_inicio), AsistenciaDAO._fecha(fecha_fin)
+        if not fecha_inicio and not fecha_fin:
+            fecha_inicio = fecha_fin = timezone.localdate()
+
+        def preparar(asistencias):
+            if fecha_inicio:
+                asistencias = asistencias.filter(fecha__gte=fecha_inicio)
+            if fecha_fin:
+                asistencias = asistencias.filter(fecha__lte=fecha_fin)
+            return AsistenciaDAO.lista(asistencias)
+
+        return ArchivoDAO.consulta('asistencias', preparar, fecha_inicio, fecha_fin).order_by('-fecha', '-hora')
+
+    @staticmethod
+    def _fecha(valor):
+        """Fecha de un filtro opcional, que puede llegar como texto YYYY-MM-DD; mal formada se ignora"""
+        return parsear_fecha(valor)
+
+    @staticmethod
+    def filtrar_por_cliente(cliente, fecha_desde=None, fecha_hasta=None, modelo=Asistencia):
+        """Asistencias de un cliente (de `modelo`: la tabla viva o el archivo), opcionalmente acotadas por fechas"""
+        asistencias = modelo.objects.filter(cliente=cliente)
+        if fecha_desde:
+            asistencias = asistencias.filter(fecha__gte=fecha_desde)
+        if fecha_hasta:
+            asistencias = asistencias.filter(fecha__lte=fecha_hasta)
+        return asistencias
+
+    @staticmethod
+    def historial_cliente(cliente, fecha_desde=None, fecha_hasta=None):
+        """Asistencias de un cliente para listar, uniendo el archivo si el rango lo alcanza"""
+        fecha_desde, fecha_hasta = AsistenciaDAO._fecha(fecha_desde), AsistenciaDAO._fecha(fecha_hasta)
+        return ArchivoDAO.consulta(
+            'asistencias',
+            lambda asistencias: AsistenciaDAO.filtrar_por_cliente(
+                cliente, fecha_desde, fecha_hasta, asistencias.model
+            ).select_related('usuario_registro').only('id', 'fecha', 'hora', 'usuario_registro__nombre'),
+            fecha_desde, fecha_hasta,
         ).order_by('-fecha', '-hora')
 
+    @staticmethod
+    def obtener_estadisticas_cliente(cliente, fecha_desde=None, fecha_hasta=None):
+        """
+        Estadísticas de asistencia de un cliente: visitas por semana, rachas,
+        hora promedio y días desde la última visita.
+
+        Los totales salen de un aggregate() por tabla (la viva y, si el rango lo
+        alcanza, el archivo); las rachas se calculan en Python sobre la lista de
+        días distintos (una fila por día, no por visita).
+        """
+        hoy = timezone.localdate()
+        fecha_desde, fecha_hasta = AsistenciaDAO._fecha(fecha_desde), AsistenciaDAO._fecha(fecha_hasta)
+
+        total = 0
+        suma_minutos = 0
+        dias = set()
+        for modelo in ArchivoDAO.modelos('asistencias', fecha_desde, fecha_hasta):
+            asistencias = AsistenciaDAO.filtrar_por_cliente(cliente, fecha_desde, fecha_hasta, modelo)
+            parcial = asistencias.aggregate(
+                total=Count('id'), suma_minutos=Sum(ExtractHour('hora') * 60 + ExtractMinute('hora')),
+            )
+            total += parcial['total']
+            suma_minutos += parcial['suma_minutos'] or 0
+            dias.update(asistencias.order_by().values_list('fecha', flat=True).distinct())
+        dias = sorted(dias)
+
+        totales = {
+            'total': total,
+            'dias_distintos': len(dias),
+            'primera': dias[0] if dias else None,
+            'ultima': dias[-1] if dias else None,
+            'minuto_promedio': suma_minutos // total if total else None,
+        }
+
+        racha_maxima = 0
+        racha = 0
+        anterior = None
+        for dia in dias:
+            racha = racha + 1 if anterior and (dia - anterior).days == 1 else 1
+            racha_maxima = max(racha_maxima, racha)
+            anterior = dia
+
+        # La racha actual solo cuenta si la última visita fue hoy o ayer
+        racha_actual = racha if anterior and (hoy - anterior).days <= 1 else 0
+
+        inicio = fecha_desde or totales['primera']
+        fin = fecha_hasta or hoy
+
+        visitas_por_semana = 0
+        if inicio and totales['total']:
+            semanas = max(((fin - inicio).days + 1) / 7, 1)
+            visitas_por_semana = round(totales['total'] / semanas, 2)
+
+        # Minutos desde la medianoche -> HH:MM
+        minuto_promedio = totales['minuto_promedio']
+        hora_promedio = f'{minuto_promedio // 60:02d}:{minuto_promedio % 60:02d}' if minuto_promedio is not None else None
+
+        return {
+            'total_asistencias': totales['total'],
+            'dias_con_asistencia': totales['dias_distintos'],
+            'primera_asistencia': totales['primera'],
+            'ultima_asistencia': totales['ultima'],
+            'dias_desde_ultima': (hoy - totales['ultima']).days if totales['ultima'] else None,
+            'visitas_por_semana': visitas_por_semana,
+            'hora_promedio': hora_promedio,
+            'racha_actual': racha_actual,
+            'racha_maxima': racha_maxima,
+        }
+
+
+class AsistenciaRollupDAO:
+    """
+    Rollups diarios y mensuales de asistencias por sede para las analíticas.
+    Los totales de toda la cadena se obtienen sumando las filas de todas las sedes.
+    """
+
+    @staticmethod
+    def _rango_hora(hora_bucket):
+        inicio = time(hora_bucket, 0)
+        fin = time(hora_bucket + 1, 0) if hora_bucket < 23 else None
+        return inicio, fin
+
+    @staticmethod
+    def _otras_visitas(asistencia):
+        """Otras asistencias del cliente en la misma sede: en el mes y en la franja horaria de `asistencia`"""
+        fecha = asistencia.fecha
+        hora_inicio, hora_fin = AsistenciaRollupDAO._rango_hora(asistencia.hora.hour)
+        en_franja = Q(fecha=fecha, hora__gte=hora_inicio)
+        if hora_fin:
+            en_franja &= Q(hora__lt=hora_fin)
+        return Asistencia.objects.filter(
+            cliente_id=asistencia.cliente_id, sede_id=asistencia.sede_id,
+            fecha__gte=fecha.replace(day=1), fecha__lt=particiones.sumar_meses(fecha, 1),
+        ).exclude(pk=asistencia.pk).aggregate(
+            en_mes=Count('id'), en_franja=Count('id', filter=en_franja),
+        )
+
+    @staticmethod
+    def _claves(asistencia):
+        fecha = asistencia.fecha
+        return (
+            (AsistenciaDiaria, {'sede_id': asistencia.sede_id, 'fecha': fecha, 'hora_bucket': asistencia.hora.hour}),
+            (AsistenciaMensual, {'sede_id': asistencia.sede_id, 'anio': fecha.year, 'mes': fecha.month}),
+        )
+
+    @staticmethod
+    def registrar(asistencia):
+        """
+        Suma una asistencia recién creada a los rollups del día y del mes de su
+        sede: una consulta para saber si el cliente ya había venido y un UPDATE
+        por tabla (un INSERT la primera vez de cada franja o mes)
+        """
+        otras = AsistenciaRollupDAO._otras_visitas(asistencia)
+        # Si no vino en el mes, tampoco vino en esta franja
+        nuevos = (int(not otras['en_franja']), int(not otras['en_mes']))
+        for (modelo, filtros), nuevo in zip(AsistenciaRollupDAO._claves(asistencia), nuevos):
+            incrementar_o_crear(
+                modelo, filtros, iniciales={'total': 1, 'clientes_unicos': nuevo},
+                total=F('total') + 1, clientes_unicos=F('clientes_unicos') + nuevo,
+            )
+
+    @staticmethod
+    def descontar(asistencia):
+        """Resta una asistencia eliminada; el cliente deja de contar si era su única visita de la franja o del mes"""
+        otras = AsistenciaRollupDAO._otras_visitas(asistencia)
+        ultimos = (int(not otras['en_franja']), int(not otras['en_mes']))
+        for (modelo, filtros), ultimo in zip(AsistenciaRollupDAO._claves(asistencia), ultimos):
+            actualizar_fila(
+                modelo, filtros, total=F('total') - 1, clientes_unicos=F('clientes_unicos') - ultimo,
+            )
+
+    @staticmethod
+    def compactar(fecha_inicio, fecha_fin):
+        """
+        Recalcula desde las filas crudas los rollups del rango (y de sus meses
+        completos). Los días archivados no se tocan: sus filas crudas ya no están.
+        """
+        fecha_inicio = ArchivoDAO.inicio_vivo('asistencias', fecha_inicio)
+        if fecha_inicio > fecha_fin:
+            return
+        inicio_mes = fecha_inicio.replace(day=1)
+        siguiente = (fecha_fin.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+        with transaction.atomic():
+            diarias = Asistencia.objects.filter(
+                fecha__gte=fecha_inicio, fecha__lte=fecha_fin
+            ).annotate(
+                hora_bucket=ExtractHour('hora')
+            ).values('sede_id', 'fecha', 'hora_bucket').annotate(
+                total=Count('id'),
+                clientes_unicos=Count('cliente', distinct=True),
+            ).order_by()
+
+            AsistenciaDiaria.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin).delete()
+            AsistenciaDiaria.objects.bulk_create(
+                [AsistenciaDiaria(**fila) for fila in diarias], batch_size=1000
+            )
+
+            mensuales = Asistencia.objects.filter(
+                fecha__gte=inicio_mes, fecha__lt=siguiente
+            ).annotate(
+                anio=ExtractYear('fecha'), mes=ExtractMonth('fecha')
+            ).values('sede_id', 'anio', 'mes').annotate(
+                total=Count('id'),
+                clientes_unicos=Count('cliente', distinct=True),
+            ).order_by()
+
+            meses = [(m.year, m.month) for m in AsistenciaRollupDAO._meses_entre(inicio_mes, siguiente)]
+            for anio, mes in meses:
+                AsistenciaMensual.objects.filter(anio=anio, mes=mes).delete()
+            AsistenciaMensual.objects.bulk_create([AsistenciaMensual(**fila) for fila in mensuales])
+
+    @staticmethod
+    def _meses_entre(inicio_mes, fin_exclusivo):
+        mes = inicio_mes
+        while mes < fin_exclusivo:
+            yield mes
+            mes = (mes.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    @staticmethod
+    def contar_rango(fecha_inicio, fecha_fin, sede_id=None):
+        """
+        Total de asistencias entre dos fechas (inclusive). Los días cerrados
+        salen del rollup diario; solo el día de hoy se cuenta sobre filas crudas.
+        """
+        hoy = timezone.localdate()
+        total = 0
+
+        fin_cerrado = min(fecha_fin, hoy - timedelta(days=1))
+        if fecha_inicio <= fin_cerrado:
+            total += por_sede(AsistenciaDiaria.objects.filter(
+                fecha__gte=fecha_inicio, fecha__lte=fin_cerrado
+            ), sede_id).aggregate(total=Sum('total'))['total'] or 0
+
+        if fecha_inicio <= hoy <= fecha_fin:
+            total += por_sede(Asistencia.objects.filter(fecha=hoy), sede_id).count()
+
+        return total
+
+    @staticmethod
+    def contar_total(sede_id=None):
+        """Total histórico: meses cerrados desde el rollup mensual + mes en curso"""
+        hoy = timezone.localdate()
+        inicio_mes = hoy.replace(day=1)
+
+        return AsistenciaRollupDAO.contar_meses_cerrados(sede_id) + AsistenciaRollupDAO.contar_rango(inicio_mes, hoy, sede_id)
+
+    @staticmethod
+    def contar_meses_cerrados(sede_id=None):
+        """Total de los meses anteriores al actual, desde el rollup mensual"""
+        hoy = timezone.localdate()
+        meses_cerrados = AsistenciaMensual.objects.filter(
+            anio__lt=hoy.year
+        ) | AsistenciaMensual.objects.filter(anio=hoy.year, mes__lt=hoy.month)
+        return por_sede(meses_cerrados, sede_id).aggregate(total=Sum('total'))['total'] or 0
+
+    @staticmethod
+    def totales_por_dia_y_sede(fecha_inicio, fecha_fin, sede_id=None):
+        """
+        Diccionario {(fecha, sede_id): total} del rango: días cerrados del rollup,
+        hoy de las filas crudas. Sirve a la vez para la serie diaria y para
+        los totales de cada sede.
+        """
+        hoy = timezone.localdate()
+        totales = {}
+        fin_cerrado = min(fecha_fin, hoy - timedelta(days=1))
+        if fecha_inicio <= fin_cerrado:
+            for fecha, sede, suma in por_sede(AsistenciaDiaria.objects.filter(
+                fecha__gte=fecha_inicio, fecha__lte=fin_cerrado
+            ), sede_id).values('fecha', 'sede_id').annotate(suma=Sum('total')).order_by().values_list(
+                'fecha', 'sede_id', 'suma'
+            ):
+                totales[fecha, sede] = suma
+        if fecha_inicio <= hoy <= fecha_fin:
+            for sede, total in por_sede(Asistencia.objects.filter(fecha=hoy), sede_id).values(
+                'sede_id'
+            ).annotate(total=Count('id')).order_by().values_list('sede_id', 'total'):
+                totales[hoy, sede] = total
+        return totales
+
+
+class VisitantesDAO:
+    """
+    Bitmaps diarios de visitantes por sede para contar clientes únicos en
+    cualquier rango. Los de toda la cadena salen del OR de todas las sedes.
+    """
+
+    @staticmethod
+    def bit_de(cliente_id):
+        indice, _ = IndiceVisitante.objects.get_or_create(cliente_id=cliente_id)
+        return indice.bit
+
+    @staticmethod
+    def _bloquear_dia(fecha, sede_id):
+        # first(): sin sede la llave única no aplica (NULL) y una carrera puede dejar dos filas
+        dia = VisitantesDia.objects.select_for_update().filter(fecha=fecha, sede_id=sede_id).order_by('pk').first()
+        if dia:
+            return dia
+        try:
+            with transaction.atomic():
+                return VisitantesDia.objects.create(fecha=fecha, sede_id=sede_id)
+        except IntegrityError:
+            # Otra petición creó el día al mismo tiempo
+            return VisitantesDia.objects.select_for_update().get(fecha=fecha, sede_id=sede_id)
+
+    @staticmethod
+    def registrar(cliente_id, fecha, sede_id=None):
+        """Enciende el bit del cliente en el bitmap del día de la sede"""
+        bit = VisitantesDAO.bit_de(cliente_id)
+        with transaction.atomic():
+            dia = VisitantesDAO._bloquear_dia(fecha, sede_id)
+            bitmap = bitmaps.activar_bit(dia.bitmap, bit)
+            if bitmap != bytes(dia.bitmap):
+                VisitantesDia.objects.filter(pk=dia.pk).update(bitmap=bitmap)
+
+    @staticmethod
+    def descontar(asistencia):
+        """Apaga el bit del cliente si la asistencia eliminada era su única del día en la sede"""
+        if Asistencia.objects.filter(
+            cliente_id=asistencia.cliente_id, sede_id=asistencia.sede_id, fecha=asistencia.fecha
+        ).exclude(pk=asistencia.pk).exists():
+            return
+        bit = IndiceVisitante.objects.filter(cliente_id=asistencia.cliente_id).values_list('bit', flat=True).first()
+        if bit is None:
+            return
+        with transaction.atomic():
+            for dia in VisitantesDia.objects.select_for_update().filter(
+                fecha=asistencia.fecha, sede_id=asistencia.sede_id
+            ):
+                bitmap = bitmaps.apagar_bit(dia.bitmap, bit)
+                if bitmap != bytes(dia.bitmap):
+                    VisitantesDia.objects.filter(pk=dia.pk).update(bitmap=bitmap)
+
+    @staticmethod
+    def mascara(clientes):
+        """Bitmap con los bits de un grupo de clientes (queryset o lista de ids)"""
+        return bitmaps.construir(
+            IndiceVisitante.objects.filter(cliente__in=clientes).values_list('bit', flat=True)
+        )
+
+    @staticmethod
+    def _union_rango(fecha_inicio, fecha_fin, clientes=None, sede_id=None):
+        union = bitmaps.unir(
+            por_sede(VisitantesDia.objects.filter(
+                fecha__gte=fecha_inicio, fecha__lte=fecha_fin
+            ), sede_id).values_list('bitmap', flat=True)
+        )
+        if clientes is not None:
+            union = bitmaps.intersecar(union, VisitantesDAO.mascara(clientes))
+        return union
+
+    @staticmethod
+    def contar_unicos(fecha_inicio, fecha_fin, clientes=None, sede_id=None):
+        """
+        Clientes distintos que asistieron entre dos fechas (inclusive). Con
+        `sede_id`, los que entraron a esa sede (sean o no de ella); con
+        `clientes` se restringe el conteo a ese grupo (cohorte).
+        """
+        return bitmaps.contar(VisitantesDAO._union_rango(fecha_inicio, fecha_fin, clientes, sede_id))
+
+    @staticmethod
+    def visitantes(fecha_inicio, fecha_fin, clientes=None, sede_id=None):
+        """Ids de los clientes que asistieron entre dos fechas"""
+        bits = bitmaps.bits_encendidos(VisitantesDAO._union_rango(fecha_inicio, fecha_fin, clientes, sede_id))
+        return list(IndiceVisitante.objects.filter(bit__in=bits).values_list('cliente_id', flat=True))
+
+    @staticmethod
+    def reconstruir(fecha_inicio, fecha_fin):
+        """Regenera desde las asistencias crudas los bitmaps de un rango de fechas (sin los días archivados)"""
+        fecha_inicio = ArchivoDAO.inicio_vivo('asistencias', fecha_inicio)
+        if fecha_inicio > fecha_fin:
+            return
+        asistencias = Asistencia.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin)
+
+        with transaction.atomic():
+            sin_indice = asistencias.filter(
+                cliente__indice_visitante__isnull=True
+            ).values_list('cliente_id', flat=True).distinct().order_by('cliente_id')
+            IndiceVisitante.objects.bulk_create(
+                [IndiceVisitante(cliente_id=cliente_id) for cliente_id in sin_indice],
+                ignore_conflicts=True,
+            )
+
+            bits_por_dia = {}
+            for sede_id, fecha, bit in asistencias.values_list(
+                'sede_id', 'fecha', 'cliente__indice_visitante__bit'
+            ).distinct().order_by('fecha'):
+                bits_por_dia.setdefault((sede_id, fecha), []).append(bit)
+
+            VisitantesDia.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin).delete()
+            VisitantesDia.objects.bulk_create(
+                [
+                    VisitantesDia(sede_id=sede_id, fecha=fecha, bitmap=bitmaps.construir(bits))
+                    for (sede_id, fecha), bits in bits_por_dia.items()
+                ],
+                batch_size=500,
+            )
+
+
+class OcupacionDAO:
+    """
+    Ocupación estimada por sede: contadores en memoria para el momento actual e
+    historial por hora. Con sede_id=None se trabaja con toda la cadena.
+    """
+
+    # sede_id (None = toda la cadena) -> ContadorOcupacion de este proceso
+    contadores = {}
+
+    @staticmethod
+    def _contador(sede_id):
+        contador = OcupacionDAO.contadores.get(sede_id)
+        if contador is None:
+            contador = OcupacionDAO.contadores.setdefault(
+                sede_id, ocupacion.ContadorOcupacion(settings.OCUPACION_DURACION_SESION)
+            )
+        return contador
+
+    @staticmethod
+    def _entradas(fecha_inicio, fecha_fin, sede_id=None):
+        """Minutos absolutos de las entradas entre dos fechas (inclusive)"""
+        return ocupacion.minutos_de(
+            por_sede(Asistencia.objects.filter(
+                fecha__gte=fecha_inicio, fecha__lte=fecha_fin
+            ), sede_id).order_by().values_list('fecha', 'hora').iterator(chunk_size=10000)
+        )
+
+    @staticmethod
+    def _ahora():
+        ahora = timezone.localtime()
+        return ahora.date(), ocupacion.minuto_de(ahora.date(), ahora.time())
+
+    @staticmethod
+    def registrar(asistencia):
+        """Suma una asistencia recién creada a los contadores en memoria de su sede y de la cadena"""
+        minuto = ocupacion.minuto_de(asistencia.fecha, asistencia.hora)
+        for sede_id in {None, asistencia.sede_id}:
+            contador = OcupacionDAO.contadores.get(sede_id)
+            if contador is not None:
+                contador.registrar(minuto)
+
+    @staticmethod
+    def actual(sede_id=None):
+        """Personas presentes ahora; solo consulta la base de datos al resincronizar"""
+        contador = OcupacionDAO._contador(sede_id)
+        hoy, minuto = OcupacionDAO._ahora()
+        if contador.desactualizado(settings.OCUPACION_RESINCRONIZAR):
+            desde = hoy - timedelta(days=contador.duracion // ocupacion.MINUTOS_DIA + 1)
+            contador.reiniciar(OcupacionDAO._entradas(desde, hoy, sede_id), minuto)
+        return contador.actual(minuto)
+
+    @staticmethod
+    def por_hora(fecha, sede_id=None):
+        """Promedio y máximo por hora de un día calculados sobre las filas crudas (listas de 24)"""
+        entradas = OcupacionDAO._entradas(fecha - timedelta(days=1), fecha, sede_id)
+        promedios, maximos = ocupacion.ocupacion_horaria(
+            entradas, fecha, fecha, settings.OCUPACION_DURACION_SESION
+        )
+        return [round(float(v), 1) for v in promedios[0]], [int(v) for v in maximos[0]]
+
+    @staticmethod
+    def tipica_por_hora(dia_semana, semanas=8, sede_id=None):
+        """
+        Ocupación promedio típica de un día de la semana (0 = lunes) en las
+        últimas `semanas`, desde el historial: {hora: promedio}
+        """
+        hoy = timezone.localdate()
+        fechas = [
+            hoy - timedelta(days=dias)
+            for dias in range(1, semanas * 7 + 1)
+            if (hoy - timedelta(days=dias)).weekday() == dia_semana
+        ]
+        filas = por_sede(OcupacionHoraria.objects.filter(fecha__in=fechas), sede_id).values('hora').annotate(
+            suma=Sum('promedio')
+        ).order_by().values_list('hora', 'suma')
+        # Las horas sin fila tuvieron ocupación 0: se promedia sobre todos los días.
+        # Para la cadena, el promedio es la suma de los promedios de cada sede
+        return {hora: round(float(suma) / len(fechas), 1) for hora, suma in filas}
+
+    @staticmethod
+    def reconstruir(fecha_inicio, fecha_fin):
+        """Recalcula en bloque la ocupación por sede y hora de un rango desde las asistencias crudas (sin los días archivados)"""
+        fecha_inicio = ArchivoDAO.inicio_vivo('asistencias', fecha_inicio)
+        if fecha_inicio > fecha_fin:
+            return
+        # El día anterior aporta las sesiones que siguen abiertas a medianoche
+        entradas = {}
+        for sede_id, fecha, hora in Asistencia.objects.filter(
+            fecha__gte=fecha_inicio - timedelta(days=1), fecha__lte=fecha_fin
+        ).order_by().values_list('sede_id', 'fecha', 'hora').iterator(chunk_size=10000):
+            entradas.setdefault(sede_id, []).append(ocupacion.minuto_de(fecha, hora))
+
+        nuevas = [
+            OcupacionHoraria(sede_id=sede_id, fecha=fecha, hora=hora, promedio=promedio, maxima=maxima)
+            for sede_id, minutos in entradas.items()
+            for fecha, hora, promedio, maxima in ocupacion.filas_horarias(
+                minutos, fecha_inicio, fecha_fin, settings.OCUPACION_DURACION_SESION
+            )
+        ]
+
+        with transaction.atomic():
+            OcupacionHoraria.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin).delete()
+            OcupacionHoraria.objects.bulk_create(nuevas, batch_size=1000)
+
 
 class PagoDAO:
     """Data Access Object para gestionar Pagos"""
+
+    # Columnas que muestran la lista y las exportaciones de pagos
+    CAMPOS_LISTA = (
+        'id', 'concepto', 'tipo_pago', 'monto', 'metodo_pago', 'estado', 'fecha_pago',
+        'cliente', 'cliente__documento', 'cliente__nombres', 'cliente__apellidos',
+        'membresia', 'membresia__nombre', 'usuario_registro', 'usuario_registro__nombre',
+    )
+
+    @staticmethod
+    def lista(pagos=None):
+        """Proyección para listas: cliente, membresía y usuario en un solo JOIN"""
+        if pagos is None:
+            pagos = Pago.objects.all()
+        return pagos.select_related(
+            'cliente', 'membresia', 'usuario_registro'
+        ).only(*PagoDAO.CAMPOS_LISTA)
     
     @staticmethod
-    def obtener_todos():
-        return Pago.objects.all().order_by('-fecha_pago')
+    def obtener_todos(sede_id=None):
+        return PagoDAO.lista(Pago.objects.de_sede(sede_id)).order_by('-fecha_pago')
     
     @staticmethod
-    def obtener_pendientes():
-        return Pago.objects.filter(estado='pendiente').order_by('-fecha_pago')
+    def obtener_pendientes(sede_id=None):
+        return PagoDAO.lista(Pago.objects.de_sede(sede_id).pendientes()).order_by('-fecha_pago')
     
     @staticmethod
-    def obtener_validados():
-        return Pago.objects.filter(estado='validado').order_by('-fecha_pago')
+    def obtener_validados(sede_id=None):
+        return PagoDAO.lista(Pago.objects.de_sede(sede_id).validados()).order_by('-fecha_pago')
     
     @staticmethod
-    def obtener_rechazados():
-        return Pago.objects.filter(estado='rechazado').order_by('-fecha_pago')
+    def obtener_rechazados(sede_id=None):
+        return PagoDAO.lista(Pago.objects.de_sede(sede_id).rechazados()).order_by('-fecha_pago')
     
     @staticmethod
     def obtener_por_cliente(cliente):
@@ -299,74 +986,31 @@ class PagoDAO:
         pago.delete()
     
     @staticmethod
-    def obtener_estadisticas():
-        """Obtener estadísticas de pagos - CORREGIDO CON DATETIME"""
-        ahora = timezone.now()
-        hoy = ahora.date()
-        inicio_mes = hoy.replace(day=1)
-        
-        # Rangos de datetime
-        inicio_dia = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
-        fin_dia = ahora.replace(hour=23, minute=59, second=59, microsecond=999999)
-        inicio_mes_dt = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Solo contar pagos VALIDADOS con rangos de datetime
-        stats = {
-            'total_pagos': Pago.objects.filter(estado='validado').count(),
-            'total_ingresos': float(Pago.objects.filter(estado='validado').aggregate(Sum('monto'))['monto__sum'] or 0),
-            'pagos_pendientes': Pago.objects.filter(estado='pendiente').count(),
-            'pagos_rechazados': Pago.objects.filter(estado='rechazado').count(),
-            'pagos_hoy': Pago.objects.filter(
-                fecha_pago__gte=inicio_dia,
-                fecha_pago__lte=fin_dia,
-                estado='validado'
-            ).count(),
-            'ingresos_hoy': float(Pago.objects.filter(
-                fecha_pago__gte=inicio_dia,
-                fecha_pago__lte=fin_dia,
-                estado='validado'
-            ).aggregate(Sum('monto'))['monto__sum'] or 0),
-            'ingresos_mes': float(Pago.objects.filter(
-                fecha_pago__gte=inicio_mes_dt,
-                fecha_pago__lte=ahora,
-                estado='validado'
-            ).aggregate(Sum('monto'))['monto__sum'] or 0),
-        }
-        
-        # Pagos por método (solo validados)
-        pagos_por_metodo = Pago.objects.filter(estado='validado').values('metodo_pago').annotate(
-            total=Count('id'),
-            monto_total=Sum('monto')
-        ).order_by('-monto_total')
-        
-        stats['pagos_por_metodo'] = list(pagos_por_metodo)
-        
-        # Pagos por tipo (solo validados)
-        pagos_por_tipo = Pago.objects.filter(estado='validado').values('tipo_pago').annotate(
-            total=Count('id'),
-            monto_total=Sum('monto')
-        ).order_by('-monto_total')
-        
-        stats['pagos_por_tipo'] = list(pagos_por_tipo)
-        
-        return stats
+    def obtener_estadisticas(sede_id=None):
+        """Obtener estadísticas de pagos (una sola consulta agregada)"""
+        from .estadisticas import estadisticas_pagos
+        return estadisticas_pagos(sede_id=sede_id)
     
     @staticmethod
     def obtener_reporte_fechas(fecha_inicio, fecha_fin):
-        """Obtener pagos validados en un rango de fechas"""
-        inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
-        fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
+        """
+        Obtener pagos validados en un rango de fechas (con el archivo si el rango
+        empieza antes del corte). Las fechas llegan como date o texto YYYY-MM-DD.
+        """
+        inicio, fin = parsear_fecha(fecha_inicio), parsear_fecha(fecha_fin)
+        if inicio is None or fin is None:
+            raise ValueError('Fechas del reporte inválidas: se espera AAAA-MM-DD')
         
-        return Pago.objects.filter(
-            fecha_pago__date__gte=inicio,
-            fecha_pago__date__lte=fin,
-            estado='validado'
+        return ArchivoDAO.consulta(
+            'pagos',
+            lambda pagos: PagoDAO.lista(pagos.validados().en_rango(inicio, fin)),
+            inicio, fin,
         ).order_by('-fecha_pago')
     
     @staticmethod
     def obtener_ingresos_por_mes(meses=6):
         """Obtener ingresos de los últimos N meses"""
-        hoy = timezone.now().date()
+        hoy = timezone.localdate()
         ingresos = []
         
         for i in range(meses - 1, -1, -1):
@@ -379,10 +1023,8 @@ class PagoDAO:
                 siguiente_mes = fecha.replace(day=28) + timedelta(days=4)
                 fin_mes = siguiente_mes - timedelta(days=siguiente_mes.day)
             
-            ingresos_mes = Pago.objects.filter(
-                fecha_pago__date__gte=inicio_mes,
-                fecha_pago__date__lte=fin_mes,
-                estado='validado'
+            ingresos_mes = Pago.objects.validados().en_rango(
+                inicio_mes, fin_mes
             ).aggregate(Sum('monto'))['monto__sum'] or 0
             
             ingresos.append({
@@ -395,7 +1037,7 @@ class PagoDAO:
     @staticmethod
     def obtener_top_clientes(limit=10):
         """Obtener los clientes que más han pagado"""
-        return Pago.objects.filter(estado='validado').values(
+        return Pago.objects.validados().values(
             'cliente__documento',
             'cliente__nombres',
             'cliente__apellidos'
@@ -403,3 +1045,306 @@ class PagoDAO:
             total_pagado=Sum('monto'),
             cantidad_pagos=Count('id')
         ).order_by('-total_pagado')[:limit]
+
+
+class ResumenClienteDAO:
+    """Data Access Object para el resumen acumulado de cada cliente"""
+
+    # Cantidad de registros recientes que se muestran en el perfil
+    LIMITE_RECIENTES = 10
+    CACHE_TIMEOUT = 60 * 60
+
+    @staticmethod
+    def clave_cache(cliente_id):
+        return f'perfil_cliente:{cliente_id}'
+
+    @staticmethod
+    def invalidar(*clientes_ids):
+        cache.delete_many([ResumenClienteDAO.clave_cache(cliente_id) for cliente_id in clientes_ids])
+
+    @staticmethod
+    def obtener(cliente):
+        resumen, _ = ResumenCliente.objects.get_or_create(cliente_id=cliente.pk)
+        return resumen
+
+    @staticmethod
+    def _incrementar(cliente_id, **cambios):
+        incrementar_o_crear(ResumenCliente, {'cliente_id': cliente_id}, **cambios)
+        ResumenClienteDAO.invalidar(cliente_id)
+
+    @staticmethod
+    def sumar_pago(cliente_id, monto, cantidad=1):
+        """Suma pagos validados"""
+        ResumenClienteDAO._incrementar(
+            cliente_id,
+            total_pagado=F('total_pagado') + monto,
+            total_pagos=F('total_pagos') + cantidad,
+        )
+
+    @staticmethod
+    def restar_pago(cliente_id, monto, cantidad=1):
+        """
+        Descuenta pagos validados. Solo actualiza una fila existente: al borrar
+        un cliente en cascada no se debe crear su resumen de nuevo
+        """
+        ResumenCliente.objects.filter(cliente_id=cliente_id).update(
+            total_pagado=F('total_pagado') - monto,
+            total_pagos=F('total_pagos') - cantidad,
+        )
+        ResumenClienteDAO.invalidar(cliente_id)
+
+    @staticmethod
+    def sumar_asistencia(cliente_id, fecha):
+        ResumenClienteDAO._incrementar(
+            cliente_id,
+            total_asistencias=F('total_asistencias') + 1,
+            ultima_asistencia=Greatest(
+                Coalesce(F('ultima_asistencia'), Value(fecha, output_field=DateField())),
+                Value(fecha, output_field=DateField()),
+            ),
+        )
+
+    @staticmethod
+    def restar_asistencia(cliente_id, fecha):
+        """Descuenta una asistencia; si era la última, vuelve a leer la fecha más reciente"""
+        resumen = ResumenCliente.objects.filter(cliente_id=cliente_id)
+        if resumen.update(total_asistencias=F('total_asistencias') - 1):
+            if resumen.filter(ultima_asistencia__lte=fecha).exists():
+                ultimas = [
+                    modelo.objects.filter(cliente_id=cliente_id).aggregate(ultima=Max('fecha'))['ultima']
+                    for modelo in ArchivoDAO.modelos('asistencias')
+                ]
+                resumen.update(ultima_asistencia=max(filter(None, ultimas), default=None))
+        ResumenClienteDAO.invalidar(cliente_id)
+
+    @staticmethod
+    def sumar_bono(cliente_id, dias):
+        ResumenClienteDAO._incrementar(cliente_id, total_dias_bono=F('total_dias_bono') + dias)
+
+    @staticmethod
+    def recalcular(cliente_id):
+        """Reconstruye el resumen desde las tablas origen y su archivo (corrige cualquier desfase)"""
+        pagos = {'total': 0, 'cantidad': 0}
+        for modelo in ArchivoDAO.modelos('pagos'):
+            parcial = modelo.objects.filter(cliente_id=cliente_id, estado='validado').aggregate(
+                total=Sum('monto'), cantidad=Count('id')
+            )
+            pagos['total'] += parcial['total'] or 0
+            pagos['cantidad'] += parcial['cantidad']
+        asistencias = {'cantidad': 0, 'ultima': None}
+        for modelo in ArchivoDAO.modelos('asistencias'):
+            parcial = modelo.objects.filter(cliente_id=cliente_id).aggregate(
+                cantidad=Count('id'), ultima=Max('fecha')
+            )
+            asistencias['cantidad'] += parcial['cantidad']
+            asistencias['ultima'] = max(filter(None, (asistencias['ultima'], parcial['ultima'])), default=None)
+        bonos = Bono.objects.filter(cliente_id=cliente_id, aplicado=True).aggregate(dias=Sum('dias_regalo'))
+
+        ResumenCliente.objects.update_or_create(
+            cliente_id=cliente_id,
+            defaults={
+                'total_pagado': pagos['total'],
+                'total_pagos': pagos['cantidad'],
+                'total_asistencias': asistencias['cantidad'],
+                'ultima_asistencia': asistencias['ultima'],
+                'total_dias_bono': bonos['dias'] or 0,
+            }
+        )
+        ResumenClienteDAO.invalidar(cliente_id)
+
+    @staticmethod
+    def historial_reciente(cliente):
+        return HistorialMembresia.objects.filter(cliente=cliente).select_related('membresia')[:ResumenClienteDAO.LIMITE_RECIENTES]
+
+    @staticmethod
+    def pagos_recientes(cliente):
+        return Pago.objects.filter(cliente=cliente).select_related('membresia').order_by('-fecha_pago')[:ResumenClienteDAO.LIMITE_RECIENTES]
+
+    @staticmethod
+    def bonos_recientes(cliente):
+        return Bono.objects.filter(cliente=cliente).order_by('-fecha_otorgado')[:ResumenClienteDAO.LIMITE_RECIENTES]
+
+    @staticmethod
+    def obtener_perfil_json(cliente):
+        """Perfil del cliente serializado en JSON, cacheado hasta la siguiente escritura"""
+        clave = ResumenClienteDAO.clave_cache(cliente.pk)
+        perfil = cache.get(clave)
+        if perfil is not None:
+            return perfil
+
+        resumen = ResumenClienteDAO.obtener(cliente)
+        datos = {
+            'documento': cliente.documento,
+            'nombres': cliente.nombres,
+            'apellidos': cliente.apellidos,
+            'estado': cliente.estado,
+            'membresia_actual': cliente.membresia_actual.nombre if cliente.membresia_actual else None,
+            'fecha_fin_membresia': cliente.fecha_fin_membresia,
+            'totales': {
+                'total_pagado': resumen.total_pagado,
+                'total_pagos': resumen.total_pagos,
+                'total_asistencias': resumen.total_asistencias,
+                'ultima_asistencia': resumen.ultima_asistencia,
+                'total_dias_bono': resumen.total_dias_bono,
+            },
+            'historial': [
+                {
+                    'membresia': item.membresia.nombre if item.membresia else None,
+                    'fecha_inicio': item.fecha_inicio,
+                    'fecha_fin': item.fecha_fin,
+                    'precio_pagado': item.precio_pagado,
+                }
+                for item in ResumenClienteDAO.historial_reciente(cliente)
+            ],
+            'pagos': list(
+                Pago.objects.filter(cliente=cliente).order_by('-fecha_pago').values(
+                    'id', 'concepto', 'monto', 'metodo_pago', 'estado', 'fecha_pago'
+                )[:ResumenClienteDAO.LIMITE_RECIENTES]
+            ),
+            'bonos': list(
+                Bono.objects.filter(cliente=cliente).order_by('-fecha_otorgado').values(
+                    'id', 'tipo_bono', 'dias_regalo', 'motivo', 'aplicado', 'fecha_otorgado'
+                )[:ResumenClienteDAO.LIMITE_RECIENTES]
+            ),
+        }
+        perfil = json.dumps(datos, cls=DjangoJSONEncoder)
+        cache.set(clave, perfil, ResumenClienteDAO.CACHE_TIMEOUT)
+        return perfil
+
+
+class ArchivoDAO:
+    """
+    Archivo de asistencias y pagos antiguos. Los registros anteriores a la fecha
+    de corte de su tabla se mueven a la tabla de archivo (mismas columnas e ids);
+    los rollups, bitmaps y la ocupación por hora de esos días se conservan.
+
+    Las consultas por rango solo leen el archivo cuando el rango empieza antes
+    del corte; si además termina después, se unen ambas tablas con UNION ALL.
+    """
+
+    CLAVE_CORTES = 'archivo:cortes'
+    CLAVE_AGREGADO = 'archivo:{tabla}:{corte}:{nombre}:{sede_id}'
+
+    # tabla -> (modelo vivo, modelo de archivo)
+    MODELOS = {
+        'asistencias': (Asistencia, AsistenciaArchivada),
+        'pagos': (Pago, PagoArchivado),
+    }
+
+    @staticmethod
+    def cortes():
+        """{tabla: fecha_corte}, cacheado hasta el siguiente archivado"""
+        cortes = cache.get(ArchivoDAO.CLAVE_CORTES)
+        if cortes is None:
+            cortes = dict(CorteArchivo.objects.values_list('tabla', 'fecha_corte'))
+            cache.set(ArchivoDAO.CLAVE_CORTES, cortes, None)
+        return cortes
+
+    @staticmethod
+    def corte(tabla):
+        return ArchivoDAO.cortes().get(tabla)
+
+    @staticmethod
+    def inicio_vivo(tabla, fecha):
+        """Primera fecha desde `fecha` que sigue en la tabla viva"""
+        corte = ArchivoDAO.corte(tabla)
+        return max(fecha, corte) if corte else fecha
+
+    @staticmethod
+    def modelos(tabla, fecha_inicio=None, fecha_fin=None):
+        """Modelos con registros en el rango (inclusive): el vivo, el archivo o ambos"""
+        vivo, archivo = ArchivoDAO.MODELOS[tabla]
+        corte = ArchivoDAO.corte(tabla)
+        if corte is None or (fecha_inicio is not None and fecha_inicio >= corte):
+            return [vivo]
+        if fecha_fin is not None and fecha_fin < corte:
+            return [archivo]
+        return [vivo, archivo]
+
+    @staticmethod
+    def consulta(tabla, preparar, fecha_inicio=None, fecha_fin=None):
+        """
+        Queryset del rango: `preparar(queryset)` aplica los mismos filtros y
+        proyección a cada tabla. Con ambas tablas el resultado es una UNION ALL
+        que admite order_by, count y slicing (no más filtros); las filas del
+        archivo se leen como instancias del modelo vivo.
+        """
+        consultas = [
+            preparar(modelo.objects.all()).order_by()
+            for modelo in ArchivoDAO.modelos(tabla, fecha_inicio, fecha_fin)
+        ]
+        if len(consultas) == 1:
+            return consultas[0]
+        return consultas[0].union(*consultas[1:], all=True)
+
+    @staticmethod
+    def agregado_archivo(tabla, nombre, preparar, sede_id=None):
+        """
+        aggregate() sobre el archivo de una tabla, cacheado por corte: el archivo
+        solo cambia al archivar. Diccionario vacío si la tabla no tiene archivo.
+        """
+        corte = ArchivoDAO.corte(tabla)
+        if corte is None:
+            return {}
+        clave = ArchivoDAO.CLAVE_AGREGADO.format(tabla=tabla, corte=corte, nombre=nombre, sede_id=sede_id)
+        fila = cache.get(clave)
+        if fila is None:
+            _, archivo = ArchivoDAO.MODELOS[tabla]
+            fila = preparar(por_sede(archivo.objects.all(), sede_id))
+            cache.set(clave, fila, None)
+        return fila
+
+    @staticmethod
+    def _mover(vivo, archivo, registros, lote):
+        """Copia los registros al archivo y los borra de la tabla viva, por lotes de ids"""
+        campos = [campo.attname for campo in archivo._meta.concrete_fields]
+        movidos = 0
+        while True:
+            with transaction.atomic():
+                filas = list(registros.order_by('id').values(*campos)[:lote])
+                if not filas:
+                    return movidos
+                archivo.objects.bulk_create([archivo(**fila) for fila in filas])
+                # Sin señales: resúmenes y rollups ya cuentan estos registros
+                borrar_por_ids(vivo, [fila['id'] for fila in filas])
+            movidos += len(filas)
+
+    @staticmethod
+    def _registrar_corte(tabla, corte, movidos):
+        registro, creado = CorteArchivo.objects.get_or_create(
+            tabla=tabla, defaults={'fecha_corte': corte, 'registros': movidos}
+        )
+        if not creado:
+            registro.fecha_corte = max(registro.fecha_corte, corte)
+            registro.registros += movidos
+            registro.save()
+        cache.delete(ArchivoDAO.CLAVE_CORTES)
+
+    @staticmethod
+    def archivar_asistencias(corte, lote=5000):
+        """
+        Mueve al archivo las asistencias anteriores a `corte`. Antes recalcula
+        rollups, bitmaps y ocupación de esos días, que desde entonces quedan fijos.
+        """
+        antiguas = Asistencia.objects.filter(fecha__lt=corte)
+        primera = antiguas.aggregate(primera=Min('fecha'))['primera']
+        if primera is None:
+            return 0
+
+        ultima = corte - timedelta(days=1)
+        AsistenciaRollupDAO.compactar(primera, ultima)
+        VisitantesDAO.reconstruir(primera, ultima)
+        OcupacionDAO.reconstruir(primera, ultima)
+
+        movidos = ArchivoDAO._mover(Asistencia, AsistenciaArchivada, antiguas, lote)
+        ArchivoDAO._registrar_corte('asistencias', corte, movidos)
+        return movidos
+
+    @staticmethod
+    def archivar_pagos(corte, lote=5000):
+        """Mueve al archivo los pagos ya resueltos anteriores a `corte`; los pendientes siguen vivos"""
+        inicio_corte = timezone.make_aware(datetime.combine(corte, time.min))
+        antiguos = Pago.objects.filter(fecha_pago__lt=inicio_corte).exclude(estado='pendiente')
+        movidos = ArchivoDAO._mover(Pago, PagoArchivado, antiguos, lote)
+        ArchivoDAO._registrar_corte('pagos', corte, movidos)
+        return movidos
@@ -82,7 +82,7 @@ class EmailService:
             fecha_fin_membresia__lte=fecha_limite,
             fecha_fin_membresia__gte=timezone.now().date(),
             estado='activo'
-        )
+        ).con_vencimiento(dias_aviso)
         
         emails_enviados = 0
         emails_fallidos = 0
@@ -90,7 +90,7 @@ class EmailService:
         messages = []
         for cliente in clientes_por_vencer:
             try:
-                dias_restantes = (cliente.fecha_fin_membresia - timezone.now().date()).days
+                dias_restantes = cliente.dias_para_vencer()
                 
                 subject = f'¡Tu membresía en FITTECH vence en {dias_restantes} días!'
                 
@@ -0,0 +1,247 @@
+"""
+Estadísticas consolidadas para reportes y paneles.
+
+Cada función hace una sola consulta sobre su tabla con agregación condicional
+(Count/Sum con filter=Q(...)) en vez de un COUNT o SUM por cada filtro. Con
+sede_id se restringen a una sede; sin él cubren toda la cadena.
+
+Clientes, pagos y asistencias se agregan agrupados por sede (las funciones
+*_por_sede): los totales son la suma de esas filas, y la comparación entre
+sedes se arma con las mismas filas sin volver a consultar.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .cache import CatalogoMembresias
+from .dao import ArchivoDAO, AsistenciaRollupDAO, ClienteDAO, SedeDAO, por_sede
+from .models import Cliente, Pago, Usuario
+
+
+def _limites_periodo():
+    """Inicio del día y del mes en la zona horaria local, y el inicio de mañana"""
+    ahora = timezone.localtime()
+    inicio_dia = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
+    return inicio_dia, inicio_dia.replace(day=1), inicio_dia + timedelta(days=1)
+
+
+def agrupar_por_sede(queryset, sede_id, agregados):
+    """Los agregados de cada sede en una sola consulta agrupada: {sede_id: fila}"""
+    filas = por_sede(queryset, sede_id).values('sede_id').annotate(**agregados).order_by()
+    return {fila.pop('sede_id'): fila for fila in filas}
+
+
+def sumar_sedes(por_sede, claves):
+    """Totales de las filas de varias sedes (0 si no hay filas)"""
+    return {clave: sum(fila[clave] or 0 for fila in por_sede.values()) for clave in claves}
+
+
+def _agregados_clientes(dias_por_vencer):
+    # La misma fecha local que _limites_periodo, no la de UTC
+    hoy = timezone.localdate()
+    return {
+        'total_clientes': Count('id'),
+        'clientes_activos': Count('id', filter=Q(estado='activo')),
+        'clientes_inactivos': Count('id', filter=Q(estado='inactivo')),
+        'clientes_pendientes': Count('id', filter=Q(estado='pendiente')),
+        'clientes_por_vencer': Count('id', filter=ClienteDAO.filtro_por_vencer(dias_por_vencer, hoy)),
+        'clientes_vencidos': Count('id', filter=Q(estado='activo', fecha_fin_membresia__lt=hoy)),
+    }
+
+
+def clientes_por_sede(dias_por_vencer=7, sede_id=None):
+    """Los conteos de estadisticas_clientes de cada sede: {sede_id: conteos}"""
+    return agrupar_por_sede(Cliente.objects.all(), sede_id, _agregados_clientes(dias_por_vencer))
+
+
+def estadisticas_clientes(dias_por_vencer=7, sede_id=None, por_sede=None):
+    """
+    Clientes por estado, por vencer y vencidos sin actualizar. `por_sede` es el
+    resultado de clientes_por_sede si ya se consultó.
+    """
+    if por_sede is None:
+        por_sede = clientes_por_sede(dias_por_vencer, sede_id)
+    return sumar_sedes(por_sede, _agregados_clientes(dias_por_vencer))
+
+
+def _agregados_pagos():
+    """Todos los agregados de pagos y, aparte, los históricos que también se suman del archivo"""
+    inicio_dia, inicio_mes, manana = _limites_periodo()
+    validado = Q(estado='validado')
+
+    agregados = {'pagos_registrados': Count('id')}
+    for estado, _ in Pago.ESTADOS_PAGO:
+        agregados[f'estado_{estado}_total'] = Count('id', filter=Q(estado=estado))
+        agregados[f'estado_{estado}_monto'] = Sum('monto', filter=Q(estado=estado))
+    for campo, opciones in (('metodo_pago', Pago.METODOS_PAGO), ('tipo_pago', Pago.TIPOS_PAGO)):
+        for valor, _ in opciones:
+            filtro = validado & Q(**{campo: valor})
+            agregados[f'{campo}_{valor}_total'] = Count('id', filter=filtro)
+            agregados[f'{campo}_{valor}_monto'] = Sum('monto', filter=filtro)
+    historicos = dict(agregados)
+    hoy = validado & Q(fecha_pago__gte=inicio_dia, fecha_pago__lt=manana)
+    mes = validado & Q(fecha_pago__gte=inicio_mes, fecha_pago__lt=manana)
+    agregados.update(
+        pagos_hoy=Count('id', filter=hoy),
+        ingresos_hoy=Sum('monto', filter=hoy),
+        pagos_mes=Count('id', filter=mes),
+        ingresos_mes=Sum('monto', filter=mes),
+    )
+    return agregados, historicos
+
+
+def pagos_por_sede(sede_id=None):
+    """Los agregados de estadisticas_pagos de cada sede, solo de la tabla viva: {sede_id: fila}"""
+    agregados, _ = _agregados_pagos()
+    return agrupar_por_sede(Pago.objects.all(), sede_id, agregados)
+
+
+def estadisticas_pagos(sede_id=None, por_sede=None):
+    """
+    Cantidad y monto de pagos por estado, de los validados de hoy y del mes, y
+    de los validados por método y por tipo de pago. Los totales históricos
+    incluyen los pagos archivados. `por_sede` es el resultado de pagos_por_sede
+    con la misma sede si ya se consultó.
+    """
+    agregados, historicos = _agregados_pagos()
+    if por_sede is None:
+        por_sede = agrupar_por_sede(Pago.objects.all(), sede_id, agregados)
+    fila = sumar_sedes(por_sede, agregados)
+    # El archivo solo tiene pagos de meses anteriores: suma a los totales históricos,
+    # desde un agregado cacheado hasta el siguiente archivado
+    archivo = ArchivoDAO.agregado_archivo(
+        'pagos', 'estadisticas', lambda pagos: pagos.aggregate(**historicos), sede_id
+    )
+    for clave, valor in archivo.items():
+        if valor:
+            fila[clave] = (fila[clave] or 0) + valor
+
+    def agrupar(campo, opciones):
+        # Igual que un GROUP BY: solo los grupos con pagos, del mayor monto al menor
+        grupos = [
+            {
+                campo: valor,
+                'total': fila[f'{campo}_{valor}_total'],
+                'monto_total': fila[f'{campo}_{valor}_monto'] or Decimal('0'),
+            }
+            for valor, _ in opciones
+            if fila[f'{campo}_{valor}_total']
+        ]
+        return sorted(grupos, key=lambda grupo: grupo['monto_total'], reverse=True)
+
+    por_estado = {
+        estado: {
+            'total': fila[f'estado_{estado}_total'],
+            'monto_total': fila[f'estado_{estado}_monto'] or Decimal('0'),
+        }
+        for estado, _ in Pago.ESTADOS_PAGO
+    }
+
+    return {
+        'pagos_registrados': fila['pagos_registrados'],
+        'total_pagos': por_estado['validado']['total'],
+        'total_ingresos': float(por_estado['validado']['monto_total']),
+        'pagos_pendientes': por_estado['pendiente']['total'],
+        'pagos_rechazados': por_estado['rechazado']['total'],
+        'pagos_hoy': fila['pagos_hoy'],
+        'ingresos_hoy': float(fila['ingresos_hoy'] or 0),
+        'pagos_mes': fila['pagos_mes'],
+        'ingresos_mes': float(fila['ingresos_mes'] or 0),
+        'por_estado': por_estado,
+        'pagos_por_metodo': agrupar('metodo_pago', Pago.METODOS_PAGO),
+        'pagos_por_tipo': agrupar('tipo_pago', Pago.TIPOS_PAGO),
+    }
+
+
+def estadisticas_usuarios(sede_id=None):
+    """Usuarios por rol"""
+    return por_sede(Usuario.objects.all(), sede_id).aggregate(
+        total_usuarios=Count('id'),
+        administradores=Count('id', filter=Q(rol='administrador')),
+        empleados=Count('id', filter=Q(rol='empleado')),
+    )
+
+
+def estadisticas_membresias():
+    """Membresías activas desde el catálogo en memoria (sin consultas)"""
+    activas = CatalogoMembresias.activas()
+    precios = [m.precio for m in activas]
+    return {
+        'total_membresias': len(activas),
+        'total_ingresos_potenciales': sum(precios) if precios else None,
+        'precio_promedio': sum(precios) / len(precios) if precios else None,
+        'duracion_promedio': sum(m.duracion_dias for m in activas) / len(activas) if activas else 0,
+    }
+
+
+def consolidado(sede_id=None):
+    """Las cuatro estadísticas juntas para los reportes consolidados"""
+    return {
+        'membresias': estadisticas_membresias(),
+        'clientes': estadisticas_clientes(sede_id=sede_id),
+        'pagos': estadisticas_pagos(sede_id=sede_id),
+        'usuarios': estadisticas_usuarios(sede_id=sede_id),
+    }
+
+
+def asistencias_por_sede(sede_id=None, totales=None):
+    """
+    Asistencias de hoy y del mes de cada sede:
+    {sede_id: {'asistencias_hoy': n, 'asistencias_mes': n}}. `totales` es un
+    resultado de AsistenciaRollupDAO.totales_por_dia_y_sede que cubre el mes,
+    si ya se consultó.
+    """
+    hoy = timezone.localdate()
+    inicio_mes = hoy.replace(day=1)
+    if totales is None:
+        totales = AsistenciaRollupDAO.totales_por_dia_y_sede(inicio_mes, hoy, sede_id)
+    filas = {}
+    for (fecha, sede), total in totales.items():
+        if inicio_mes <= fecha <= hoy:
+            fila = filas.setdefault(sede, {'asistencias_hoy': 0, 'asistencias_mes': 0})
+            fila['asistencias_mes'] += total
+            if fecha == hoy:
+                fila['asistencias_hoy'] += total
+    return filas
+
+
+def estadisticas_por_sede(clientes=None, pagos=None, asistencias=None, sedes=None):
+    """
+    Clientes, ingresos y asistencias de cada sede. Recibe las filas ya
+    agrupadas de clientes_por_sede, pagos_por_sede (o cualquier agregado con
+    ingresos_hoy, ingresos_mes y estado_pendiente_total) y asistencias_por_sede,
+    y consulta solo las que falten. Incluye la fila 'Sin sede' solo si hay
+    registros sin sede.
+    """
+    if clientes is None:
+        clientes = clientes_por_sede()
+    if pagos is None:
+        pagos = pagos_por_sede()
+    if asistencias is None:
+        asistencias = asistencias_por_sede()
+    if sedes is None:
+        sedes = SedeDAO.obtener_todas()
+
+    sedes = [(sede.id, sede.nombre) for sede in sedes]
+    if None in set(clientes) | set(pagos) | set(asistencias):
+        sedes.append((None, 'Sin sede'))
+
+    filas = []
+    for sede_id, nombre in sedes:
+        de_clientes = clientes.get(sede_id, {})
+        de_pagos = pagos.get(sede_id, {})
+        de_asistencias = asistencias.get(sede_id, {})
+        filas.append({
+            'sede_id': sede_id,
+            'sede': nombre,
+            'total_clientes': de_clientes.get('total_clientes', 0),
+            'clientes_activos': de_clientes.get('clientes_activos', 0),
+            'ingresos_mes': float(de_pagos.get('ingresos_mes') or 0),
+            'ingresos_hoy': float(de_pagos.get('ingresos_hoy') or 0),
+            'pagos_pendientes': de_pagos.get('estado_pendiente_total', 0),
+            'asistencias_mes': de_asistencias.get('asistencias_mes', 0),
+            'asistencias_hoy': de_asistencias.get('asistencias_hoy', 0),
+        })
+    return filas
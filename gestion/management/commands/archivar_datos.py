@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gestion.cache import invalidar_vistas
+from gestion.dao import ArchivoDAO
+from gestion.models import Asistencia, Pago
+
+# El dashboard y las estadísticas del año en curso leen solo las tablas vivas
+MESES_MINIMO = 12
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve a las tablas de archivo las asistencias y los pagos ya resueltos de más de '
+        'N meses. Los rollups de asistencias se conservan; los reportes leen el archivo '
+        'solo cuando el rango pedido empieza antes del corte.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=settings.ARCHIVO_MESES,
+                            help=f'Antigüedad mínima en meses (al menos {MESES_MINIMO})')
+        parser.add_argument('--lote', type=int, default=5000, help='Registros movidos por transacción')
+        parser.add_argument('--solo', choices=sorted(ArchivoDAO.MODELOS), help='Archivar solo una tabla')
+
+    def handle(self, *args, **options):
+        if options['meses'] < MESES_MINIMO or options['lote'] < 1:
+            raise CommandError(f'--meses debe ser >= {MESES_MINIMO} y --lote >= 1')
+
+        # El corte es siempre un primer día de mes: los rollups mensuales quedan completos
+        hoy = timezone.localdate()
+        meses = hoy.year * 12 + hoy.month - 1 - options['meses']
+        corte = hoy.replace(year=meses // 12, month=meses % 12 + 1, day=1)
+
+        tablas = [options['solo']] if options['solo'] else sorted(ArchivoDAO.MODELOS)
+        for tabla in tablas:
+            if tabla == 'asistencias':
+                movidos = ArchivoDAO.archivar_asistencias(corte, options['lote'])
+            else:
+                movidos = ArchivoDAO.archivar_pagos(corte, options['lote'])
+            self.stdout.write(f'  {tabla}: {movidos} registros anteriores al {corte:%d/%m/%Y} archivados')
+
+        # El borrado por lotes de ids no dispara señales: invalidar a mano las vistas cacheadas
+        for modelo in (Asistencia, Pago):
+            invalidar_vistas(modelo)
+
+        self.stdout.write(self.style.SUCCESS(f'Archivo actualizado hasta el {corte:%d/%m/%Y}'))
@@ -0,0 +1,157 @@
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+TABLAS = ('asistencias', 'pagos', 'bonos', 'historial_membresias')
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el tamaño de los índices de las tablas hijas de clientes y la latencia de los '
+        'joins sobre asistencias. Ejecutar antes y después de migrar la llave de Cliente: las '
+        'consultas son SQL sobre asistencias.cliente_id y sirven con cualquiera de las dos llaves.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--dias', type=int, default=30, help='Rango de asistencias consultado')
+        parser.add_argument('--guardar', help='Guardar los resultados en un archivo JSON')
+        parser.add_argument('--comparar', help='Comparar contra un archivo JSON guardado previamente')
+
+    def handle(self, *args, **options):
+        resultados = {
+            'tipo_llave': self.tipo_llave(),
+            'columna_llave': self.columna_llave(),
+            'tablas': self.tamano_tablas(),
+            'consultas': self.medir_joins(options['repeticiones'], options['dias']),
+        }
+
+        self.stdout.write(
+            f"Tipo de asistencias.cliente_id: {resultados['tipo_llave'] or 'N/D'} "
+            f"(apunta a clientes.{resultados['columna_llave']})"
+        )
+        if resultados['tablas']:
+            self.stdout.write('\nTabla                    Filas        Datos (KB)   Índices (KB)')
+            for tabla, datos in resultados['tablas'].items():
+                self.stdout.write(
+                    f"{tabla:<24} {datos['filas']:>10} {datos['datos'] / 1024:>14.0f} {datos['indices'] / 1024:>14.0f}"
+                )
+        else:
+            self.stdout.write(self.style.WARNING('El tamaño de índices solo se reporta en MySQL'))
+
+        self.stdout.write('\nConsulta                         Mediana (ms)   p95 (ms)')
+        for nombre, tiempos in resultados['consultas'].items():
+            self.stdout.write(f"{nombre:<32} {tiempos['mediana']:>12.2f} {tiempos['p95']:>10.2f}")
+
+        if options['comparar']:
+            self.comparar(resultados, options['comparar'])
+
+        if options['guardar']:
+            with open(options['guardar'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\nResultados guardados en {options['guardar']}"))
+
+    def tipo_llave(self):
+        with connection.cursor() as cursor:
+            if connection.vendor != 'mysql':
+                # En SQLite type_code es el tipo declarado de la columna
+                columnas = connection.introspection.get_table_description(cursor, 'asistencias')
+                return next((str(c.type_code) for c in columnas if c.name == 'cliente_id'), None)
+            cursor.execute(
+                "SELECT COLUMN_TYPE FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'asistencias' AND COLUMN_NAME = 'cliente_id'"
+            )
+            fila = cursor.fetchone()
+        return fila[0] if fila else None
+
+    def columna_llave(self):
+        """Llave primaria de clientes: documento antes de la migración 0010, id después"""
+        with connection.cursor() as cursor:
+            return connection.introspection.get_primary_key_column(cursor, 'clientes')
+
+    def tamano_tablas(self):
+        if connection.vendor != 'mysql':
+            return {}
+        with connection.cursor() as cursor:
+            for tabla in TABLAS:
+                # Actualiza las estadísticas para que information_schema refleje el tamaño real
+                cursor.execute(f'ANALYZE TABLE {connection.ops.quote_name(tabla)}')
+                cursor.fetchall()
+            cursor.execute(
+                "SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN %s",
+                [TABLAS],
+            )
+            return {
+                tabla: {'filas': filas or 0, 'datos': datos or 0, 'indices': indices or 0}
+                for tabla, filas, datos, indices in cursor.fetchall()
+            }
+
+    def medir_joins(self, repeticiones, dias):
+        """
+        Los mismos tres joins en SQL sobre asistencias.cliente_id y la llave de
+        clientes que haya en el esquema: el ORM siempre uniría por clientes.id,
+        que no existe antes de la migración 0010.
+        """
+        desde = timezone.localdate() - timedelta(days=dias)
+        llave = connection.ops.quote_name(self.columna_llave())
+        sql = {
+            'asistencias_con_cliente': (
+                'SELECT a.fecha, a.hora, c.documento, c.nombres FROM asistencias a '
+                f'INNER JOIN clientes c ON c.{llave} = a.cliente_id '
+                'WHERE a.fecha >= %s LIMIT 1000'
+            ),
+            'asistencias_por_membresia': (
+                'SELECT m.nombre, COUNT(a.id) FROM asistencias a '
+                f'INNER JOIN clientes c ON c.{llave} = a.cliente_id '
+                'LEFT OUTER JOIN membresias m ON m.id = c.membresia_actual_id '
+                'WHERE a.fecha >= %s GROUP BY m.nombre'
+            ),
+            'clientes_unicos': 'SELECT COUNT(DISTINCT a.cliente_id) FROM asistencias a WHERE a.fecha >= %s',
+        }
+
+        def ejecutar(consulta):
+            with connection.cursor() as cursor:
+                cursor.execute(consulta, [desde])
+                return cursor.fetchall()
+
+        consultas = {nombre: (lambda consulta=consulta: ejecutar(consulta)) for nombre, consulta in sql.items()}
+
+        resultados = {}
+        for nombre, consulta in consultas.items():
+            consulta()  # Calentar caché del servidor
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                consulta()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            tiempos.sort()
+            resultados[nombre] = {
+                'mediana': statistics.median(tiempos),
+                'p95': tiempos[max(int(len(tiempos) * 0.95) - 1, 0)],
+            }
+        return resultados
+
+    def comparar(self, resultados, ruta):
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                previos = json.load(archivo)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer {ruta}: {e}')
+
+        self.stdout.write(f"\nComparación contra {ruta} ({previos.get('tipo_llave') or 'N/D'} -> {resultados['tipo_llave'] or 'N/D'})")
+        for tabla, datos in resultados['tablas'].items():
+            antes = previos.get('tablas', {}).get(tabla)
+            if antes and antes['indices']:
+                cambio = (datos['indices'] - antes['indices']) / antes['indices'] * 100
+                self.stdout.write(f'  Índices de {tabla}: {cambio:+.1f}%')
+        for nombre, tiempos in resultados['consultas'].items():
+            antes = previos.get('consultas', {}).get(nombre)
+            if antes and antes['mediana']:
+                cambio = (tiempos['mediana'] - antes['mediana']) / antes['mediana'] * 100
+                self.stdout.write(f'  {nombre}: {cambio:+.1f}% en la mediana')
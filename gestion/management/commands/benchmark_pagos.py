@@ -0,0 +1,100 @@
+import statistics
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from gestion.models import Cliente, Membresia, Pago, Usuario
+from gestion.services import PagoService
+
+PREFIJO = 'BENCH-PAGO-'
+
+
+class Command(BaseCommand):
+    help = 'Mide PagoService.registrar con varios hilos registrando pagos a la vez'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--pagos', type=int, default=50, help='Pagos por hilo')
+        parser.add_argument('--clientes', type=int, default=4,
+                            help='Clientes compartidos entre los hilos (pocos = más contención)')
+        parser.add_argument('--conservar', action='store_true', help='No borrar los datos generados')
+
+    def handle(self, *args, **options):
+        hilos = options['hilos']
+        pagos_por_hilo = options['pagos']
+
+        usuario = Usuario.objects.filter(rol='administrador').first()
+        membresia = Membresia.objects.create(
+            nombre=f'{PREFIJO}Mensual', duracion_dias=30, precio=Decimal('1000'), activa=False
+        )
+        hoy = timezone.now().date()
+        clientes = [
+            Cliente.objects.create(
+                documento=f'{PREFIJO}{i}', nombres='Benchmark', apellidos=str(i),
+                membresia_actual=membresia, fecha_inicio_membresia=hoy,
+                fecha_fin_membresia=hoy + timedelta(days=1), estado='activo',
+            )
+            for i in range(options['clientes'])
+        ]
+        fin_inicial = {c.pk: c.fecha_fin_membresia for c in clientes}
+
+        latencias = []
+        errores = []
+        lock = threading.Lock()
+
+        def trabajador(numero):
+            propias = []
+            try:
+                for i in range(pagos_por_hilo):
+                    cliente = clientes[(numero + i) % len(clientes)]
+                    inicio = time.perf_counter()
+                    PagoService.registrar(
+                        cliente=cliente, membresia=membresia, metodo_pago='efectivo', usuario=usuario
+                    )
+                    propias.append(time.perf_counter() - inicio)
+            except Exception as e:
+                with lock:
+                    errores.append(str(e))
+            finally:
+                connection.close()
+                with lock:
+                    latencias.extend(propias)
+
+        self.stdout.write(f'Registrando {hilos * pagos_por_hilo} pagos con {hilos} hilos sobre {len(clientes)} clientes...')
+        inicio_total = time.perf_counter()
+        threads = [threading.Thread(target=trabajador, args=(n,)) for n in range(hilos)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracion = time.perf_counter() - inicio_total
+
+        # Verificar que no se perdieron extensiones por condiciones de carrera
+        inconsistentes = 0
+        for cliente in Cliente.objects.filter(documento__startswith=PREFIJO):
+            registrados = Pago.objects.filter(cliente=cliente).count()
+            esperado = fin_inicial[cliente.pk] + timedelta(days=30 * registrados)
+            if cliente.fecha_fin_membresia != esperado:
+                inconsistentes += 1
+
+        if latencias:
+            latencias.sort()
+            p95 = latencias[int(len(latencias) * 0.95) - 1] if len(latencias) > 1 else latencias[0]
+            self.stdout.write(f'Pagos registrados: {len(latencias)} en {duracion:.2f}s ({len(latencias) / duracion:.1f} pagos/s)')
+            self.stdout.write(f'Latencia media: {statistics.mean(latencias) * 1000:.1f} ms | p95: {p95 * 1000:.1f} ms')
+        if errores:
+            self.stdout.write(self.style.WARNING(f'{len(errores)} hilos fallaron: {errores[0]}'))
+
+        if inconsistentes:
+            self.stdout.write(self.style.ERROR(f'{inconsistentes} clientes con fecha de fin inconsistente'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Fechas de membresía consistentes en todos los clientes'))
+
+        if not options['conservar']:
+            Cliente.objects.filter(documento__startswith=PREFIJO).delete()
+            membresia.delete()
@@ -0,0 +1,157 @@
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from gestion import particiones
+
+PLANA = 'bench_asistencias_plana'
+PARTICIONADA = 'bench_asistencias_particionada'
+SECUENCIA = 'bench_secuencia'
+BLOQUE = 10000  # Filas de la tabla auxiliar; el llenado cruza bloques de a 100 (1M filas por INSERT)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la latencia de las consultas por mes sobre una copia de asistencias sin '
+        'particionar y otra particionada por mes (MySQL). Las tablas se llenan con filas '
+        'sintéticas repartidas en los últimos N meses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=10_000_000)
+        parser.add_argument('--meses', type=int, default=36, help='Meses cubiertos por las filas')
+        parser.add_argument('--clientes', type=int, default=20000)
+        parser.add_argument('--repeticiones', type=int, default=10)
+        parser.add_argument('--conservar', action='store_true',
+                            help='No borrar las tablas al terminar; se reutilizan si ya tienen las filas pedidas')
+        parser.add_argument('--guardar', help='Guardar los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        if not particiones.soportado(connection):
+            raise CommandError('El benchmark de particiones requiere MySQL')
+        if options['filas'] < 1 or options['meses'] < 1:
+            raise CommandError('--filas y --meses deben ser >= 1')
+
+        hoy = timezone.localdate()
+        desde = particiones.sumar_meses(hoy, 1 - options['meses'])
+        with connection.cursor() as cursor:
+            if self.filas(cursor, PARTICIONADA) != options['filas']:
+                inicio = time.perf_counter()
+                self.preparar(cursor, options['filas'], desde, hoy, options['clientes'])
+                self.stdout.write(f"Tablas llenadas en {time.perf_counter() - inicio:.0f} s")
+
+            # Mes intermedio, el mes en curso y el día de hoy
+            medio = particiones.sumar_meses(desde, options['meses'] // 2)
+            rangos = {
+                'mes_anterior': (medio, particiones.sumar_meses(medio, 1) - timedelta(days=1)),
+                'mes_actual': (hoy.replace(day=1), hoy),
+                'hoy': (hoy, hoy),
+            }
+            resultados = {'filas': options['filas'], 'consultas': {}}
+            for nombre, (inicio, fin) in rangos.items():
+                for consulta, sql in self.consultas(inicio, fin).items():
+                    clave = f'{nombre}:{consulta}'
+                    resultados['consultas'][clave] = {
+                        tabla: self.medir(cursor, sql.format(tabla=tabla), options['repeticiones'])
+                        for tabla in (PLANA, PARTICIONADA)
+                    }
+                    resultados['consultas'][clave]['particiones'] = self.particiones_leidas(
+                        cursor, sql.format(tabla=PARTICIONADA)
+                    )
+
+            if not options['conservar']:
+                for tabla in (PLANA, PARTICIONADA, SECUENCIA):
+                    cursor.execute(f'DROP TABLE IF EXISTS {tabla}')
+
+        self.stdout.write(f"\n{options['filas']:,} filas en {options['meses']} meses")
+        self.stdout.write('Consulta                        Sin particiones (ms)   Particionada (ms)   Particiones leídas')
+        for clave, datos in resultados['consultas'].items():
+            self.stdout.write(
+                f"{clave:<32} {datos[PLANA]['mediana']:>18.2f} {datos[PARTICIONADA]['mediana']:>19.2f}   {datos['particiones']}"
+            )
+
+        if options['guardar']:
+            with open(options['guardar'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\nResultados guardados en {options['guardar']}"))
+
+    def filas(self, cursor, tabla):
+        cursor.execute(
+            'SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+            [tabla],
+        )
+        if not cursor.fetchone()[0]:
+            return None
+        cursor.execute(f'SELECT COUNT(*) FROM {tabla}')
+        return cursor.fetchone()[0]
+
+    def preparar(self, cursor, filas, desde, hasta, clientes):
+        """Dos copias de la estructura de asistencias (índices incluidos, sin llaves foráneas) con las mismas filas"""
+        for tabla in (PLANA, PARTICIONADA, SECUENCIA):
+            cursor.execute(f'DROP TABLE IF EXISTS {tabla}')
+        for tabla in (PLANA, PARTICIONADA):
+            cursor.execute(f'CREATE TABLE {tabla} LIKE {particiones.TABLA}')
+            if particiones.particiones(cursor, tabla):
+                particiones.quitar_particiones(cursor, tabla)
+        particiones.particionar(cursor, desde, hasta, tabla=PARTICIONADA)
+
+        # Tabla auxiliar 0..BLOQUE-1 para generar filas con INSERT ... SELECT en el servidor
+        cursor.execute(f'CREATE TABLE {SECUENCIA} (n INT PRIMARY KEY)')
+        cursor.executemany(f'INSERT INTO {SECUENCIA} (n) VALUES (%s)', [(n,) for n in range(BLOQUE)])
+
+        dias = (hasta - desde).days + 1
+        for inicio in range(0, filas, BLOQUE * 100):
+            cantidad = min(BLOQUE * 100, filas - inicio)
+            # Fecha uniforme en el rango, hora entre 05:00 y 22:00, cliente pseudoaleatorio
+            cursor.execute(
+                f'INSERT INTO {PLANA} (cliente_id, fecha, hora, usuario_registro_id, sede_id) '
+                f'SELECT 1 + MOD(g.i * 7919, %s), DATE_ADD(%s, INTERVAL MOD(g.i, %s) DAY), '
+                f'SEC_TO_TIME(18000 + MOD(g.i * 104729, 61200)), NULL, NULL '
+                f'FROM (SELECT %s + a.n * {BLOQUE} + b.n AS i FROM {SECUENCIA} a CROSS JOIN {SECUENCIA} b '
+                f'WHERE a.n < 100 AND a.n * {BLOQUE} + b.n < %s) g',
+                [clientes, desde, dias, inicio, cantidad],
+            )
+        cursor.execute(
+            f'INSERT INTO {PARTICIONADA} (cliente_id, fecha, hora, usuario_registro_id, sede_id) '
+            f'SELECT cliente_id, fecha, hora, usuario_registro_id, sede_id FROM {PLANA}'
+        )
+        for tabla in (PLANA, PARTICIONADA):
+            cursor.execute(f'ANALYZE TABLE {tabla}')
+            cursor.fetchall()
+
+    def consultas(self, inicio, fin):
+        """Las consultas de asistencias_listar y del registro del día, con {tabla} por reemplazar"""
+        rango = f"fecha BETWEEN '{inicio.isoformat()}' AND '{fin.isoformat()}'"
+        return {
+            'conteo': f'SELECT COUNT(*) FROM {{tabla}} WHERE {rango}',
+            'pagina': f'SELECT id, cliente_id, fecha, hora FROM {{tabla}} WHERE {rango} '
+                      f'ORDER BY fecha DESC, hora DESC LIMIT 50',
+            'unicos': f'SELECT COUNT(DISTINCT cliente_id) FROM {{tabla}} WHERE {rango}',
+        }
+
+    def medir(self, cursor, sql, repeticiones):
+        cursor.execute(sql)  # Calentar el buffer pool
+        cursor.fetchall()
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            cursor.execute(sql)
+            cursor.fetchall()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        return {
+            'mediana': statistics.median(tiempos),
+            'p95': tiempos[max(int(len(tiempos) * 0.95) - 1, 0)],
+        }
+
+    def particiones_leidas(self, cursor, sql):
+        cursor.execute(f'EXPLAIN {sql}')
+        columnas = [columna[0] for columna in cursor.description]
+        fila = cursor.fetchone()
+        cursor.fetchall()
+        return dict(zip(columnas, fila)).get('partitions') if fila else None
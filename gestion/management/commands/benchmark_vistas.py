@@ -0,0 +1,163 @@
+import json
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from gestion.middleware import ContadorConsultas
+from gestion.models import Asistencia, Cliente, Pago, Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide las vistas y exportaciones principales dentro del proceso (sin servidor) y '
+        'escribe un reporte JSON para comparar entre commits. Usar con seed_benchmark.'
+    )
+
+    # nombre -> (método, nombre de la URL)
+    ESCENARIOS = {
+        'dashboard': ('get', 'dashboard'),
+        'clientes_listar': ('get', 'clientes_listar'),
+        'pagos_exportar_excel': ('get', 'pagos_exportar_excel'),
+        'reporte_consolidado_excel': ('get', 'reporte_consolidado_excel'),
+        'asistencias_registrar': ('post', 'asistencias_registrar'),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=10)
+        parser.add_argument('--correo', help='Usuario con el que se hacen las peticiones (por defecto, un administrador)')
+        parser.add_argument('--vistas', nargs='+', choices=sorted(self.ESCENARIOS),
+                            help='Medir solo estos escenarios')
+        parser.add_argument('--guardar', help='Guardar el reporte en un archivo JSON')
+        parser.add_argument('--comparar', help='Comparar contra un reporte JSON guardado previamente')
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser al menos 1')
+
+        usuarios = Usuario.objects.filter(is_active=True)
+        usuario = (
+            usuarios.filter(correo=options['correo']).first() if options['correo']
+            else usuarios.filter(rol='administrador').first()
+        )
+        if usuario is None:
+            raise CommandError('No se encontró el usuario para las peticiones')
+
+        self.cliente_http = Client()
+        self.cliente_http.force_login(usuario)
+        self.documentos = list(
+            Cliente.objects.filter(
+                estado='activo', fecha_fin_membresia__gte=timezone.now().date()
+            ).values_list('documento', flat=True)[:500]
+        )
+
+        reporte = {
+            'fecha': timezone.now().isoformat(),
+            'commit': self.commit_actual(),
+            'base_datos': connection.vendor,
+            'datos': {
+                'clientes': Cliente.objects.count(),
+                'pagos': Pago.objects.count(),
+                'asistencias': Asistencia.objects.count(),
+            },
+            'vistas': {},
+        }
+        self.stdout.write(
+            f"Commit {reporte['commit'] or 'N/D'} | {reporte['datos']['clientes']} clientes, "
+            f"{reporte['datos']['pagos']} pagos, {reporte['datos']['asistencias']} asistencias"
+        )
+
+        self.stdout.write('\nEscenario                     Mediana (ms)   p95 (ms)  Consultas       KB')
+        for nombre in options['vistas'] or self.ESCENARIOS:
+            resultado = self.medir(nombre, options['repeticiones'])
+            reporte['vistas'][nombre] = resultado
+            self.stdout.write(
+                f"{nombre:<28} {resultado['mediana_ms']:>12.1f} {resultado['p95_ms']:>10.1f} "
+                f"{resultado['consultas']:>10} {resultado['bytes'] / 1024:>8.0f}"
+            )
+
+        if options['comparar']:
+            self.comparar(reporte, options['comparar'])
+
+        if options['guardar']:
+            with open(options['guardar'], 'w', encoding='utf-8') as archivo:
+                json.dump(reporte, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\nReporte guardado en {options['guardar']}"))
+
+    def commit_actual(self):
+        try:
+            salida = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return salida.stdout.strip()
+
+    def peticion(self, nombre, numero):
+        metodo, url_nombre = self.ESCENARIOS[nombre]
+        url = reverse(url_nombre)
+        if metodo == 'get':
+            return self.cliente_http.get(url)
+
+        if not self.documentos:
+            raise CommandError('No hay clientes activos para registrar asistencias')
+        # Cada registro se revierte para no alterar los datos ni chocar con la regla de 20 minutos
+        with transaction.atomic():
+            respuesta = self.cliente_http.post(url, {'documento': self.documentos[numero % len(self.documentos)]})
+            transaction.set_rollback(True)
+        return respuesta
+
+    def medir(self, nombre, repeticiones):
+        # La primera petición calienta caches de plantillas y conexiones y no se cuenta
+        self.peticion(nombre, 0)
+
+        tiempos = []
+        consultas = []
+        tamano = 0
+        for numero in range(1, repeticiones + 1):
+            contador = ContadorConsultas()
+            inicio = time.perf_counter()
+            with connection.execute_wrapper(contador):
+                respuesta = self.peticion(nombre, numero)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(contador.consultas)
+            if respuesta.status_code >= 400:
+                raise CommandError(f'{nombre} respondió {respuesta.status_code}')
+            tamano = len(respuesta.content)
+
+        tiempos.sort()
+        return {
+            'mediana_ms': statistics.median(tiempos),
+            'p95_ms': tiempos[max(int(len(tiempos) * 0.95) - 1, 0)],
+            'media_ms': statistics.mean(tiempos),
+            'consultas': max(consultas),
+            'bytes': tamano,
+        }
+
+    def comparar(self, reporte, ruta):
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                previo = json.load(archivo)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer {ruta}: {e}')
+
+        self.stdout.write(f"\nComparación contra {ruta} (commit {previo.get('commit') or 'N/D'})")
+        if previo.get('datos') != reporte['datos']:
+            self.stdout.write(self.style.WARNING('  Los volúmenes de datos no coinciden; la comparación es orientativa'))
+        for nombre, actual in reporte['vistas'].items():
+            antes = previo.get('vistas', {}).get(nombre)
+            if not antes or not antes['mediana_ms']:
+                continue
+            cambio = (actual['mediana_ms'] - antes['mediana_ms']) / antes['mediana_ms'] * 100
+            linea = (
+                f"  {nombre}: {antes['mediana_ms']:.1f} -> {actual['mediana_ms']:.1f} ms ({cambio:+.1f}%), "
+                f"consultas {antes['consultas']} -> {actual['consultas']}"
+            )
+            self.stdout.write(self.style.ERROR(linea) if cambio > 10 else linea)
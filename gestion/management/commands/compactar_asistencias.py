@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from gestion.dao import AsistenciaRollupDAO, OcupacionDAO, VisitantesDAO
+from gestion.models import Asistencia
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula los rollups, los bitmaps de visitantes y la ocupación por hora '
+        'de asistencias (por defecto, el día de ayer)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial YYYY-MM-DD')
+        parser.add_argument('--hasta', help='Fecha final YYYY-MM-DD (inclusive)')
+        parser.add_argument('--todo', action='store_true', help='Recalcular todo el histórico')
+
+    def handle(self, *args, **options):
+        ayer = timezone.localdate() - timedelta(days=1)
+
+        try:
+            desde = datetime.strptime(options['desde'], '%Y-%m-%d').date() if options['desde'] else ayer
+            hasta = datetime.strptime(options['hasta'], '%Y-%m-%d').date() if options['hasta'] else ayer
+        except ValueError:
+            raise CommandError('Las fechas deben tener el formato YYYY-MM-DD')
+
+        if options['todo']:
+            primera = Asistencia.objects.aggregate(primera=Min('fecha'))['primera']
+            if primera is None:
+                self.stdout.write('No hay asistencias registradas')
+                return
+            desde, hasta = primera, timezone.localdate()
+
+        if desde > hasta:
+            raise CommandError('--desde no puede ser posterior a --hasta')
+
+        AsistenciaRollupDAO.compactar(desde, hasta)
+        VisitantesDAO.reconstruir(desde, hasta)
+        OcupacionDAO.reconstruir(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rollups de asistencias recalculados del {desde:%d/%m/%Y} al {hasta:%d/%m/%Y}'
+        ))
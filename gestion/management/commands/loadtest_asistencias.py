@@ -0,0 +1,156 @@
+import http.cookiejar
+import json
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.models import Cliente
+
+PATRON_CSRF = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class Sesion:
+    """Cliente HTTP con cookies para un hilo de la prueba"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def csrf(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def get(self, ruta):
+        with self.opener.open(self.base_url + ruta, timeout=30) as respuesta:
+            return respuesta.read().decode('utf-8', 'replace')
+
+    def post(self, ruta, datos):
+        cuerpo = urllib.parse.urlencode({**datos, 'csrfmiddlewaretoken': self.csrf()}).encode()
+        peticion = urllib.request.Request(
+            self.base_url + ruta, data=cuerpo,
+            headers={'X-CSRFToken': self.csrf(), 'Referer': self.base_url + ruta},
+        )
+        with self.opener.open(peticion, timeout=30) as respuesta:
+            return respuesta.read().decode('utf-8', 'replace')
+
+    def iniciar_sesion(self, correo, password):
+        self.get('/login/')
+        self.post('/login/', {'correo': correo, 'password': password})
+        if not any(c.name == 'sessionid' for c in self.cookies):
+            raise CommandError('No se pudo iniciar sesión con las credenciales indicadas')
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga HTTP sobre asistencias_registrar contra un servidor en ejecución. '
+        'Ejecutarla con el servidor levantado con y sin DB_POOL / DB_CONN_MAX_AGE para comparar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--correo', required=True)
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--duracion', type=int, default=20, help='Segundos de prueba')
+        parser.add_argument('--clientes', type=int, default=200,
+                            help='Clientes activos que se usan para los registros')
+        parser.add_argument('--guardar', help='Guardar los resultados en un archivo JSON')
+        parser.add_argument('--comparar', help='Comparar contra un archivo JSON guardado previamente')
+
+    def handle(self, *args, **options):
+        documentos = list(
+            Cliente.objects.filter(estado='activo').values_list('documento', flat=True)[:options['clientes']]
+        )
+        if not documentos:
+            raise CommandError('Se necesita al menos un cliente activo')
+
+        latencias = []
+        resultados = {'registradas': 0, 'rechazadas': 0, 'errores': 0}
+        lock = threading.Lock()
+        fin = time.monotonic() + options['duracion']
+
+        def trabajador(numero):
+            sesion = Sesion(options['url'])
+            sesion.iniciar_sesion(options['correo'], options['password'])
+            sesion.get('/asistencias/registrar/')
+            propias = []
+            conteo = {'registradas': 0, 'rechazadas': 0, 'errores': 0}
+            i = numero
+            while time.monotonic() < fin:
+                documento = documentos[i % len(documentos)]
+                i += options['hilos']
+                inicio = time.perf_counter()
+                try:
+                    respuesta = json.loads(sesion.post('/asistencias/registrar/', {'documento': documento}))
+                    # Un rechazo por la regla de 20 minutos también recorre la vista completa
+                    conteo['registradas' if respuesta.get('success') else 'rechazadas'] += 1
+                except (urllib.error.URLError, ValueError):
+                    conteo['errores'] += 1
+                propias.append(time.perf_counter() - inicio)
+            with lock:
+                latencias.extend(propias)
+                for clave, valor in conteo.items():
+                    resultados[clave] += valor
+
+        db = settings.DATABASES['default']
+        configuracion = 'pool' if db['ENGINE'].endswith('mysql_pool') else f"CONN_MAX_AGE={db.get('CONN_MAX_AGE', 0)}"
+        self.stdout.write(
+            f"Configuración local: {configuracion} (debe coincidir con la del servidor)\n"
+            f"{options['hilos']} hilos durante {options['duracion']}s contra {options['url']}..."
+        )
+
+        threads = [threading.Thread(target=trabajador, args=(n,)) for n in range(options['hilos'])]
+        inicio_total = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracion = time.perf_counter() - inicio_total
+
+        if not latencias:
+            raise CommandError('No se completó ninguna petición')
+
+        latencias.sort()
+        resumen = {
+            'configuracion': configuracion,
+            'peticiones': len(latencias),
+            'peticiones_por_segundo': len(latencias) / duracion,
+            'latencia_media_ms': statistics.mean(latencias) * 1000,
+            'latencia_p95_ms': latencias[max(int(len(latencias) * 0.95) - 1, 0)] * 1000,
+            **resultados,
+        }
+
+        self.stdout.write(
+            f"Peticiones: {resumen['peticiones']} ({resumen['peticiones_por_segundo']:.1f} req/s) | "
+            f"registradas: {resumen['registradas']} | rechazadas: {resumen['rechazadas']} | errores: {resumen['errores']}"
+        )
+        self.stdout.write(
+            f"Latencia media: {resumen['latencia_media_ms']:.1f} ms | p95: {resumen['latencia_p95_ms']:.1f} ms"
+        )
+
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as archivo:
+                    previo = json.load(archivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer {options['comparar']}: {e}")
+            cambio = (resumen['peticiones_por_segundo'] - previo['peticiones_por_segundo']) / previo['peticiones_por_segundo'] * 100
+            self.stdout.write(
+                f"Frente a {previo['configuracion']}: {previo['peticiones_por_segundo']:.1f} -> "
+                f"{resumen['peticiones_por_segundo']:.1f} req/s ({cambio:+.1f}%)"
+            )
+
+        if options['guardar']:
+            with open(options['guardar'], 'w', encoding='utf-8') as archivo:
+                json.dump(resumen, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['guardar']}"))
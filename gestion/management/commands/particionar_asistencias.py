@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from gestion import particiones
+from gestion.dao import ArchivoDAO
+
+
+class Command(BaseCommand):
+    help = (
+        'Mantenimiento de las particiones mensuales de asistencias (MySQL): crea de antemano '
+        'las de los próximos meses y elimina las anteriores al corte del archivo. Ejecutar '
+        'al menos una vez al mes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses-futuros', type=int, default=settings.ASISTENCIAS_PARTICIONES_FUTURAS,
+                            help='Meses a partir del actual con partición creada')
+        parser.add_argument('--archivar', action='store_true',
+                            help='Archivar las asistencias antiguas (ver archivar_datos) y eliminar sus particiones')
+        parser.add_argument('--eliminar', action='store_true',
+                            help='Eliminar las particiones vacías anteriores al corte del archivo')
+
+    def handle(self, *args, **options):
+        if not particiones.soportado(connection):
+            raise CommandError('Las particiones de asistencias solo existen en MySQL')
+        if options['meses_futuros'] < 1:
+            raise CommandError('--meses-futuros debe ser >= 1')
+
+        with connection.cursor() as cursor:
+            if not particiones.particiones(cursor):
+                raise CommandError('La tabla de asistencias no está particionada: aplicar las migraciones')
+
+            hasta = particiones.sumar_meses(timezone.localdate(), options['meses_futuros'])
+            creadas = particiones.crear_futuras(cursor, hasta)
+            self.stdout.write(f"  Particiones creadas: {', '.join(map(particiones.nombre, creadas)) or 'ninguna'}")
+
+            if options['archivar']:
+                call_command('archivar_datos', solo='asistencias', stdout=self.stdout)
+
+            if options['archivar'] or options['eliminar']:
+                corte = ArchivoDAO.corte('asistencias')
+                if corte is None:
+                    self.stdout.write(self.style.WARNING('  No hay asistencias archivadas: no se elimina ninguna partición'))
+                else:
+                    eliminadas, con_filas = particiones.eliminar_anteriores(cursor, corte)
+                    self.stdout.write(
+                        f"  Particiones eliminadas: {', '.join(map(particiones.nombre, eliminadas)) or 'ninguna'}"
+                    )
+                    if con_filas:
+                        self.stdout.write(self.style.WARNING(
+                            f"  Con filas anteriores al corte (archivar primero): {', '.join(map(particiones.nombre, con_filas))}"
+                        ))
+
+            meses = particiones.particiones(cursor)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(meses)} particiones mensuales, de {meses[0]:%m/%Y} a {meses[-1]:%m/%Y}'
+        ))
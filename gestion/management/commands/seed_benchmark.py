@@ -0,0 +1,347 @@
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from gestion.cache import CatalogoMembresias, invalidar_vistas
+from gestion.dao import AsistenciaRollupDAO, OcupacionDAO, VisitantesDAO, borrar_por_ids
+from gestion.models import (
+    Asistencia, AsistenciaArchivada, Bono, Cliente, HistorialMembresia, IndiceVisitante, Membresia,
+    Pago, PagoArchivado, ResumenCliente, Sede, Usuario,
+)
+
+# Los documentos generados llevan este prefijo para poder borrarlos con --limpiar
+PREFIJO = 'SEED-'
+
+NOMBRES = (
+    'Juan', 'María', 'Carlos', 'Ana', 'Luis', 'Laura', 'Andrés', 'Valentina', 'Jorge', 'Camila',
+    'Felipe', 'Daniela', 'Santiago', 'Paula', 'Diego', 'Natalia', 'Sebastián', 'Carolina',
+    'Alejandro', 'Juliana', 'Mateo', 'Sofía', 'Nicolás', 'Isabella', 'Óscar', 'Manuela',
+)
+APELLIDOS = (
+    'García', 'Rodríguez', 'Martínez', 'López', 'González', 'Hernández', 'Pérez', 'Sánchez',
+    'Ramírez', 'Torres', 'Flórez', 'Rivera', 'Gómez', 'Díaz', 'Moreno', 'Muñoz', 'Rojas',
+    'Vargas', 'Castro', 'Ortiz', 'Jiménez', 'Suárez', 'Restrepo', 'Cárdenas', 'Mejía',
+)
+
+# Demanda relativa por mes (enero = propósitos de año nuevo, diciembre = vacaciones)
+FACTOR_MES = {
+    1: 1.35, 2: 1.2, 3: 1.1, 4: 1.0, 5: 1.0, 6: 0.85,
+    7: 0.85, 8: 0.95, 9: 1.0, 10: 1.0, 11: 0.95, 12: 0.7,
+}
+# Lunes = 0 ... domingo = 6
+FACTOR_DIA_SEMANA = (1.25, 1.15, 1.1, 1.0, 0.85, 0.6, 0.3)
+# Franjas de 5 a.m. a 9 p.m. con picos antes y después de la jornada laboral
+PESO_HORA = {
+    5: 6, 6: 10, 7: 8, 8: 5, 9: 4, 10: 3, 11: 3, 12: 4, 13: 3,
+    14: 2, 15: 3, 16: 4, 17: 7, 18: 10, 19: 9, 20: 5, 21: 2,
+}
+
+METODOS_PAGO = ('efectivo', 'tarjeta', 'transferencia', 'nequi', 'daviplata')
+PESO_METODO = (0.35, 0.25, 0.15, 0.15, 0.10)
+
+MEMBRESIAS_BASE = (
+    ('Mensual', 30, Decimal('80000')),
+    ('Trimestral', 90, Decimal('210000')),
+    ('Semestral', 180, Decimal('400000')),
+    ('Anual', 365, Decimal('750000')),
+)
+
+# Probabilidad de renovar al terminar cada periodo
+RETENCION = 0.8
+PROBABILIDAD_BONO = 0.05
+
+
+@contextmanager
+def sin_auto_now(*campos):
+    """Permite asignar fechas históricas a campos auto_now_add durante bulk_create"""
+    anteriores = [(campo, campo.auto_now_add) for campo in campos]
+    for campo, _ in anteriores:
+        campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, valor in anteriores:
+            campo.auto_now_add = valor
+
+
+def campo(modelo, nombre):
+    return modelo._meta.get_field(nombre)
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos a escala de producción (clientes, historial, pagos, asistencias '
+        'con estacionalidad y bonos) con bulk_create, y recalcula resúmenes, rollups y bitmaps.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', '--clients', type=int, default=5000)
+        parser.add_argument('--anios', '--years', type=int, default=2, help='Años de historia')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla para resultados reproducibles')
+        parser.add_argument('--lote', type=int, default=1000, help='Clientes generados por lote')
+        parser.add_argument('--sedes', type=int, default=0,
+                            help='Repartir los clientes entre N sedes (por defecto, las sedes activas existentes)')
+        parser.add_argument('--limpiar', action='store_true',
+                            help=f'Borrar antes los clientes generados previamente ({PREFIJO}*)')
+
+    def handle(self, *args, **options):
+        if options['clientes'] < 0 or options['anios'] < 1 or options['lote'] < 1 or options['sedes'] < 0:
+            raise CommandError('--clientes y --sedes deben ser >= 0, --anios >= 1 y --lote >= 1')
+
+        self.rng = np.random.default_rng(options['semilla'])
+        self.hoy = timezone.now().date()
+        self.inicio = self.hoy - timedelta(days=365 * options['anios'])
+        primera_previa = Asistencia.objects.aggregate(primera=Min('fecha'))['primera']
+
+        if options['limpiar']:
+            self.limpiar()
+
+        self.membresias = self.preparar_membresias()
+        self.admin, self.empleado = self.preparar_usuarios()
+        self.sedes = self.preparar_sedes(options['sedes'])
+        self.preparar_calendario()
+
+        siguiente = self.siguiente_numero()
+        generados = {'clientes': 0, 'historial': 0, 'pagos': 0, 'asistencias': 0, 'bonos': 0}
+        for desde in range(0, options['clientes'], options['lote']):
+            cantidad = min(options['lote'], options['clientes'] - desde)
+            conteo = self.generar_lote(siguiente + desde, cantidad)
+            for clave, valor in conteo.items():
+                generados[clave] += valor
+            self.stdout.write(f"  {desde + cantidad}/{options['clientes']} clientes...")
+
+        desde_rollups = min(filter(None, (primera_previa, self.inicio)))
+        self.stdout.write(f'Recalculando rollups y bitmaps desde {desde_rollups:%d/%m/%Y}...')
+        AsistenciaRollupDAO.compactar(desde_rollups, self.hoy)
+        VisitantesDAO.reconstruir(desde_rollups, self.hoy)
+        OcupacionDAO.reconstruir(desde_rollups, self.hoy)
+
+        # bulk_create no dispara señales: invalidar a mano los caches que dependen de estos modelos
+        CatalogoMembresias.invalidar()
+        for modelo in (Membresia, Cliente, HistorialMembresia, Pago, Asistencia, Bono, Sede):
+            invalidar_vistas(modelo)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Generados: ' + ', '.join(f'{valor} {clave}' for clave, valor in generados.items())
+        ))
+
+    def limpiar(self, lote=5000):
+        clientes = Cliente.objects.filter(documento__startswith=PREFIJO).values('pk')
+        # Por lotes de ids, sin cargar millones de filas en memoria para enviar post_delete;
+        # los clientes al final, cuando ya no tienen filas relacionadas
+        consultas = [
+            modelo.objects.filter(cliente__in=clientes)
+            for modelo in (
+                ResumenCliente, IndiceVisitante, Asistencia, Pago, Bono, HistorialMembresia,
+                AsistenciaArchivada, PagoArchivado,
+            )
+        ]
+        consultas.append(Cliente.objects.filter(documento__startswith=PREFIJO))
+        for consulta in consultas:
+            borrados = 0
+            while True:
+                with transaction.atomic():
+                    ids = list(consulta.order_by('pk').values_list('pk', flat=True)[:lote])
+                    if not ids:
+                        break
+                    borrados += borrar_por_ids(consulta.model, ids)
+        self.stdout.write(f'Eliminados {borrados} clientes generados previamente')
+
+    def preparar_membresias(self):
+        membresias = list(Membresia.objects.filter(activa=True))
+        if not membresias:
+            membresias = [
+                Membresia.objects.create(nombre=nombre, duracion_dias=dias, precio=precio)
+                for nombre, dias, precio in MEMBRESIAS_BASE
+            ]
+        # Los planes cortos son los más comunes
+        pesos = np.array([1 / np.sqrt(max(m.duracion_dias, 1)) for m in membresias])
+        self.peso_membresias = pesos / pesos.sum()
+        return membresias
+
+    def preparar_usuarios(self):
+        admin = Usuario.objects.filter(rol='administrador').first()
+        if admin is None:
+            raise CommandError('Se necesita al menos un usuario administrador')
+        empleado = Usuario.objects.filter(rol='empleado').first() or admin
+        return admin, empleado
+
+    def preparar_sedes(self, cantidad):
+        """Ids de las sedes entre las que se reparten los clientes ([None] si no hay sedes)"""
+        if cantidad:
+            return [Sede.objects.get_or_create(nombre=f'Sede {numero}')[0].id for numero in range(1, cantidad + 1)]
+        return list(Sede.objects.filter(activa=True).order_by('id').values_list('id', flat=True)) or [None]
+
+    def preparar_calendario(self):
+        """Probabilidad relativa de asistir cada día del rango (mes x día de la semana)"""
+        total_dias = (self.hoy - self.inicio).days
+        fechas = [self.inicio + timedelta(days=n) for n in range(total_dias)]
+        self.fechas = fechas
+        self.factor_dia = np.array(
+            [FACTOR_MES[f.month] * FACTOR_DIA_SEMANA[f.weekday()] for f in fechas]
+        )
+        # Las altas se concentran en los meses de mayor demanda
+        factor_alta = np.array([FACTOR_MES[f.month] for f in fechas])
+        self.peso_alta = factor_alta / factor_alta.sum()
+
+        horas = np.array(list(PESO_HORA))
+        pesos = np.array(list(PESO_HORA.values()), dtype=float)
+        self.horas = horas
+        self.peso_horas = pesos / pesos.sum()
+
+    def siguiente_numero(self):
+        ultimo = Cliente.objects.filter(
+            documento__startswith=PREFIJO
+        ).order_by('-documento').values_list('documento', flat=True).first()
+        return int(ultimo[len(PREFIJO):]) + 1 if ultimo else 1
+
+    def momento(self, fecha, hora=None):
+        hora = hora if hora is not None else int(self.rng.choice(self.horas, p=self.peso_horas))
+        return timezone.make_aware(datetime.combine(fecha, time(hora, int(self.rng.integers(60)))))
+
+    def periodos(self, alta):
+        """Periodos consecutivos de membresía desde el alta hasta que el cliente se retira"""
+        periodos = []
+        inicio = alta
+        while inicio <= self.hoy:
+            membresia = self.membresias[self.rng.choice(len(self.membresias), p=self.peso_membresias)]
+            fin = inicio + timedelta(days=membresia.duracion_dias)
+            periodos.append((membresia, inicio, fin))
+            if self.rng.random() > RETENCION:
+                break
+            inicio = fin + timedelta(days=int(self.rng.integers(0, 10)))
+        return periodos
+
+    def generar_lote(self, primer_numero, cantidad):
+        total_dias = len(self.fechas)
+        altas = self.rng.choice(total_dias, size=cantidad, p=self.peso_alta)
+
+        clientes = []
+        planes = {}
+        for n, dia_alta in enumerate(altas):
+            documento = f'{PREFIJO}{primer_numero + n:08d}'
+            alta = self.fechas[dia_alta]
+            periodos = self.periodos(alta)
+            membresia, inicio, fin = periodos[-1]
+            planes[documento] = periodos
+            clientes.append(Cliente(
+                documento=documento,
+                tipo_documento='CC' if self.rng.random() < 0.9 else 'CE',
+                nombres=str(self.rng.choice(NOMBRES)),
+                apellidos=f'{self.rng.choice(APELLIDOS)} {self.rng.choice(APELLIDOS)}',
+                email=f'{documento.lower()}@correo.test' if self.rng.random() < 0.7 else None,
+                celular=f'3{self.rng.integers(100000000, 999999999)}',
+                membresia_actual=membresia,
+                fecha_inicio_membresia=inicio,
+                fecha_fin_membresia=fin,
+                estado='activo' if fin >= self.hoy else 'inactivo',
+                fecha_registro=self.momento(alta),
+                sede_id=self.sedes[(primer_numero + n) % len(self.sedes)],
+            ))
+
+        historial, pagos, asistencias, bonos, resumenes = [], [], [], [], []
+        with transaction.atomic(), sin_auto_now(
+            campo(Cliente, 'fecha_registro'), campo(HistorialMembresia, 'fecha_registro'),
+            campo(Pago, 'fecha_pago'), campo(Asistencia, 'fecha'), campo(Asistencia, 'hora'),
+            campo(Bono, 'fecha_otorgado'),
+        ):
+            Cliente.objects.bulk_create(clientes, batch_size=1000)
+            # MySQL no retorna los ids de bulk_create
+            ids = {
+                documento: (pk, sede_id)
+                for documento, pk, sede_id in Cliente.objects.filter(
+                    documento__in=planes
+                ).values_list('documento', 'pk', 'sede_id')
+            }
+
+            for documento, periodos in planes.items():
+                cliente_id, sede_id = ids[documento]
+                total_pagado = Decimal('0')
+                total_pagos = 0
+                dias_asistencia = []
+
+                for numero, (membresia, inicio, fin) in enumerate(periodos):
+                    fecha_pago = self.momento(inicio)
+                    historial.append(HistorialMembresia(
+                        cliente_id=cliente_id, membresia=membresia, fecha_inicio=inicio,
+                        fecha_fin=fin, precio_pagado=membresia.precio, fecha_registro=fecha_pago,
+                    ))
+
+                    if (self.hoy - inicio).days < 3:
+                        estado = 'pendiente'
+                    else:
+                        estado = 'validado' if self.rng.random() < 0.97 else 'rechazado'
+                    pagos.append(Pago(
+                        cliente_id=cliente_id, membresia=membresia,
+                        concepto=f'{"Renovación" if numero else "Inscripción"} {membresia.nombre}',
+                        tipo_pago='renovacion' if numero else 'membresia',
+                        monto=membresia.precio,
+                        metodo_pago=METODOS_PAGO[self.rng.choice(len(METODOS_PAGO), p=PESO_METODO)],
+                        estado=estado,
+                        fecha_pago=fecha_pago,
+                        fecha_validacion=fecha_pago + timedelta(hours=2) if estado != 'pendiente' else None,
+                        usuario_registro=self.empleado,
+                        usuario_validacion=self.admin if estado != 'pendiente' else None,
+                        sede_id=sede_id,
+                    ))
+                    if estado == 'validado':
+                        total_pagado += membresia.precio
+                        total_pagos += 1
+
+                    desde = (inicio - self.inicio).days
+                    hasta = min((fin - self.inicio).days, total_dias)
+                    if desde < hasta:
+                        dias_asistencia.append(np.arange(desde, hasta))
+
+                # Cada cliente tiene su propia constancia (visitas por semana)
+                visitas_semana = float(np.clip(self.rng.gamma(2.0, 1.3), 0.3, 6.5))
+                dias = np.concatenate(dias_asistencia) if dias_asistencia else np.array([], dtype=int)
+                probabilidad = np.minimum(visitas_semana / 7 * self.factor_dia[dias], 1.0)
+                dias = dias[self.rng.random(dias.size) < probabilidad]
+                horas = self.rng.choice(self.horas, size=dias.size, p=self.peso_horas)
+                minutos = self.rng.integers(0, 60, size=dias.size)
+                for dia, hora, minuto in zip(dias.tolist(), horas.tolist(), minutos.tolist()):
+                    asistencias.append(Asistencia(
+                        cliente_id=cliente_id, fecha=self.fechas[dia], hora=time(hora, minuto),
+                        usuario_registro=self.empleado, sede_id=sede_id,
+                    ))
+
+                total_dias_bono = 0
+                if self.rng.random() < PROBABILIDAD_BONO:
+                    dias_regalo = int(self.rng.integers(1, 4))
+                    aplicado = bool(self.rng.random() < 0.7)
+                    otorgado = self.momento(periodos[-1][1])
+                    bonos.append(Bono(
+                        cliente_id=cliente_id, tipo_bono=f'{dias_regalo}_dia{"s" if dias_regalo > 1 else ""}',
+                        dias_regalo=dias_regalo, motivo='Fidelización', usuario_otorgo=self.admin,
+                        aplicado=aplicado, fecha_otorgado=otorgado,
+                        fecha_aplicado=otorgado if aplicado else None,
+                    ))
+                    if aplicado:
+                        total_dias_bono = dias_regalo
+
+                resumenes.append(ResumenCliente(
+                    cliente_id=cliente_id,
+                    total_pagado=total_pagado,
+                    total_pagos=total_pagos,
+                    total_asistencias=int(dias.size),
+                    ultima_asistencia=self.fechas[int(dias.max())] if dias.size else None,
+                    total_dias_bono=total_dias_bono,
+                ))
+
+            HistorialMembresia.objects.bulk_create(historial, batch_size=2000)
+            Pago.objects.bulk_create(pagos, batch_size=2000)
+            Asistencia.objects.bulk_create(asistencias, batch_size=5000)
+            Bono.objects.bulk_create(bonos, batch_size=2000)
+            ResumenCliente.objects.bulk_create(resumenes, batch_size=2000)
+
+        return {
+            'clientes': len(clientes), 'historial': len(historial), 'pagos': len(pagos),
+            'asistencias': len(asistencias), 'bonos': len(bonos),
+        }
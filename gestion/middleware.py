@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('gestion.metricas')
+
+# Límites superiores de los buckets de cada histograma
+BUCKETS = {
+    'duracion_segundos': (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    'db_segundos': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+    'consultas': (1, 5, 10, 25, 50, 100, 250),
+    'respuesta_bytes': (1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+}
+
+DESCRIPCIONES = {
+    'duracion_segundos': 'Tiempo total de la petición',
+    'db_segundos': 'Tiempo dentro de la base de datos',
+    'consultas': 'Consultas SQL por petición',
+    'respuesta_bytes': 'Tamaño del cuerpo de la respuesta',
+}
+
+
+class ContadorConsultas:
+    """execute_wrapper que cuenta consultas y acumula su duración"""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+# Cuantiles de la ventana móvil que se exportan como gauges
+CUANTILES = (0.5, 0.95, 0.99)
+
+
+class RegistroMetricas:
+    """
+    Métricas por vista en memoria del proceso:
+    - histogramas acumulados desde el arranque (contadores que solo crecen, como
+      los espera Prometheus para calcular rate() y histogram_quantile())
+    - una ventana móvil con las últimas peticiones de cada vista, exportada
+      aparte como gauges de cuantiles (sube y baja con la ventana)
+    """
+
+    def __init__(self, ventana):
+        self._lock = threading.Lock()
+        self._muestras = defaultdict(lambda: deque(maxlen=ventana))
+        self._totales = defaultdict(int)
+        # vista -> métrica -> [conteo por bucket (sin acumular), suma]
+        self._histogramas = defaultdict(
+            lambda: {metrica: [[0] * (len(limites) + 1), 0.0] for metrica, limites in BUCKETS.items()}
+        )
+
+    def registrar(self, vista, muestra):
+        with self._lock:
+            self._muestras[vista].append(muestra)
+            self._totales[vista] += 1
+            for metrica, histograma in self._histogramas[vista].items():
+                valor = muestra[metrica]
+                histograma[0][bisect_left(BUCKETS[metrica], valor)] += 1
+                histograma[1] += valor
+
+    def reiniciar(self):
+        with self._lock:
+            self._muestras.clear()
+            self._totales.clear()
+            self._histogramas.clear()
+
+    def exportar_prometheus(self):
+        with self._lock:
+            muestras = {vista: list(datos) for vista, datos in self._muestras.items()}
+            totales = dict(self._totales)
+            histogramas = {
+                vista: {metrica: (list(conteos), suma) for metrica, (conteos, suma) in datos.items()}
+                for vista, datos in self._histogramas.items()
+            }
+
+        lineas = [
+            '# HELP fittech_peticiones_total Peticiones atendidas por vista desde el arranque del proceso',
+            '# TYPE fittech_peticiones_total counter',
+        ]
+        for vista, total in sorted(totales.items()):
+            lineas.append(f'fittech_peticiones_total{{vista="{vista}"}} {total}')
+
+        for metrica, limites in BUCKETS.items():
+            nombre = f'fittech_{metrica}'
+            lineas.append(f'# HELP {nombre} {DESCRIPCIONES[metrica]} (desde el arranque del proceso)')
+            lineas.append(f'# TYPE {nombre} histogram')
+            for vista, datos in sorted(histogramas.items()):
+                conteos, suma = datos[metrica]
+                acumulado = 0
+                for limite, conteo in zip(limites, conteos):
+                    acumulado += conteo
+                    lineas.append(f'{nombre}_bucket{{vista="{vista}",le="{limite}"}} {acumulado}')
+                total = acumulado + conteos[-1]
+                lineas.append(f'{nombre}_bucket{{vista="{vista}",le="+Inf"}} {total}')
+                lineas.append(f'{nombre}_sum{{vista="{vista}"}} {suma:g}')
+                lineas.append(f'{nombre}_count{{vista="{vista}"}} {total}')
+
+            nombre_ventana = f'{nombre}_ventana'
+            lineas.append(f'# HELP {nombre_ventana} {DESCRIPCIONES[metrica]}: cuantiles de las últimas peticiones de cada vista')
+            lineas.append(f'# TYPE {nombre_ventana} gauge')
+            for vista, datos in sorted(muestras.items()):
+                valores = sorted(m[metrica] for m in datos)
+                for cuantil in CUANTILES:
+                    valor = valores[min(int(cuantil * len(valores)), len(valores) - 1)]
+                    lineas.append(f'{nombre_ventana}{{vista="{vista}",quantile="{cuantil}"}} {valor:g}')
+
+        return '\n'.join(lineas) + '\n'
+
+
+registro = RegistroMetricas(getattr(settings, 'METRICAS_VENTANA', 500))
+
+
+def presupuesto(vista):
+    """Límites de consultas y milisegundos para una vista (con excepciones por vista)"""
+    limites = {
+        'consultas': getattr(settings, 'METRICAS_MAX_CONSULTAS', 30),
+        'ms': getattr(settings, 'METRICAS_MAX_MS', 500),
+    }
+    limites.update(getattr(settings, 'METRICAS_PRESUPUESTOS', {}).get(vista, {}))
+    return limites
+
+
+class MetricasMiddleware:
+    """Mide consultas, tiempo de base de datos, tiempo total y tamaño de respuesta por vista"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        contador = ContadorConsultas()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contador):
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        match = request.resolver_match
+        vista = (match.view_name if match else None) or 'sin_ruta'
+        tamano = 0 if response.streaming else len(response.content)
+
+        registro.registrar(vista, {
+            'duracion_segundos': duracion,
+            'db_segundos': contador.segundos,
+            'consultas': contador.consultas,
+            'respuesta_bytes': tamano,
+        })
+
+        limites = presupuesto(vista)
+        if contador.consultas > limites['consultas'] or duracion * 1000 > limites['ms']:
+            logger.warning(
+                'Vista %s fuera de presupuesto: %d consultas (máx %d), %.0f ms (máx %d), %.0f ms en BD',
+                vista, contador.consultas, limites['consultas'], duracion * 1000, limites['ms'],
+                contador.segundos * 1000,
+            )
+
+        return response
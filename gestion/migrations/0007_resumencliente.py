@@ -0,0 +1,73 @@
+# Generated by Django 4.2.16 on 2026-10-19 12:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Calcula los totales iniciales con una consulta agrupada por tabla"""
+    Cliente = apps.get_model('gestion', 'Cliente')
+    Pago = apps.get_model('gestion', 'Pago')
+    Asistencia = apps.get_model('gestion', 'Asistencia')
+    Bono = apps.get_model('gestion', 'Bono')
+    ResumenCliente = apps.get_model('gestion', 'ResumenCliente')
+
+    pagos = {
+        fila['cliente_id']: fila
+        for fila in Pago.objects.filter(estado='validado').values('cliente_id').annotate(
+            total=models.Sum('monto'), cantidad=models.Count('id')
+        ).order_by()
+    }
+    asistencias = {
+        fila['cliente_id']: fila
+        for fila in Asistencia.objects.values('cliente_id').annotate(
+            cantidad=models.Count('id'), ultima=models.Max('fecha')
+        ).order_by()
+    }
+    bonos = dict(
+        Bono.objects.filter(aplicado=True).values('cliente_id').annotate(
+            dias=models.Sum('dias_regalo')
+        ).order_by().values_list('cliente_id', 'dias')
+    )
+
+    resumenes = []
+    for documento in Cliente.objects.values_list('documento', flat=True).iterator():
+        pago = pagos.get(documento, {})
+        asistencia = asistencias.get(documento, {})
+        resumenes.append(ResumenCliente(
+            cliente_id=documento,
+            total_pagado=pago.get('total') or 0,
+            total_pagos=pago.get('cantidad', 0),
+            total_asistencias=asistencia.get('cantidad', 0),
+            ultima_asistencia=asistencia.get('ultima'),
+            total_dias_bono=bonos.get(documento) or 0,
+        ))
+    ResumenCliente.objects.bulk_create(resumenes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0006_alter_cliente_options_cliente_tipo_documento_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='gestion.cliente')),
+                ('total_pagado', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_pagos', models.IntegerField(default=0)),
+                ('total_asistencias', models.IntegerField(default=0)),
+                ('ultima_asistencia', models.DateField(blank=True, null=True)),
+                ('total_dias_bono', models.IntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Cliente',
+                'verbose_name_plural': 'Resúmenes de Clientes',
+                'db_table': 'resumen_clientes',
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
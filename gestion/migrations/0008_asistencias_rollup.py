@@ -0,0 +1,72 @@
+# Generated by Django 4.2.16 on 2026-10-19 12:09
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractHour, ExtractYear, ExtractMonth
+
+
+def poblar_rollups(apps, schema_editor):
+    """Construye los rollups a partir del histórico con dos consultas agrupadas"""
+    Asistencia = apps.get_model('gestion', 'Asistencia')
+    AsistenciaDiaria = apps.get_model('gestion', 'AsistenciaDiaria')
+    AsistenciaMensual = apps.get_model('gestion', 'AsistenciaMensual')
+
+    diarias = Asistencia.objects.annotate(
+        hora_bucket=ExtractHour('hora')
+    ).values('fecha', 'hora_bucket').annotate(
+        total=models.Count('id'), clientes_unicos=models.Count('cliente', distinct=True)
+    ).order_by()
+    AsistenciaDiaria.objects.bulk_create(
+        [AsistenciaDiaria(**fila) for fila in diarias.iterator()], batch_size=1000
+    )
+
+    mensuales = Asistencia.objects.annotate(
+        anio=ExtractYear('fecha'), mes=ExtractMonth('fecha')
+    ).values('anio', 'mes').annotate(
+        total=models.Count('id'), clientes_unicos=models.Count('cliente', distinct=True)
+    ).order_by()
+    AsistenciaMensual.objects.bulk_create([AsistenciaMensual(**fila) for fila in mensuales])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0007_resumencliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsistenciaMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveSmallIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('total', models.IntegerField(default=0)),
+                ('clientes_unicos', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Asistencia Mensual',
+                'verbose_name_plural': 'Asistencias Mensuales',
+                'db_table': 'asistencias_mensuales',
+                'ordering': ['-anio', '-mes'],
+                'unique_together': {('anio', 'mes')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AsistenciaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora_bucket', models.PositiveSmallIntegerField()),
+                ('total', models.IntegerField(default=0)),
+                ('clientes_unicos', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Asistencia Diaria',
+                'verbose_name_plural': 'Asistencias Diarias',
+                'db_table': 'asistencias_diarias',
+                'ordering': ['-fecha', 'hora_bucket'],
+                'unique_together': {('fecha', 'hora_bucket')},
+            },
+        ),
+        migrations.RunPython(poblar_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.16 on 2026-10-19 12:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def poblar_bitmaps(apps, schema_editor):
+    """Asigna un bit a cada cliente con asistencias y arma el bitmap de cada día"""
+    from gestion import bitmaps
+
+    Asistencia = apps.get_model('gestion', 'Asistencia')
+    IndiceVisitante = apps.get_model('gestion', 'IndiceVisitante')
+    VisitantesDia = apps.get_model('gestion', 'VisitantesDia')
+
+    clientes = Asistencia.objects.values_list('cliente_id', flat=True).distinct().order_by('cliente_id')
+    IndiceVisitante.objects.bulk_create(
+        [IndiceVisitante(cliente_id=cliente_id) for cliente_id in clientes], batch_size=1000
+    )
+    bit_de = dict(IndiceVisitante.objects.values_list('cliente_id', 'bit'))
+
+    bits_por_dia = {}
+    for fecha, cliente_id in Asistencia.objects.values_list('fecha', 'cliente_id').distinct().iterator():
+        bits_por_dia.setdefault(fecha, []).append(bit_de[cliente_id])
+
+    VisitantesDia.objects.bulk_create(
+        [VisitantesDia(fecha=fecha, bitmap=bitmaps.construir(bits)) for fecha, bits in bits_por_dia.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0008_asistencias_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitantesDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('bitmap', models.BinaryField(default=b'')),
+            ],
+            options={
+                'verbose_name': 'Visitantes del Día',
+                'verbose_name_plural': 'Visitantes por Día',
+                'db_table': 'visitantes_dia',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='IndiceVisitante',
+            fields=[
+                ('bit', models.AutoField(primary_key=True, serialize=False)),
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='indice_visitante', to='gestion.cliente')),
+            ],
+            options={
+                'verbose_name': 'Índice de Visitante',
+                'verbose_name_plural': 'Índices de Visitantes',
+                'db_table': 'indice_visitantes',
+            },
+        ),
+        migrations.RunPython(poblar_bitmaps, migrations.RunPython.noop),
+    ]
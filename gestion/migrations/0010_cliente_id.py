@@ -0,0 +1,217 @@
+"""
+Cambia la llave primaria de Cliente de `documento` (varchar) a un `id` entero.
+
+La tabla de clientes se reconstruye en `clientes_nuevo` y cada tabla hija
+recibe una columna entera que se llena cruzando por documento antes de
+soltar la FK anterior. Los resúmenes y bitmaps de visitantes son datos
+derivados: se eliminan y se vuelven a calcular al final.
+
+Los pasos de datos no tienen reversa (RunPython.noop): revertir solo rehace
+el esquema, con la tabla de clientes anterior vacía y sin la columna
+`cliente` (documento) de las tablas hijas llena. Para volver a 0009 con los
+datos se restaura un respaldo:
+
+    1. Antes de aplicar esta migración, respaldar la base:
+       mysqldump --single-transaction fittech > antes_0010.sql
+    2. Para deshacerla, restaurar ese respaldo y marcar el estado sin tocar
+       las tablas: mysql fittech < antes_0010.sql
+       python manage.py migrate gestion 0009 --fake
+"""
+import importlib
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+TABLAS_HIJAS = ('HistorialMembresia', 'Asistencia', 'Pago', 'Bono')
+
+
+def copiar_clientes(apps, schema_editor):
+    Cliente = apps.get_model('gestion', 'Cliente')
+    ClienteNuevo = apps.get_model('gestion', 'ClienteNuevo')
+
+    campos = [f.attname for f in ClienteNuevo._meta.concrete_fields if not f.primary_key]
+    filas = Cliente.objects.order_by('fecha_registro', 'documento').values(*campos)
+    ClienteNuevo.objects.bulk_create(
+        [ClienteNuevo(**fila) for fila in filas.iterator()], batch_size=1000
+    )
+
+
+def reasignar_clientes(apps, schema_editor):
+    ClienteNuevo = apps.get_model('gestion', 'ClienteNuevo')
+    nuevo_id = Subquery(ClienteNuevo.objects.filter(documento=OuterRef('cliente')).values('id')[:1])
+    for nombre in TABLAS_HIJAS:
+        apps.get_model('gestion', nombre).objects.update(cliente_nuevo=nuevo_id)
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Como en 0007, pero sobre la llave entera: los totales agrupados quedan por id de cliente"""
+    Cliente = apps.get_model('gestion', 'Cliente')
+    Pago = apps.get_model('gestion', 'Pago')
+    Asistencia = apps.get_model('gestion', 'Asistencia')
+    Bono = apps.get_model('gestion', 'Bono')
+    ResumenCliente = apps.get_model('gestion', 'ResumenCliente')
+
+    pagos = {
+        fila['cliente_id']: fila
+        for fila in Pago.objects.filter(estado='validado').values('cliente_id').annotate(
+            total=models.Sum('monto'), cantidad=models.Count('id')
+        ).order_by()
+    }
+    asistencias = {
+        fila['cliente_id']: fila
+        for fila in Asistencia.objects.values('cliente_id').annotate(
+            cantidad=models.Count('id'), ultima=models.Max('fecha')
+        ).order_by()
+    }
+    bonos = dict(
+        Bono.objects.filter(aplicado=True).values('cliente_id').annotate(
+            dias=models.Sum('dias_regalo')
+        ).order_by().values_list('cliente_id', 'dias')
+    )
+
+    resumenes = []
+    for cliente_id in Cliente.objects.values_list('pk', flat=True).iterator():
+        pago = pagos.get(cliente_id, {})
+        asistencia = asistencias.get(cliente_id, {})
+        resumenes.append(ResumenCliente(
+            cliente_id=cliente_id,
+            total_pagado=pago.get('total') or 0,
+            total_pagos=pago.get('cantidad', 0),
+            total_asistencias=asistencia.get('cantidad', 0),
+            ultima_asistencia=asistencia.get('ultima'),
+            total_dias_bono=bonos.get(cliente_id) or 0,
+        ))
+    ResumenCliente.objects.bulk_create(resumenes, batch_size=1000)
+
+
+def recalcular_derivados(apps, schema_editor):
+    apps.get_model('gestion', 'VisitantesDia').objects.all().delete()
+    poblar_resumenes(apps, schema_editor)
+    importlib.import_module('gestion.migrations.0009_visitantes_bitmap').poblar_bitmaps(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0009_visitantes_bitmap'),
+    ]
+
+    operations = [
+        # 1. Tabla nueva con llave entera y documento único
+        migrations.CreateModel(
+            name='ClienteNuevo',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('tipo_documento', models.CharField(choices=[('CC', 'Cédula de Ciudadanía'), ('CE', 'Cédula de Extranjería'), ('TI', 'Tarjeta de Identidad')], default='CC', max_length=2)),
+                ('documento', models.CharField(max_length=20, unique=True)),
+                ('nombres', models.CharField(max_length=100)),
+                ('apellidos', models.CharField(max_length=100)),
+                ('peso', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('fecha_nacimiento', models.DateField(blank=True, null=True)),
+                ('email', models.EmailField(blank=True, max_length=254, null=True)),
+                ('celular', models.CharField(blank=True, max_length=15, null=True)),
+                ('fecha_inicio_membresia', models.DateField(blank=True, null=True)),
+                ('fecha_fin_membresia', models.DateField(blank=True, null=True)),
+                ('estado', models.CharField(choices=[('activo', 'Activo'), ('inactivo', 'Inactivo'), ('pendiente', 'Pendiente')], default='pendiente', max_length=10)),
+                # Sin auto_now_add mientras se copian los datos para conservar la fecha original
+                ('fecha_registro', models.DateTimeField()),
+                ('membresia_actual', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gestion.membresia')),
+            ],
+            options={
+                'db_table': 'clientes_nuevo',
+            },
+        ),
+        migrations.RunPython(copiar_clientes, migrations.RunPython.noop),
+
+        # 2. Columna entera en cada tabla hija, llenada por documento
+        *[
+            migrations.AddField(
+                model_name=nombre.lower(),
+                name='cliente_nuevo',
+                field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion.clientenuevo'),
+            )
+            for nombre in TABLAS_HIJAS
+        ],
+        migrations.RunPython(reasignar_clientes, migrations.RunPython.noop),
+        *[migrations.RemoveField(model_name=nombre.lower(), name='cliente') for nombre in TABLAS_HIJAS],
+        *[
+            migrations.RenameField(model_name=nombre.lower(), old_name='cliente_nuevo', new_name='cliente')
+            for nombre in TABLAS_HIJAS
+        ],
+
+        # 3. Datos derivados que usan al cliente como llave
+        migrations.DeleteModel(name='ResumenCliente'),
+        migrations.DeleteModel(name='IndiceVisitante'),
+
+        # 4. Reemplazar la tabla anterior
+        migrations.DeleteModel(name='Cliente'),
+        migrations.RenameModel(old_name='ClienteNuevo', new_name='Cliente'),
+        migrations.AlterModelTable(name='cliente', table='clientes'),
+        migrations.AlterModelOptions(
+            name='cliente',
+            options={'ordering': ['-fecha_registro'], 'verbose_name': 'Cliente', 'verbose_name_plural': 'Clientes'},
+        ),
+        migrations.AlterField(
+            model_name='cliente',
+            name='fecha_registro',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='cliente',
+            name='membresia_actual',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gestion.membresia'),
+        ),
+        migrations.AlterField(
+            model_name='historialmembresia',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial', to='gestion.cliente'),
+        ),
+        migrations.AlterField(
+            model_name='asistencia',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion.cliente'),
+        ),
+        migrations.AlterField(
+            model_name='pago',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pagos', to='gestion.cliente'),
+        ),
+        migrations.AlterField(
+            model_name='bono',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bonos', to='gestion.cliente'),
+        ),
+
+        # 5. Recrear los datos derivados sobre la llave nueva
+        migrations.CreateModel(
+            name='ResumenCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='gestion.cliente')),
+                ('total_pagado', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_pagos', models.IntegerField(default=0)),
+                ('total_asistencias', models.IntegerField(default=0)),
+                ('ultima_asistencia', models.DateField(blank=True, null=True)),
+                ('total_dias_bono', models.IntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Cliente',
+                'verbose_name_plural': 'Resúmenes de Clientes',
+                'db_table': 'resumen_clientes',
+            },
+        ),
+        migrations.CreateModel(
+            name='IndiceVisitante',
+            fields=[
+                ('bit', models.AutoField(primary_key=True, serialize=False)),
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='indice_visitante', to='gestion.cliente')),
+            ],
+            options={
+                'verbose_name': 'Índice de Visitante',
+                'verbose_name_plural': 'Índices de Visitantes',
+                'db_table': 'indice_visitantes',
+            },
+        ),
+        migrations.RunPython(recalcular_derivados, migrations.RunPython.noop),
+    ]
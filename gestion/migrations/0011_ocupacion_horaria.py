@@ -0,0 +1,59 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:40
+
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def poblar_ocupacion(apps, schema_editor):
+    """Calcula la ocupación por hora de todo el histórico de asistencias"""
+    from gestion import ocupacion
+
+    Asistencia = apps.get_model('gestion', 'Asistencia')
+    OcupacionHoraria = apps.get_model('gestion', 'OcupacionHoraria')
+
+    filas = Asistencia.objects.order_by().values_list('fecha', 'hora')
+    entradas = ocupacion.minutos_de(filas.iterator(chunk_size=10000))
+    if not entradas.size:
+        return
+
+    fecha_inicio = date.fromordinal(int(entradas.min()) // ocupacion.MINUTOS_DIA)
+    fecha_fin = date.fromordinal(int(entradas.max()) // ocupacion.MINUTOS_DIA)
+    OcupacionHoraria.objects.bulk_create(
+        [
+            OcupacionHoraria(fecha=fecha, hora=hora, promedio=promedio, maxima=maxima)
+            for fecha, hora, promedio, maxima in ocupacion.filas_horarias(
+                entradas, fecha_inicio, fecha_fin, settings.OCUPACION_DURACION_SESION
+            )
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0010_cliente_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionHoraria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora', models.PositiveSmallIntegerField()),
+                ('promedio', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('maxima', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Ocupación Horaria',
+                'verbose_name_plural': 'Ocupación por Hora',
+                'db_table': 'ocupacion_horaria',
+                'ordering': ['-fecha', 'hora'],
+                'unique_together': {('fecha', 'hora')},
+            },
+        ),
+        migrations.RunPython(poblar_ocupacion, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 4.2.16 on 2026-10-19 12:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def crear_sede_principal(apps, schema_editor):
+    """
+    Los datos existentes pertenecen a un solo gimnasio: se crea la sede
+    principal y se le asignan. Los administradores quedan sin sede (ven todas).
+    """
+    modelos = ('Cliente', 'Asistencia', 'Pago', 'AsistenciaDiaria', 'AsistenciaMensual', 'OcupacionHoraria')
+    Usuario = apps.get_model('gestion', 'Usuario')
+    if not Usuario.objects.exists() and not any(apps.get_model('gestion', m).objects.exists() for m in modelos):
+        return
+
+    Sede = apps.get_model('gestion', 'Sede')
+    principal = Sede.objects.create(nombre='Sede Principal')
+    for modelo in modelos:
+        apps.get_model('gestion', modelo).objects.update(sede=principal)
+    Usuario.objects.filter(rol='empleado').update(sede=principal)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0011_ocupacion_horaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sede',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('direccion', models.CharField(blank=True, max_length=200)),
+                ('activa', models.BooleanField(default=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Sede',
+                'verbose_name_plural': 'Sedes',
+                'db_table': 'sedes',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='asistenciadiaria',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='asistenciamensual',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ocupacionhoraria',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='asistencia',
+            name='sede',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='asistencias', to='gestion.sede'),
+        ),
+        migrations.AddField(
+            model_name='asistenciadiaria',
+            name='sede',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='gestion.sede'),
+        ),
+        migrations.AddField(
+            model_name='asistenciamensual',
+            name='sede',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='gestion.sede'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='sede',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='clientes', to='gestion.sede'),
+        ),
+        migrations.AddField(
+            model_name='ocupacionhoraria',
+            name='sede',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='gestion.sede'),
+        ),
+        migrations.AddField(
+            model_name='pago',
+            name='sede',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='pagos', to='gestion.sede'),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='sede',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='usuarios', to='gestion.sede'),
+        ),
+        migrations.RunPython(crear_sede_principal, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='asistenciadiaria',
+            unique_together={('sede', 'fecha', 'hora_bucket')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='asistenciamensual',
+            unique_together={('sede', 'anio', 'mes')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='ocupacionhoraria',
+            unique_together={('sede', 'fecha', 'hora')},
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['sede', 'fecha', 'hora'], name='asistencias_sede_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['sede', 'estado', 'fecha_fin_membresia'], name='clientes_sede_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['sede', 'estado', 'fecha_pago'], name='pagos_sede_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['sede', 'fecha_pago'], name='pagos_sede_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.16 on 2026-10-19 12:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def comprimir_tablas(apps, schema_editor):
+    """En MySQL (InnoDB) las tablas de archivo se guardan comprimidas; solo se escriben al archivar"""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for tabla in ('asistencias_archivo', 'pagos_archivo'):
+        schema_editor.execute(f'ALTER TABLE {tabla} ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0012_sedes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorteArchivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tabla', models.CharField(choices=[('asistencias', 'Asistencias'), ('pagos', 'Pagos')], max_length=20, unique=True)),
+                ('fecha_corte', models.DateField()),
+                ('registros', models.BigIntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Corte de Archivo',
+                'verbose_name_plural': 'Cortes de Archivo',
+                'db_table': 'cortes_archivo',
+            },
+        ),
+        migrations.CreateModel(
+            name='PagoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('concepto', models.CharField(max_length=200)),
+                ('tipo_pago', models.CharField(choices=[('membresia', 'Membresía'), ('renovacion', 'Renovación')], default='membresia', max_length=20)),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('metodo_pago', models.CharField(choices=[('efectivo', 'Efectivo'), ('tarjeta', 'Tarjeta de Crédito/Débito'), ('transferencia', 'Transferencia Bancaria'), ('nequi', 'Nequi'), ('daviplata', 'Daviplata')], max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('validado', 'Validado'), ('rechazado', 'Rechazado'), ('cancelado', 'Cancelado')], max_length=20)),
+                ('comprobante', models.CharField(blank=True, max_length=100, null=True)),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('fecha_pago', models.DateTimeField()),
+                ('fecha_validacion', models.DateTimeField(blank=True, null=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pagos_archivados', to='gestion.cliente')),
+                ('membresia', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gestion.membresia')),
+                ('sede', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='gestion.sede')),
+                ('usuario_registro', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('usuario_validacion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Pago Archivado',
+                'verbose_name_plural': 'Pagos Archivados',
+                'db_table': 'pagos_archivo',
+                'ordering': ['-fecha_pago'],
+                'indexes': [models.Index(fields=['estado', 'fecha_pago'], name='pagos_archivo_estado_idx'), models.Index(fields=['sede', 'fecha_pago'], name='pagos_archivo_sede_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AsistenciaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha', models.DateField()),
+                ('hora', models.TimeField()),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='asistencias_archivadas', to='gestion.cliente')),
+                ('sede', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='gestion.sede')),
+                ('usuario_registro', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Asistencia Archivada',
+                'verbose_name_plural': 'Asistencias Archivadas',
+                'db_table': 'asistencias_archivo',
+                'ordering': ['-fecha', '-hora'],
+                'indexes': [models.Index(fields=['fecha', 'hora'], name='asist_archivo_fecha_idx'), models.Index(fields=['cliente', 'fecha'], name='asist_archivo_cliente_idx'), models.Index(fields=['sede', 'fecha'], name='asist_archivo_sede_idx')],
+            },
+        ),
+        migrations.RunPython(comprimir_tablas, migrations.RunPython.noop),
+    ]
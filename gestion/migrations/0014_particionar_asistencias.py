@@ -0,0 +1,54 @@
+# Generated by Django 4.2.16 on 2026-10-19 12:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+from gestion import particiones
+
+
+def particionar(apps, schema_editor):
+    """Una partición por mes desde la primera asistencia hasta los meses futuros configurados"""
+    conexion = schema_editor.connection
+    if not particiones.soportado(conexion):
+        return
+    hoy = timezone.localdate()
+    with conexion.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(fecha) FROM {particiones.TABLA}')
+        primera = cursor.fetchone()[0] or hoy
+        hasta = particiones.sumar_meses(hoy, settings.ASISTENCIAS_PARTICIONES_FUTURAS)
+        particiones.particionar(cursor, primera, hasta)
+
+
+def quitar_particiones(apps, schema_editor):
+    if particiones.soportado(schema_editor.connection):
+        with schema_editor.connection.cursor() as cursor:
+            particiones.quitar_particiones(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0013_archivo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asistencia',
+            name='cliente',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='gestion.cliente'),
+        ),
+        migrations.AlterField(
+            model_name='asistencia',
+            name='sede',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='asistencias', to='gestion.sede'),
+        ),
+        migrations.AlterField(
+            model_name='asistencia',
+            name='usuario_registro',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        # Después de quitar las llaves foráneas, que MySQL no admite en tablas particionadas
+        migrations.RunPython(particionar, quitar_particiones),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0014_particionar_asistencias'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['fecha', 'hora'], name='asistencias_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.16 on 2026-10-19 13:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def separar_por_sede(apps, schema_editor):
+    """Rearma los bitmaps con un registro por día y sede, desde las asistencias vivas y archivadas"""
+    from gestion import bitmaps
+
+    VisitantesDia = apps.get_model('gestion', 'VisitantesDia')
+    IndiceVisitante = apps.get_model('gestion', 'IndiceVisitante')
+    bit_de = dict(IndiceVisitante.objects.values_list('cliente_id', 'bit'))
+
+    bits_por_dia = {}
+    for nombre in ('Asistencia', 'AsistenciaArchivada'):
+        filas = apps.get_model('gestion', nombre).objects.values_list('sede_id', 'fecha', 'cliente_id').distinct()
+        for sede_id, fecha, cliente_id in filas.iterator():
+            # Los clientes sin bit no estaban en ningún bitmap: se dejan igual
+            if cliente_id in bit_de:
+                bits_por_dia.setdefault((sede_id, fecha), set()).add(bit_de[cliente_id])
+
+    VisitantesDia.objects.all().delete()
+    VisitantesDia.objects.bulk_create(
+        [
+            VisitantesDia(sede_id=sede_id, fecha=fecha, bitmap=bitmaps.construir(bits))
+            for (sede_id, fecha), bits in bits_por_dia.items()
+        ],
+        batch_size=500,
+    )
+
+
+def unir_sedes(apps, schema_editor):
+    """Vuelve a un bitmap por día (OR de las sedes) antes de restaurar fecha única"""
+    from gestion import bitmaps
+
+    VisitantesDia = apps.get_model('gestion', 'VisitantesDia')
+    por_dia = {}
+    for fecha, bitmap in VisitantesDia.objects.values_list('fecha', 'bitmap').iterator():
+        por_dia.setdefault(fecha, []).append(bitmap)
+
+    VisitantesDia.objects.all().delete()
+    VisitantesDia.objects.bulk_create(
+        [VisitantesDia(fecha=fecha, bitmap=bitmaps.unir(lista).tobytes()) for fecha, lista in por_dia.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0015_asistencias_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitantesdia',
+            name='sede',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='gestion.sede'),
+        ),
+        migrations.AlterField(
+            model_name='visitantesdia',
+            name='fecha',
+            field=models.DateField(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='visitantesdia',
+            unique_together={('sede', 'fecha')},
+        ),
+        migrations.RunPython(separar_por_sede, unir_sedes),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 from django.utils import timezone
 from datetime import timedelta
 
+from .querysets import AsistenciaQuerySet, ClienteQuerySet, PagoQuerySet
+
 class UsuarioManager(BaseUserManager):
     def create_user(self, correo, password=None, **extra_fields):
         if not correo:
@@ -19,6 +21,23 @@ class UsuarioManager(BaseUserManager):
         extra_fields.setdefault('is_superuser', True)
         return self.create_user(correo, password, **extra_fields)
 
+class Sede(models.Model):
+    """Gimnasio de la cadena. Clientes, usuarios, asistencias y pagos pertenecen a una sede"""
+
+    nombre = models.CharField(max_length=100, unique=True)
+    direccion = models.CharField(max_length=200, blank=True)
+    activa = models.BooleanField(default=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sedes'
+        verbose_name = 'Sede'
+        verbose_name_plural = 'Sedes'
+        ordering = ['nombre']
+
+    def __str__(self):
+        return self.nombre
+
 class Usuario(AbstractBaseUser, PermissionsMixin):
     ROLES = [
         ('empleado', 'Empleado'),
@@ -31,6 +50,8 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Sin sede: trabaja con todas (administradores de la cadena)
+    sede = models.ForeignKey(Sede, on_delete=models.PROTECT, null=True, blank=True, related_name='usuarios')
 
     objects = UsuarioManager()
 
@@ -74,9 +95,12 @@ class Cliente(models.Model):
         ('pendiente', 'Pendiente'),
     ]
 
+    # Llave entera: las FK de asistencias, pagos, etc. ocupan 4 bytes en vez de un varchar
+    id = models.AutoField(primary_key=True)
+
     # Tipo y número de documento
     tipo_documento = models.CharField(max_length=2, choices=TIPO_DOCUMENTO_CHOICES, default='CC')
-    documento = models.CharField(max_length=20, primary_key=True)
+    documento = models.CharField(max_length=20, unique=True)
     
     # Información personal
     nombres = models.CharField(max_length=100)
@@ -94,12 +118,18 @@ class Cliente(models.Model):
     # Estado y registro
     estado = models.CharField(max_length=10, choices=ESTADOS, default='pendiente')
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    sede = models.ForeignKey(Sede, on_delete=models.PROTECT, null=True, blank=True, related_name='clientes')
+
+    objects = ClienteQuerySet.as_manager()
 
     class Meta:
         db_table = 'clientes'
         verbose_name = 'Cliente'
         verbose_name_plural = 'Clientes'
         ordering = ['-fecha_registro']
+        indexes = [
+            models.Index(fields=['sede', 'estado', 'fecha_fin_membresia'], name='clientes_sede_estado_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombres} {self.apellidos} - {self.get_tipo_documento_display()}: {self.documento}"
@@ -110,6 +140,9 @@ class Cliente(models.Model):
 
     def dias_para_vencer(self):
         """Retorna los días que faltan para que venza la membresía"""
+        if hasattr(self, 'dias_restantes'):
+            # Anotado por Cliente.objects.con_vencimiento()
+            return self.dias_restantes.days if self.dias_restantes is not None else None
         if self.fecha_fin_membresia:
             delta = self.fecha_fin_membresia - timezone.now().date()
             return delta.days
@@ -124,6 +157,8 @@ class Cliente(models.Model):
     
     def membresia_vencida(self):
         """Verifica si la membresía está vencida"""
+        if hasattr(self, 'vencida'):
+            return self.vencida
         if self.fecha_fin_membresia:
             return self.fecha_fin_membresia < timezone.now().date()
         return True
@@ -154,20 +189,38 @@ class HistorialMembresia(models.Model):
         return f"{self.cliente} - {self.membresia}"
 
 class Asistencia(models.Model):
-    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
+    # En MySQL la tabla está particionada por mes (ver gestion/particiones.py), lo
+    # que no admite llaves foráneas: on_delete lo sigue aplicando Django
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, db_constraint=False)
     fecha = models.DateField(auto_now_add=True)
     hora = models.TimeField(auto_now_add=True)
-    usuario_registro = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True)
+    usuario_registro = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, db_constraint=False)
+    # Sede donde se registró la entrada (puede ser distinta a la del cliente)
+    sede = models.ForeignKey(
+        Sede, on_delete=models.PROTECT, null=True, blank=True, related_name='asistencias', db_constraint=False
+    )
+
+    objects = AsistenciaQuerySet.as_manager()
 
     class Meta:
         db_table = 'asistencias'
         verbose_name = 'Asistencia'
         verbose_name_plural = 'Asistencias'
         ordering = ['-fecha', '-hora']
+        indexes = [
+            # Listado por mes de toda la cadena: rango sobre fecha ya ordenado por (fecha, hora)
+            models.Index(fields=['fecha', 'hora'], name='asistencias_fecha_idx'),
+            models.Index(fields=['sede', 'fecha', 'hora'], name='asistencias_sede_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.cliente} - {self.fecha} {self.hora}"
 
+    def save(self, *args, **kwargs):
+        if self.sede_id is None and self.cliente_id:
+            self.sede_id = self.cliente.sede_id
+        super().save(*args, **kwargs)
+
 class Pago(models.Model):
     METODOS_PAGO = [
         ('efectivo', 'Efectivo'),
@@ -202,16 +255,29 @@ class Pago(models.Model):
     fecha_validacion = models.DateTimeField(null=True, blank=True)
     usuario_registro = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, related_name='pagos_registrados')
     usuario_validacion = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='pagos_validados')
+    # Sede donde se recibió el pago
+    sede = models.ForeignKey(Sede, on_delete=models.PROTECT, null=True, blank=True, related_name='pagos')
+
+    objects = PagoQuerySet.as_manager()
 
     class Meta:
         db_table = 'pagos'
         verbose_name = 'Pago'
         verbose_name_plural = 'Pagos'
         ordering = ['-fecha_pago']
+        indexes = [
+            models.Index(fields=['sede', 'estado', 'fecha_pago'], name='pagos_sede_estado_idx'),
+            models.Index(fields=['sede', 'fecha_pago'], name='pagos_sede_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Pago #{self.id} - {self.cliente} - ${self.monto}"
 
+    def save(self, *args, **kwargs):
+        if self.sede_id is None and self.cliente_id:
+            self.sede_id = self.cliente.sede_id
+        super().save(*args, **kwargs)
+
     def validar_pago(self, usuario_validacion):
         """Validar el pago y activar al cliente"""
         self.estado = 'validado'
@@ -277,4 +343,201 @@ class Bono(models.Model):
             self.save()
             
             return True
-        return False
\ No newline at end of file
+        return False
+
+
+class ResumenCliente(models.Model):
+    """Totales acumulados por cliente, actualizados de forma incremental"""
+
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, primary_key=True, related_name='resumen')
+    total_pagado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_pagos = models.IntegerField(default=0)
+    total_asistencias = models.IntegerField(default=0)
+    ultima_asistencia = models.DateField(null=True, blank=True)
+    total_dias_bono = models.IntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'resumen_clientes'
+        verbose_name = 'Resumen de Cliente'
+        verbose_name_plural = 'Resúmenes de Clientes'
+
+    def __str__(self):
+        return f"Resumen {self.cliente_id}"
+
+
+class AsistenciaDiaria(models.Model):
+    """Rollup de asistencias por sede, día y franja horaria (0-23)"""
+
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, null=True, blank=True)
+    fecha = models.DateField()
+    hora_bucket = models.PositiveSmallIntegerField()
+    total = models.IntegerField(default=0)
+    clientes_unicos = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'asistencias_diarias'
+        verbose_name = 'Asistencia Diaria'
+        verbose_name_plural = 'Asistencias Diarias'
+        unique_together = [('sede', 'fecha', 'hora_bucket')]
+        ordering = ['-fecha', 'hora_bucket']
+
+    def __str__(self):
+        return f"{self.fecha} {self.hora_bucket:02d}h - {self.total}"
+
+
+class AsistenciaMensual(models.Model):
+    """Rollup de asistencias por sede y mes"""
+
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, null=True, blank=True)
+    anio = models.PositiveSmallIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    total = models.IntegerField(default=0)
+    clientes_unicos = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'asistencias_mensuales'
+        verbose_name = 'Asistencia Mensual'
+        verbose_name_plural = 'Asistencias Mensuales'
+        unique_together = [('sede', 'anio', 'mes')]
+        ordering = ['-anio', '-mes']
+
+    def __str__(self):
+        return f"{self.mes:02d}/{self.anio} - {self.total}"
+
+
+class IndiceVisitante(models.Model):
+    """Posición (bit) asignada a cada cliente dentro de los bitmaps de visitantes"""
+
+    bit = models.AutoField(primary_key=True)
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, related_name='indice_visitante')
+
+    class Meta:
+        db_table = 'indice_visitantes'
+        verbose_name = 'Índice de Visitante'
+        verbose_name_plural = 'Índices de Visitantes'
+
+    def __str__(self):
+        return f"{self.cliente_id} -> bit {self.bit}"
+
+
+class VisitantesDia(models.Model):
+    """Bitmap de los clientes que asistieron en un día a una sede (un bit por cliente)"""
+
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, null=True, blank=True)
+    fecha = models.DateField()
+    bitmap = models.BinaryField(default=b'')
+
+    class Meta:
+        db_table = 'visitantes_dia'
+        verbose_name = 'Visitantes del Día'
+        verbose_name_plural = 'Visitantes por Día'
+        unique_together = [('sede', 'fecha')]
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"Visitantes {self.fecha}"
+
+
+class OcupacionHoraria(models.Model):
+    """Ocupación estimada por sede y hora (promedio y máximo de personas presentes)"""
+
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, null=True, blank=True)
+    fecha = models.DateField()
+    hora = models.PositiveSmallIntegerField()
+    promedio = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    maxima = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'ocupacion_horaria'
+        verbose_name = 'Ocupación Horaria'
+        verbose_name_plural = 'Ocupación por Hora'
+        unique_together = [('sede', 'fecha', 'hora')]
+        ordering = ['-fecha', 'hora']
+
+    def __str__(self):
+        return f"{self.fecha} {self.hora:02d}h - {self.maxima}"
+
+
+class CorteArchivo(models.Model):
+    """Fecha de corte del archivo de una tabla: los registros anteriores están en su tabla de archivo"""
+
+    TABLAS = [
+        ('asistencias', 'Asistencias'),
+        ('pagos', 'Pagos'),
+    ]
+
+    tabla = models.CharField(max_length=20, choices=TABLAS, unique=True)
+    fecha_corte = models.DateField()
+    registros = models.BigIntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'cortes_archivo'
+        verbose_name = 'Corte de Archivo'
+        verbose_name_plural = 'Cortes de Archivo'
+
+    def __str__(self):
+        return f"{self.tabla} < {self.fecha_corte}"
+
+
+class AsistenciaArchivada(models.Model):
+    """Asistencia anterior al corte de archivo: mismas columnas e id que en Asistencia"""
+
+    id = models.BigIntegerField(primary_key=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='asistencias_archivadas')
+    fecha = models.DateField()
+    hora = models.TimeField()
+    usuario_registro = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, related_name='+')
+    sede = models.ForeignKey(Sede, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+
+    objects = AsistenciaQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'asistencias_archivo'
+        verbose_name = 'Asistencia Archivada'
+        verbose_name_plural = 'Asistencias Archivadas'
+        ordering = ['-fecha', '-hora']
+        indexes = [
+            models.Index(fields=['fecha', 'hora'], name='asist_archivo_fecha_idx'),
+            models.Index(fields=['cliente', 'fecha'], name='asist_archivo_cliente_idx'),
+            models.Index(fields=['sede', 'fecha'], name='asist_archivo_sede_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cliente} - {self.fecha} {self.hora} (archivo)"
+
+
+class PagoArchivado(models.Model):
+    """Pago validado o rechazado anterior al corte de archivo: mismas columnas e id que en Pago"""
+
+    id = models.BigIntegerField(primary_key=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='pagos_archivados')
+    membresia = models.ForeignKey(Membresia, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    concepto = models.CharField(max_length=200)
+    tipo_pago = models.CharField(max_length=20, choices=Pago.TIPOS_PAGO, default='membresia')
+    monto = models.DecimalField(max_digits=10, decimal_places=2)
+    metodo_pago = models.CharField(max_length=20, choices=Pago.METODOS_PAGO)
+    estado = models.CharField(max_length=20, choices=Pago.ESTADOS_PAGO)
+    comprobante = models.CharField(max_length=100, blank=True, null=True)
+    observaciones = models.TextField(blank=True, null=True)
+    fecha_pago = models.DateTimeField()
+    fecha_validacion = models.DateTimeField(null=True, blank=True)
+    usuario_registro = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, related_name='+')
+    usuario_validacion = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    sede = models.ForeignKey(Sede, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+
+    objects = PagoQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'pagos_archivo'
+        verbose_name = 'Pago Archivado'
+        verbose_name_plural = 'Pagos Archivados'
+        ordering = ['-fecha_pago']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_pago'], name='pagos_archivo_estado_idx'),
+            models.Index(fields=['sede', 'fecha_pago'], name='pagos_archivo_sede_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pago #{self.id} - {self.cliente} - ${self.monto} (archivo)"
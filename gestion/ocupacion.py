@@ -0,0 +1,125 @@
+"""
+Estimación de ocupación a partir de las horas de entrada.
+
+Las asistencias no registran salida: cada entrada se cuenta como presente
+durante `duracion` minutos (OCUPACION_DURACION_SESION). La ocupación en un
+minuto t es la cantidad de entradas en la ventana (t - duracion, t], que se
+obtiene con una suma acumulada sobre un arreglo de entradas por minuto.
+
+Los minutos se expresan como enteros absolutos (ordinal del día * 1440 +
+minuto del día) en hora local, igual que Asistencia.fecha y Asistencia.hora.
+"""
+import threading
+import time as reloj
+from datetime import date
+
+import numpy as np
+
+MINUTOS_DIA = 24 * 60
+
+
+def minuto_de(fecha, hora):
+    """Minuto absoluto de una fecha y hora locales"""
+    return fecha.toordinal() * MINUTOS_DIA + hora.hour * 60 + hora.minute
+
+
+def minutos_de(filas):
+    """Arreglo de minutos absolutos a partir de pares (fecha, hora)"""
+    return np.fromiter((minuto_de(fecha, hora) for fecha, hora in filas), dtype=np.int64)
+
+
+def ocupacion_por_minuto(entradas, inicio, total_minutos, duracion):
+    """
+    Ocupación estimada de cada minuto en [inicio, inicio + total_minutos).
+    `entradas` son minutos absolutos; las anteriores a `inicio` cuentan
+    mientras su sesión siga abierta. `duracion` debe ser al menos 1.
+    """
+    # El arreglo empieza `duracion` minutos antes para incluir las sesiones abiertas
+    posiciones = np.asarray(entradas, dtype=np.int64) - inicio + duracion
+    largo = total_minutos + duracion
+    posiciones = posiciones[(posiciones >= 0) & (posiciones < largo)]
+
+    acumulado = np.cumsum(np.bincount(posiciones, minlength=largo))
+    return acumulado[duracion:] - acumulado[:-duracion]
+
+
+def ocupacion_horaria(entradas, fecha_inicio, fecha_fin, duracion):
+    """
+    Promedio y máximo de ocupación por hora entre dos fechas (inclusive).
+    Retorna dos arreglos de forma (días, 24).
+    """
+    dias = (fecha_fin - fecha_inicio).days + 1
+    ocupacion = ocupacion_por_minuto(entradas, fecha_inicio.toordinal() * MINUTOS_DIA, dias * MINUTOS_DIA, duracion)
+    por_hora = ocupacion.reshape(dias, 24, 60)
+    return por_hora.mean(axis=2), por_hora.max(axis=2)
+
+
+def filas_horarias(entradas, fecha_inicio, fecha_fin, duracion):
+    """Tuplas (fecha, hora, promedio, maxima) de las horas con ocupación, para guardar en bloque"""
+    promedios, maximos = ocupacion_horaria(entradas, fecha_inicio, fecha_fin, duracion)
+    dias, horas = np.nonzero(maximos)
+    primer_dia = fecha_inicio.toordinal()
+    return [
+        (date.fromordinal(primer_dia + int(d)), int(h), round(float(promedios[d, h]), 2), int(maximos[d, h]))
+        for d, h in zip(dias, horas)
+    ]
+
+
+class ContadorOcupacion:
+    """
+    Entradas por minuto de la última `duracion` en un arreglo circular, con el
+    total acumulado: registrar una entrada y leer la ocupación actual es O(1)
+    (amortizado). El contador es por proceso; se resincroniza periódicamente
+    desde la base de datos para incluir las entradas registradas por otros workers.
+    """
+
+    def __init__(self, duracion):
+        self._lock = threading.Lock()
+        self.duracion = max(int(duracion), 1)
+        self._conteos = [0] * self.duracion
+        self._minuto = None
+        self._total = 0
+        self._sincronizado = None
+
+    def _avanzar(self, minuto):
+        # Descarta las entradas cuya sesión ya terminó
+        if self._minuto is None or minuto - self._minuto >= self.duracion:
+            self._conteos = [0] * self.duracion
+            self._total = 0
+        elif minuto > self._minuto:
+            for m in range(self._minuto + 1, minuto + 1):
+                posicion = m % self.duracion
+                self._total -= self._conteos[posicion]
+                self._conteos[posicion] = 0
+        else:
+            return
+        self._minuto = minuto
+
+    def registrar(self, minuto):
+        with self._lock:
+            if self._minuto is None:
+                # Sin sincronizar: la primera lectura cargará esta entrada desde la base de datos
+                return
+            self._avanzar(max(minuto, self._minuto))
+            if minuto > self._minuto - self.duracion:
+                self._conteos[minuto % self.duracion] += 1
+                self._total += 1
+
+    def actual(self, minuto):
+        with self._lock:
+            self._avanzar(minuto)
+            return self._total
+
+    def desactualizado(self, segundos):
+        return self._sincronizado is None or reloj.monotonic() - self._sincronizado >= segundos
+
+    def reiniciar(self, entradas, minuto):
+        """Reemplaza el contenido con las entradas (minutos absolutos) de la sesión en curso"""
+        with self._lock:
+            self._minuto = None
+            self._avanzar(minuto)
+            for entrada in entradas:
+                if minuto - self.duracion < entrada <= minuto:
+                    self._conteos[entrada % self.duracion] += 1
+                    self._total += 1
+            self._sincronizado = reloj.monotonic()
@@ -0,0 +1,116 @@
+"""
+Particiones mensuales de la tabla de asistencias (solo MySQL).
+
+La tabla se particiona con RANGE COLUMNS(fecha): una partición por mes
+(pAAAAMM, con las fechas anteriores al primer día del mes siguiente) y una
+última, `pfuturo`, con MAXVALUE para que ninguna inserción falle si el
+mantenimiento se atrasa. Las consultas con condiciones sobre `fecha` (el
+listado del mes, las entradas de hoy) leen solo las particiones del rango.
+
+MySQL no admite llaves foráneas en tablas particionadas ni llaves únicas que
+no incluyan la columna de partición: la llave primaria es (id, fecha) y las
+relaciones de Asistencia se validan solo en Django (db_constraint=False).
+"""
+from datetime import date
+
+TABLA = 'asistencias'
+FUTURO = 'pfuturo'
+
+
+def soportado(conexion):
+    return conexion.vendor == 'mysql'
+
+
+def sumar_meses(fecha, meses):
+    """Primer día del mes que está `meses` después del de `fecha`"""
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def meses_entre(desde, hasta):
+    """Primeros días de cada mes entre dos fechas (inclusive)"""
+    mes, ultimo = sumar_meses(desde, 0), sumar_meses(hasta, 0)
+    while mes <= ultimo:
+        yield mes
+        mes = sumar_meses(mes, 1)
+
+
+def nombre(mes):
+    return f'p{mes:%Y%m}'
+
+
+def definicion(mes):
+    return f"PARTITION {nombre(mes)} VALUES LESS THAN ('{sumar_meses(mes, 1).isoformat()}')"
+
+
+def _definiciones(meses):
+    return ', '.join([definicion(mes) for mes in meses] + [f'PARTITION {FUTURO} VALUES LESS THAN (MAXVALUE)'])
+
+
+def particiones(cursor, tabla=TABLA):
+    """Meses con partición propia, en orden (sin contar `pfuturo`)"""
+    cursor.execute(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION",
+        [tabla],
+    )
+    return [
+        date(int(particion[1:5]), int(particion[5:7]), 1)
+        for particion, in cursor.fetchall()
+        if particion != FUTURO
+    ]
+
+
+def particionar(cursor, desde, hasta, tabla=TABLA):
+    """
+    Particiona la tabla con un mes por partición entre `desde` y `hasta`. Las
+    fechas anteriores a `desde` quedan en la primera partición. Reescribe la
+    tabla completa: en tablas grandes conviene archivar antes.
+    """
+    cursor.execute(f'ALTER TABLE {tabla} DROP PRIMARY KEY, ADD PRIMARY KEY (id, fecha)')
+    cursor.execute(
+        f'ALTER TABLE {tabla} PARTITION BY RANGE COLUMNS(fecha) ({_definiciones(meses_entre(desde, hasta))})'
+    )
+
+
+def quitar_particiones(cursor, tabla=TABLA):
+    cursor.execute(f'ALTER TABLE {tabla} REMOVE PARTITIONING')
+    cursor.execute(f'ALTER TABLE {tabla} DROP PRIMARY KEY, ADD PRIMARY KEY (id)')
+
+
+def crear_futuras(cursor, hasta):
+    """
+    Crea las particiones que falten hasta el mes de `hasta`, separándolas de
+    `pfuturo`. Solo se mueven las filas que ya estén en `pfuturo`, normalmente
+    ninguna. Retorna los meses creados.
+    """
+    existentes = particiones(cursor)
+    if not existentes:
+        return []
+    nuevos = list(meses_entre(sumar_meses(existentes[-1], 1), hasta))
+    if nuevos:
+        cursor.execute(f'ALTER TABLE {TABLA} REORGANIZE PARTITION {FUTURO} INTO ({_definiciones(nuevos)})')
+    return nuevos
+
+
+def eliminar_anteriores(cursor, corte):
+    """
+    Elimina las particiones que terminan antes de `corte` y están vacías (sus
+    filas ya pasaron al archivo). DROP PARTITION no recorre filas, a diferencia
+    de un DELETE. Retorna (eliminadas, con filas).
+    """
+    eliminadas, con_filas = [], []
+    existentes = particiones(cursor)
+    # Se conserva al menos una partición con nombre: crear_futuras parte de la última
+    for mes in existentes[:-1]:
+        if sumar_meses(mes, 1) > corte:
+            break
+        cursor.execute(f'SELECT 1 FROM {TABLA} PARTITION ({nombre(mes)}) LIMIT 1')
+        if cursor.fetchone():
+            con_filas.append(mes)
+        else:
+            eliminadas.append(mes)
+    if eliminadas:
+        cursor.execute(f"ALTER TABLE {TABLA} DROP PARTITION {', '.join(nombre(mes) for mes in eliminadas)}")
+    return eliminadas, con_filas
@@ -0,0 +1,186 @@
+"""
+QuerySets encadenables de clientes, pagos y asistencias.
+
+Cada filtro es un método que retorna otro queryset, así las vistas y los DAO
+componen una sola consulta en vez de encadenar llamadas separadas:
+
+    Cliente.objects.de_sede(sede_id).activos().por_vencer(7).con_membresia()
+    Pago.objects.validados().en_rango(fecha_inicio, fecha_fin)
+
+Las tablas de archivo usan los mismos querysets que las vivas, de modo que un
+mismo filtro sirve para las dos partes de ArchivoDAO.consulta.
+
+QuerySetPerfilado mide cada evaluación (listado, count, exists, aggregate) y
+registra en el logger 'gestion.consultas' las que tardan al menos
+CONSULTAS_LENTAS_MS, con el SQL que las originó.
+"""
+import logging
+import time as reloj
+from datetime import datetime, time, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger('gestion.consultas')
+
+# Largo máximo del SQL incluido en el log
+LARGO_SQL = 2000
+
+
+class QuerySetPerfilado(models.QuerySet):
+    def _medir(self, operacion, ejecutar):
+        limite = settings.CONSULTAS_LENTAS_MS
+        if not limite:
+            return ejecutar()
+        inicio = reloj.perf_counter()
+        try:
+            return ejecutar()
+        finally:
+            milisegundos = (reloj.perf_counter() - inicio) * 1000
+            if milisegundos >= limite:
+                logger.warning(
+                    'Consulta lenta: %s.%s tardó %.0f ms\n%s',
+                    self.model.__name__, operacion, milisegundos, self._sql(),
+                )
+
+    def _sql(self):
+        try:
+            return str(self.query)[:LARGO_SQL]
+        except EmptyResultSet:
+            return ''
+
+    def _fetch_all(self):
+        # Iterar, len() y bool() pasan por aquí: solo se mide la primera evaluación
+        if self._result_cache is not None:
+            return super()._fetch_all()
+        return self._medir('listado', super()._fetch_all)
+
+    def count(self):
+        return self._medir('count', super().count)
+
+    def exists(self):
+        return self._medir('exists', super().exists)
+
+    def aggregate(self, *args, **kwargs):
+        return self._medir('aggregate', partial(super().aggregate, *args, **kwargs))
+
+    def de_sede(self, sede_id):
+        """Restringe a una sede; con None deja todas"""
+        return self if sede_id is None else self.filter(sede_id=sede_id)
+
+
+def inicio_del_dia(fecha):
+    """Medianoche local (aware) de una fecha"""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+class ClienteQuerySet(QuerySetPerfilado):
+    @staticmethod
+    def filtro_por_vencer(dias, hoy=None):
+        """Activos cuya membresía vence entre hoy y dentro de `dias` días (también para Count(filter=...))"""
+        hoy = hoy or timezone.localdate()
+        return Q(estado='activo', fecha_fin_membresia__gte=hoy, fecha_fin_membresia__lte=hoy + timedelta(days=dias))
+
+    @staticmethod
+    def filtro_inactivos_con_email():
+        return Q(estado='inactivo', email__isnull=False) & ~Q(email='')
+
+    def activos(self):
+        return self.filter(estado='activo')
+
+    def inactivos(self):
+        return self.filter(estado='inactivo')
+
+    def pendientes(self):
+        """Esperando validación de pago"""
+        return self.filter(estado='pendiente')
+
+    def por_vencer(self, dias=7):
+        return self.filter(ClienteQuerySet.filtro_por_vencer(dias))
+
+    def vencidos(self):
+        """Activos con la membresía ya vencida (estado sin actualizar)"""
+        return self.filter(estado='activo', fecha_fin_membresia__lt=timezone.localdate())
+
+    def inactivos_con_email(self):
+        """Inactivos a los que se les puede escribir"""
+        return self.filter(ClienteQuerySet.filtro_inactivos_con_email())
+
+    def con_membresia(self):
+        """La membresía actual en el mismo JOIN"""
+        return self.select_related('membresia_actual')
+
+    def buscar(self, texto):
+        """Por documento, nombres, apellidos, email o celular"""
+        return self.filter(
+            Q(documento__icontains=texto) |
+            Q(nombres__icontains=texto) |
+            Q(apellidos__icontains=texto) |
+            Q(email__icontains=texto) |
+            Q(celular__icontains=texto)
+        )
+
+    def con_vencimiento(self, dias=7):
+        """
+        Anota los valores derivados de la membresía calculados en SQL, con la
+        fecha de hoy fijada una vez para toda la consulta:
+        - dias_restantes: fecha_fin_membresia - hoy (duración; None sin fecha)
+        - vence_pronto: vence entre hoy y dentro de `dias` días
+        - vencida: vencida o sin fecha de fin
+        Permiten ordenar y filtrar en la base de datos, y los métodos de
+        Cliente los usan en vez de recalcular la fecha por cada fila.
+        """
+        hoy = timezone.localdate()
+        return self.annotate(
+            dias_restantes=models.ExpressionWrapper(
+                models.F('fecha_fin_membresia') - models.Value(hoy, output_field=models.DateField()),
+                output_field=models.DurationField(),
+            ),
+            vence_pronto=models.Case(
+                models.When(fecha_fin_membresia__gte=hoy, fecha_fin_membresia__lte=hoy + timedelta(days=dias), then=True),
+                default=False,
+                output_field=models.BooleanField(),
+            ),
+            vencida=models.Case(
+                models.When(fecha_fin_membresia__gte=hoy, then=False),
+                default=True,
+                output_field=models.BooleanField(),
+            ),
+        )
+
+
+class PagoQuerySet(QuerySetPerfilado):
+    def validados(self):
+        return self.filter(estado='validado')
+
+    def pendientes(self):
+        return self.filter(estado='pendiente')
+
+    def rechazados(self):
+        return self.filter(estado='rechazado')
+
+    def en_rango(self, fecha_inicio, fecha_fin):
+        """
+        Pagos entre dos fechas locales (inclusive), como rango semiabierto
+        sobre fecha_pago: usa el índice, a diferencia de fecha_pago__date
+        """
+        return self.filter(
+            fecha_pago__gte=inicio_del_dia(fecha_inicio),
+            fecha_pago__lt=inicio_del_dia(fecha_fin + timedelta(days=1)),
+        )
+
+
+class AsistenciaQuerySet(QuerySetPerfilado):
+    def del_dia(self, fecha):
+        return self.filter(fecha=fecha)
+
+    def en_rango(self, fecha_inicio, fecha_fin):
+        """Asistencias entre dos fechas (inclusive)"""
+        return self.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin)
+
+    def de_cliente(self, cliente):
+        return self.filter(cliente=cliente)
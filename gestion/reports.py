@@ -4,6 +4,8 @@ from openpyxl.utils import get_column_letter
 from datetime import datetime
 from django.http import HttpResponse
 from .models import Cliente, Pago, Asistencia, Membresia
+from .dao import AsistenciaDAO, AsistenciaRollupDAO, PagoDAO
+from .estadisticas import estadisticas_clientes, estadisticas_pagos
 from django.db.models import Sum, Count
 from io import BytesIO
 
@@ -173,7 +175,7 @@ class ReportesExcel:
         fila += 1
         
         # Datos
-        pagos = Pago.objects.select_related('cliente', 'usuario_registro').all()
+        pagos = PagoDAO.lista()
         if filtro_estado:
             pagos = pagos.filter(estado=filtro_estado)
         
@@ -236,7 +238,7 @@ class ReportesExcel:
         fila += 1
         
         # Datos
-        asistencias = Asistencia.objects.select_related('cliente', 'usuario_registro').all()
+        asistencias = AsistenciaDAO.lista()
         
         if fecha_inicio:
             asistencias = asistencias.filter(fecha__gte=fecha_inicio)
@@ -282,12 +284,14 @@ class ReportesExcel:
         fila += 1
         
         # Datos
-        total_clientes = Cliente.objects.count()
-        clientes_activos = Cliente.objects.filter(estado='activo').count()
-        clientes_inactivos = Cliente.objects.filter(estado='inactivo').count()
-        total_asistencias = Asistencia.objects.count()
-        total_pagos = Pago.objects.filter(estado='validado').aggregate(Sum('monto'))['monto__sum'] or 0
-        pagos_pendientes = Pago.objects.filter(estado='pendiente').count()
+        clientes_stats = estadisticas_clientes()
+        pagos_stats = estadisticas_pagos()
+        total_clientes = clientes_stats['total_clientes']
+        clientes_activos = clientes_stats['clientes_activos']
+        clientes_inactivos = clientes_stats['clientes_inactivos']
+        total_asistencias = AsistenciaRollupDAO.contar_total()
+        total_pagos = pagos_stats['total_ingresos']
+        pagos_pendientes = pagos_stats['pagos_pendientes']
         
         datos_resumen = [
             ['CLIENTES', '', ''],
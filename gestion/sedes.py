@@ -0,0 +1,19 @@
+"""
+Sede con la que trabaja cada petición.
+
+Un usuario con sede trabaja siempre con la suya. Un usuario sin sede
+(administrador de la cadena) ve todas, o la que haya elegido en la sesión.
+"""
+
+SESION_SEDE = 'sede_id'
+
+
+def sede_actual(request):
+    """Id de la sede de la petición; None = todas las sedes. Se calcula una vez por petición"""
+    if not hasattr(request, '_sede_id'):
+        usuario = getattr(request, 'user', None)
+        if usuario is None or not usuario.is_authenticated:
+            request._sede_id = None
+        else:
+            request._sede_id = usuario.sede_id or request.session.get(SESION_SEDE)
+    return request._sede_id
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cliente, Pago, HistorialMembresia
+
+
+class PagoService:
+    """Servicio de dominio para el registro de pagos de membresía"""
+
+    @staticmethod
+    def registrar(cliente, membresia, metodo_pago, usuario, monto=None, concepto='',
+                  tipo_pago='membresia', comprobante='', observaciones='', sede_id=None):
+        """
+        Registra un pago pendiente, extiende la membresía del cliente y guarda el
+        historial en una sola transacción.
+
+        El cliente se bloquea (SELECT ... FOR UPDATE) para que dos registros
+        simultáneos no pisen la fecha de fin de la membresía. Sin `sede_id` el
+        pago queda en la sede del cliente.
+        """
+        # Fecha local: las membresías se cuentan por días de Bogotá, no de UTC
+        hoy = timezone.localdate()
+        monto = Decimal(str(monto)) if monto not in (None, '') else membresia.precio
+        concepto = concepto or f'Pago de membresía {membresia.nombre}'
+
+        with transaction.atomic():
+            cliente_bloqueado = Cliente.objects.select_for_update().only(
+                'documento', 'fecha_inicio_membresia', 'fecha_fin_membresia', 'estado', 'membresia_actual', 'sede'
+            ).get(pk=cliente.pk)
+
+            pago = Pago.objects.create(
+                cliente=cliente_bloqueado,
+                membresia=membresia,
+                concepto=concepto,
+                tipo_pago=tipo_pago,
+                monto=monto,
+                metodo_pago=metodo_pago,
+                comprobante=comprobante,
+                observaciones=observaciones,
+                usuario_registro=usuario,
+                estado='pendiente',
+                sede_id=sede_id or cliente_bloqueado.sede_id,
+            )
+
+            campos = ['estado']
+            if tipo_pago == 'membresia':
+                duracion = timedelta(days=membresia.duracion_dias)
+                fin_actual = cliente_bloqueado.fecha_fin_membresia
+
+                if fin_actual and fin_actual > hoy:
+                    # Membresía vigente: se suman los días al final
+                    inicio_periodo = fin_actual
+                    cliente_bloqueado.fecha_fin_membresia = fin_actual + duracion
+                else:
+                    # Sin membresía o vencida: inicia desde hoy
+                    inicio_periodo = hoy
+                    cliente_bloqueado.fecha_inicio_membresia = hoy
+                    cliente_bloqueado.fecha_fin_membresia = hoy + duracion
+                    campos.append('fecha_inicio_membresia')
+
+                cliente_bloqueado.membresia_actual = membresia
+                campos += ['fecha_fin_membresia', 'membresia_actual']
+
+                HistorialMembresia.objects.create(
+                    cliente=cliente_bloqueado,
+                    membresia=membresia,
+                    fecha_inicio=inicio_periodo,
+                    fecha_fin=cliente_bloqueado.fecha_fin_membresia,
+                    precio_pagado=monto,
+                )
+
+            # El cliente queda pendiente hasta que se valide el pago
+            cliente_bloqueado.estado = 'pendiente'
+            cliente_bloqueado.save(update_fields=campos)
+
+        # Reflejar los cambios en la instancia que recibió la vista
+        cliente.estado = cliente_bloqueado.estado
+        cliente.membresia_actual = cliente_bloqueado.membresia_actual
+        cliente.fecha_inicio_membresia = cliente_bloqueado.fecha_inicio_membresia
+        cliente.fecha_fin_membresia = cliente_bloqueado.fecha_fin_membresia
+
+        return pago
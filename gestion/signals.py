@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Cliente, Membresia, Pago, Asistencia, Bono, HistorialMembresia
+from .dao import ResumenClienteDAO, AsistenciaRollupDAO, VisitantesDAO, OcupacionDAO
+from .cache import CatalogoMembresias, invalidar_vistas
+
+
+# ============= RESUMEN DE CLIENTES =============
+# Se usa __dict__ para no forzar la carga de campos diferidos con only()/defer()
+
+@receiver(post_init, sender=Pago)
+def recordar_estado_pago(sender, instance, **kwargs):
+    instance._estado_inicial = instance.__dict__.get('estado')
+    instance._monto_inicial = instance.__dict__.get('monto')
+    instance._cliente_inicial = instance.__dict__.get('cliente_id')
+
+
+def _aporte_al_resumen(cliente_id, monto):
+    """(cliente, monto) que un pago validado suma al resumen"""
+    return cliente_id, Decimal(str(monto))
+
+
+@receiver(post_save, sender=Pago)
+def actualizar_resumen_pago(sender, instance, created, **kwargs):
+    # Lo que el pago sumaba antes de guardar y lo que suma ahora: cubre la
+    # validación, el rechazo y la edición del monto o del cliente de un validado
+    antes = None
+    if not created and instance._estado_inicial == 'validado':
+        antes = _aporte_al_resumen(
+            instance._cliente_inicial or instance.cliente_id,
+            instance.monto if instance._monto_inicial is None else instance._monto_inicial,
+        )
+    despues = _aporte_al_resumen(instance.cliente_id, instance.monto) if instance.estado == 'validado' else None
+
+    if antes != despues:
+        if antes:
+            ResumenClienteDAO.restar_pago(*antes)
+        if despues:
+            ResumenClienteDAO.sumar_pago(*despues)
+    else:
+        ResumenClienteDAO.invalidar(instance.cliente_id)
+
+    instance._estado_inicial = instance.estado
+    instance._monto_inicial = instance.monto
+    instance._cliente_inicial = instance.cliente_id
+
+
+@receiver(post_delete, sender=Pago)
+def descontar_resumen_pago(sender, instance, **kwargs):
+    if instance.estado == 'validado':
+        ResumenClienteDAO.restar_pago(instance.cliente_id, instance.monto)
+    else:
+        ResumenClienteDAO.invalidar(instance.cliente_id)
+
+
+@receiver(post_save, sender=Asistencia)
+def actualizar_resumen_asistencia(sender, instance, created, **kwargs):
+    if created:
+        ResumenClienteDAO.sumar_asistencia(instance.cliente_id, instance.fecha)
+        AsistenciaRollupDAO.registrar(instance)
+        VisitantesDAO.registrar(instance.cliente_id, instance.fecha, instance.sede_id)
+        OcupacionDAO.registrar(instance)
+
+
+@receiver(post_delete, sender=Asistencia)
+def descontar_resumen_asistencia(sender, instance, **kwargs):
+    ResumenClienteDAO.restar_asistencia(instance.cliente_id, instance.fecha)
+    AsistenciaRollupDAO.descontar(instance)
+    VisitantesDAO.descontar(instance)
+
+
+@receiver(post_init, sender=Bono)
+def recordar_bono_aplicado(sender, instance, **kwargs):
+    instance._aplicado_inicial = instance.__dict__.get('aplicado')
+
+
+@receiver(post_save, sender=Bono)
+def actualizar_resumen_bono(sender, instance, created, **kwargs):
+    if instance.aplicado and (created or not instance._aplicado_inicial):
+        ResumenClienteDAO.sumar_bono(instance.cliente_id, instance.dias_regalo)
+    else:
+        ResumenClienteDAO.invalidar(instance.cliente_id)
+    instance._aplicado_inicial = instance.aplicado
+
+
+@receiver(post_save, sender=HistorialMembresia)
+@receiver(post_delete, sender=HistorialMembresia)
+def invalidar_perfil_historial(sender, instance, **kwargs):
+    ResumenClienteDAO.invalidar(instance.cliente_id)
+
+
+@receiver(post_save, sender=Cliente)
+def invalidar_perfil_cliente(sender, instance, **kwargs):
+    ResumenClienteDAO.invalidar(instance.pk)
+
+
+# ============= CATÁLOGO DE MEMBRESÍAS =============
+
+@receiver(post_save, sender=Membresia)
+@receiver(post_delete, sender=Membresia)
+def invalidar_catalogo_membresias(sender, **kwargs):
+    CatalogoMembresias.invalidar()
+
+
+# ============= CACHE DE VISTAS =============
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidar_vistas_en_cache(sender, **kwargs):
+    invalidar_vistas(sender)
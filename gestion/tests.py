@@ -1,3 +1,978 @@
-from django.test import TestCase
+import io
+import json
+from unittest import mock
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Sum
+from django.test import TestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from .conciliacion import VENTANA_DIAS, ConciliacionService, _parsear_monto
+from . import estadisticas, particiones
+from .cache import CatalogoMembresias
+from .controllers import actualizar_estados_clientes
+from .middleware import RegistroMetricas
+from .dao import AsistenciaDAO, AsistenciaRollupDAO, ArchivoDAO, OcupacionDAO, PagoDAO, ResumenClienteDAO, VisitantesDAO
+from .models import (
+    Usuario, Sede, Membresia, Cliente, HistorialMembresia, Asistencia, Pago, Bono, ResumenCliente,
+    AsistenciaDiaria, AsistenciaMensual, AsistenciaArchivada, PagoArchivado, OcupacionHoraria,
+)
+from .querysets import ClienteQuerySet
+from .sedes import SESION_SEDE
+from .services import PagoService
+
+# Tamaño del conjunto de datos sembrado: suficiente para que un N+1 se note
+TOTAL_CLIENTES = 2000
+PAGOS_POR_CLIENTE = 2
+ASISTENCIAS_POR_CLIENTE = 5
+DIAS_HISTORIA = 30
+
+# Máximo de consultas por URL. Si un cambio lo supera, revisar el N+1 antes de
+# subir el número.
+PRESUPUESTOS = {
+    'login': 2,
+    'dashboard': 15,
+    'membresias_listar': 3,
+    'membresias_crear': 2,
+    'membresias_ver': 3,
+    'membresias_editar': 3,
+    'clientes_listar': 4,
+    'clientes_crear': 3,
+    'clientes_importar_excel': 2,
+    'clientes_ver': 10,
+    'clientes_editar': 3,
+    'clientes_renovar': 5,
+    'cliente_asistencias': 7,
+    'cliente_asistencias_estadisticas': 6,
+    'clientes_perfil_json': 10,
+    'asistencias_listar': 7,
+    'asistencias_registrar': 3,
+    'asistencias_ocupacion': 5,
+    'asistencias_ocupacion_actual': 3,
+    'asistencias_exportar_excel': 4,
+    'asistencias_exportar_pdf': 4,
+    'pagos_listar': 6,
+    'pagos_crear': 4,
+    'pagos_registrar': 4,
+    'pagos_reportes': 4,
+    'pagos_conciliar': 2,
+    'pagos_exportar_excel': 4,
+    'pagos_exportar_pdf': 4,
+    'pagos_ver': 3,
+    'pagos_editar': 4,
+    'pagos_validar': 4,
+    'usuarios_listar': 3,
+    'usuarios_crear': 3,
+    'usuarios_ver': 3,
+    'usuarios_editar': 4,
+    'sedes_listar': 3,
+    'sedes_seleccionar': 2,
+    'sedes_editar': 3,
+    'bonos_listar': 4,
+    'bonos_crear': 3,
+    'bonos_estadisticas': 7,
+    'reportes_generales': 10,
+    'reportes_membresias_excel': 8,
+    'reportes_membresias_pdf': 8,
+    'reportes_clientes_excel': 3,
+    'reportes_clientes_pdf': 3,
+    'reportes_usuarios_excel': 3,
+    'reportes_usuarios_pdf': 3,
+    'reporte_consolidado_excel': 10,
+    'reportes_cohortes': 6,
+    'reportes_cohortes_excel': 6,
+    'emails_panel': 4,
+    'emails_clientes_inactivos': 4,
+    'cache_estadisticas': 2,
+    'metricas': 2,
+}
+
+# URLs que modifican datos o envían correos con un GET; no se miden
+SIN_PRESUPUESTO = {
+    'logout',
+    'membresias_eliminar',
+    'clientes_eliminar',
+    'pagos_eliminar',
+    'usuarios_eliminar',
+    'bonos_aplicar',
+    'bonos_eliminar',
+    'enviar_emails_vencimiento',
+    'enviar_emails_inactivos',
+    'enviar_email_renovacion_individual',
+    'enviar_email_vencimiento_individual',
+    'enviar_email_reactivacion_individual',
+}
+
+
+def sembrar_datos(total_clientes=TOTAL_CLIENTES):
+    """Crea un gimnasio de tamaño realista con bulk_create (sin señales)"""
+    hoy = timezone.now().date()
+
+    admin = Usuario.objects.create_superuser('admin@fittech.test', 'clave-admin', nombre='Admin')
+    empleado = Usuario.objects.create_user(
+        'empleado@fittech.test', 'clave-empleado', nombre='Empleado', rol='empleado'
+    )
+
+    sedes = Sede.objects.bulk_create([Sede(nombre='Norte'), Sede(nombre='Sur')])
+
+    membresias = Membresia.objects.bulk_create([
+        Membresia(nombre='Diaria', duracion_dias=1, precio=Decimal('10000')),
+        Membresia(nombre='Mensual', duracion_dias=30, precio=Decimal('80000')),
+        Membresia(nombre='Trimestral', duracion_dias=90, precio=Decimal('210000')),
+        Membresia(nombre='Anual', duracion_dias=365, precio=Decimal('750000')),
+    ])
+
+    estados = ('activo', 'activo', 'activo', 'inactivo', 'pendiente')
+    Cliente.objects.bulk_create([
+        Cliente(
+            documento=str(10_000_000 + i),
+            nombres=f'Cliente {i}',
+            apellidos='Prueba',
+            email=f'cliente{i}@fittech.test' if i % 3 else None,
+            celular='3000000000',
+            membresia_actual=membresias[i % len(membresias)],
+            fecha_inicio_membresia=hoy - timedelta(days=30),
+            fecha_fin_membresia=hoy + timedelta(days=(i % 40) - 10),
+            estado=estados[i % len(estados)],
+            sede=sedes[i % len(sedes)],
+        )
+        for i in range(total_clientes)
+    ], batch_size=1000)
+    clientes = list(Cliente.objects.select_related('membresia_actual'))
+
+    HistorialMembresia.objects.bulk_create([
+        HistorialMembresia(
+            cliente=c, membresia=c.membresia_actual,
+            fecha_inicio=c.fecha_inicio_membresia, fecha_fin=c.fecha_fin_membresia,
+            precio_pagado=c.membresia_actual.precio,
+        )
+        for c in clientes
+    ], batch_size=1000)
+
+    metodos = ('efectivo', 'tarjeta', 'transferencia', 'nequi', 'daviplata')
+    estados_pago = ('validado', 'validado', 'validado', 'pendiente', 'rechazado')
+    Pago.objects.bulk_create([
+        Pago(
+            cliente=c, membresia=c.membresia_actual, concepto=f'Pago {n}',
+            monto=c.membresia_actual.precio, metodo_pago=metodos[(i + n) % len(metodos)],
+            estado=estados_pago[(i + n) % len(estados_pago)], comprobante=f'REF{i}-{n}',
+            usuario_registro=admin, sede_id=c.sede_id,
+        )
+        for i, c in enumerate(clientes) for n in range(PAGOS_POR_CLIENTE)
+    ], batch_size=1000)
+
+    Asistencia.objects.bulk_create([
+        Asistencia(cliente=c, usuario_registro=empleado, sede_id=c.sede_id)
+        for c in clientes for _ in range(ASISTENCIAS_POR_CLIENTE)
+    ], batch_size=1000)
+    # fecha es auto_now_add: se reparte después sobre el último mes
+    for dias in range(1, DIAS_HISTORIA):
+        Asistencia.objects.annotate(resto=F('id') % DIAS_HISTORIA).filter(resto=dias).update(
+            fecha=hoy - timedelta(days=dias)
+        )
+
+    Bono.objects.bulk_create([
+        Bono(
+            cliente=c, tipo_bono='2_dias', dias_regalo=2, motivo='Cortesía',
+            usuario_otorgo=admin, aplicado=bool(i % 2),
+        )
+        for i, c in enumerate(clientes[::10])
+    ])
+
+    AsistenciaRollupDAO.compactar(hoy - timedelta(days=DIAS_HISTORIA), hoy)
+    VisitantesDAO.reconstruir(hoy - timedelta(days=DIAS_HISTORIA), hoy)
+
+    return admin
+
+
+class PresupuestoConsultasTest(TestCase):
+    """Cada URL debe responder dentro de su presupuesto de consultas con datos realistas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = sembrar_datos()
+        cls.cliente = Cliente.objects.order_by('id').first()
+        cls.argumentos = {
+            'id': {
+                'membresias': Membresia.objects.values_list('id', flat=True).first(),
+                'pagos': Pago.objects.values_list('id', flat=True).first(),
+                'usuarios': cls.admin.id,
+                'bonos': Bono.objects.values_list('id', flat=True).first(),
+                'sedes': Sede.objects.values_list('id', flat=True).first(),
+            },
+            'documento': cls.cliente.documento,
+        }
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def url_de(self, patron):
+        nombre = patron.name
+        ruta = str(patron.pattern)
+        kwargs = {}
+        if '<int:id>' in ruta:
+            kwargs['id'] = self.argumentos['id'][ruta.split('/')[0]]
+        if '<str:documento>' in ruta:
+            kwargs['documento'] = self.argumentos['documento']
+        return reverse(nombre, kwargs=kwargs)
+
+    def medir(self, nombre):
+        patron = next(p for p in get_resolver().url_patterns if getattr(p, 'name', None) == nombre)
+        url = self.url_de(patron)
+        # Sin cache de vistas: se mide el peor caso
+        cache.clear()
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url)
+        self.assertLess(respuesta.status_code, 500, f'{url} respondió {respuesta.status_code}')
+        return url, consultas
+
+    def test_todas_las_urls_tienen_presupuesto(self):
+        nombres = {p.name for p in get_resolver().url_patterns if getattr(p, 'name', None)}
+        faltantes = nombres - set(PRESUPUESTOS) - SIN_PRESUPUESTO
+        self.assertFalse(faltantes, f'URLs sin presupuesto de consultas: {sorted(faltantes)}')
+
+
+def _crear_prueba(nombre, maximo):
+    def prueba(self):
+        url, consultas = self.medir(nombre)
+        self.assertLessEqual(
+            len(consultas), maximo,
+            f'{url} ejecutó {len(consultas)} consultas (presupuesto {maximo}):\n'
+            + '\n'.join(c['sql'][:200] for c in consultas.captured_queries),
+        )
+    prueba.__name__ = f'test_presupuesto_{nombre}'
+    return prueba
+
+
+for _nombre, _maximo in PRESUPUESTOS.items():
+    setattr(PresupuestoConsultasTest, f'test_presupuesto_{_nombre}', _crear_prueba(_nombre, _maximo))
+
+
+def crear_basicos():
+    """Un administrador, una membresía mensual y un cliente pendiente"""
+    admin = Usuario.objects.create_superuser('admin@fittech.test', 'clave-admin', nombre='Admin')
+    membresia = Membresia.objects.create(nombre='Mensual', duracion_dias=30, precio=Decimal('80000'))
+    cliente = Cliente.objects.create(
+        documento='10000001', nombres='Ana', apellidos='Prueba', celular='3000000000',
+        email='ana@fittech.test', membresia_actual=membresia, estado='pendiente',
+    )
+    return admin, membresia, cliente
+
+
+class ConciliacionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.membresia, cls.cliente = crear_basicos()
+
+    def pago(self, monto, comprobante='', estado='pendiente', dias=0):
+        pago = Pago.objects.create(
+            cliente=self.cliente, membresia=self.membresia, concepto='Mensualidad',
+            monto=Decimal(monto), metodo_pago='transferencia', estado=estado,
+            comprobante=comprobante, usuario_registro=self.admin,
+        )
+        if dias:
+            Pago.objects.filter(pk=pago.pk).update(fecha_pago=F('fecha_pago') - timedelta(days=dias))
+        return pago
+
+    def movimiento(self, monto, referencia='', dias=0):
+        return {
+            'fila': 2, 'referencia': referencia, 'monto': Decimal(monto),
+            'fecha': timezone.localdate() - timedelta(days=dias),
+        }
+
+    def test_parsear_monto(self):
+        casos = {
+            '$1.234.567,00': Decimal('1234567.00'),
+            '1,234,567.00': Decimal('1234567.00'),
+            '1.234.567': Decimal('1234567.00'),
+            '1,234,567': Decimal('1234567.00'),
+            '1.234': Decimal('1234.00'),
+            '1,234': Decimal('1234.00'),
+            '1234,5': Decimal('1234.50'),
+            '1234,50': Decimal('1234.50'),
+            '1234.50': Decimal('1234.50'),
+            '80000': Decimal('80000.00'),
+            'COP 80.000': Decimal('80000.00'),
+            '': None,
+            'abc': None,
+            'NaN': None,
+        }
+        for texto, esperado in casos.items():
+            with self.subTest(texto=texto):
+                self.assertEqual(_parsear_monto(texto), esperado)
+
+    def test_leer_extracto(self):
+        archivo = io.BytesIO('fecha;valor;referencia\n2026-01-05;80.000;ab-12\n05/01/2026;x;C\n'.encode())
+        movimientos, errores = ConciliacionService.leer_extracto(archivo)
+        self.assertEqual(len(movimientos), 1)
+        self.assertEqual(movimientos[0]['monto'], Decimal('80000.00'))
+        self.assertEqual(errores, ['Fila 3: monto o fecha inválidos'])
+
+    def test_por_comprobante(self):
+        pago = self.pago('80000', comprobante='AB-12')
+        self.pago('80000')
+        resultado = ConciliacionService.conciliar([self.movimiento('80000', referencia='ab 12')])
+        self.assertEqual([c['pago']['id'] for c in resultado['coincidencias']], [pago.id])
+        self.assertEqual(resultado['coincidencias'][0]['criterio'], 'comprobante')
+
+    def test_monto_repetido_en_la_ventana_es_ambiguo(self):
+        self.pago('80000')
+        self.pago('80000', dias=2)
+        resultado = ConciliacionService.conciliar([self.movimiento('80000', dias=1)])
+        self.assertFalse(resultado['coincidencias'])
+        self.assertEqual(len(resultado['ambiguos'][0]['candidatos']), 2)
+
+    def test_fuera_de_la_ventana(self):
+        self.pago('80000', comprobante='AB-12', dias=VENTANA_DIAS + 1)
+        resultado = ConciliacionService.conciliar([
+            self.movimiento('80000'), self.movimiento('80000', referencia='AB-12'),
+        ])
+        self.assertFalse(resultado['coincidencias'])
+        self.assertEqual(len(resultado['sin_conciliar']), 2)
+
+    def test_pago_ya_validado_no_se_concilia(self):
+        self.pago('80000', comprobante='AB-12', estado='validado')
+        resultado = ConciliacionService.conciliar([self.movimiento('80000', referencia='AB-12')])
+        self.assertFalse(resultado['coincidencias'])
+        self.assertEqual(len(resultado['sin_conciliar']), 1)
+
+    def test_validar_en_lote(self):
+        pendientes = [self.pago('80000'), self.pago('50000')]
+        validado = self.pago('30000', estado='validado')
+        resumen_antes = ResumenClienteDAO.obtener(self.cliente)
+
+        ids = [str(p.id) for p in pendientes] + [str(validado.id), 'x']
+        self.assertEqual(ConciliacionService.validar_en_lote(ids, self.admin), 2)
+
+        self.assertEqual(
+            set(Pago.objects.filter(estado='validado').values_list('id', flat=True)),
+            {p.id for p in pendientes} | {validado.id},
+        )
+        self.assertTrue(Pago.objects.filter(pk=pendientes[0].pk, usuario_validacion=self.admin).exists())
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.estado, 'activo')
+        resumen = ResumenClienteDAO.obtener(self.cliente)
+        self.assertEqual(resumen.total_pagado - resumen_antes.total_pagado, Decimal('130000'))
+        self.assertEqual(resumen.total_pagos - resumen_antes.total_pagos, 2)
+
+
+class OcupacionTest(TestCase):
+    def test_tipica_usa_la_fecha_local(self):
+        # 21:00 del lunes 19 en Bogotá, ya martes 20 en UTC
+        ahora = datetime(2026, 10, 20, 2, 0, tzinfo=dt_timezone.utc)
+        OcupacionHoraria.objects.create(fecha=date(2026, 10, 19), hora=18, promedio=Decimal('40'))
+        OcupacionHoraria.objects.create(fecha=date(2026, 10, 12), hora=18, promedio=Decimal('8'))
+        with mock.patch('django.utils.timezone.now', return_value=ahora):
+            tipica = OcupacionDAO.tipica_por_hora(0, semanas=1)
+        # Solo el lunes anterior: el de hoy todavía no terminó
+        self.assertEqual(tipica, {18: 8.0})
+
+
+class PagoServiceTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.membresia, cls.cliente = crear_basicos()
+
+    def registrar(self, fin, tipo_pago='membresia'):
+        Cliente.objects.filter(pk=self.cliente.pk).update(
+            fecha_inicio_membresia=fin and fin - timedelta(days=30), fecha_fin_membresia=fin, estado='activo',
+        )
+        self.cliente.refresh_from_db()
+        return PagoService.registrar(
+            self.cliente, self.membresia, 'efectivo', self.admin, tipo_pago=tipo_pago,
+        )
+
+    def test_membresia_vencida_inicia_hoy(self):
+        hoy = timezone.localdate()
+        pago = self.registrar(hoy - timedelta(days=5))
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.fecha_inicio_membresia, hoy)
+        self.assertEqual(self.cliente.fecha_fin_membresia, hoy + timedelta(days=30))
+        self.assertEqual(self.cliente.estado, 'pendiente')
+        self.assertEqual((pago.estado, pago.monto), ('pendiente', Decimal('80000')))
+        historial = HistorialMembresia.objects.get(cliente=self.cliente)
+        self.assertEqual((historial.fecha_inicio, historial.fecha_fin), (hoy, hoy + timedelta(days=30)))
+        self.assertEqual(historial.precio_pagado, Decimal('80000'))
+
+    def test_membresia_vigente_suma_al_final(self):
+        hoy = timezone.localdate()
+        fin = hoy + timedelta(days=10)
+        self.registrar(fin)
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.fecha_inicio_membresia, fin - timedelta(days=30))
+        self.assertEqual(self.cliente.fecha_fin_membresia, fin + timedelta(days=30))
+        historial = HistorialMembresia.objects.get(cliente=self.cliente)
+        self.assertEqual((historial.fecha_inicio, historial.fecha_fin), (fin, fin + timedelta(days=30)))
+
+    def test_renovacion_no_extiende(self):
+        fin = timezone.localdate() + timedelta(days=10)
+        self.registrar(fin, tipo_pago='renovacion')
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.fecha_fin_membresia, fin)
+        self.assertEqual(self.cliente.estado, 'pendiente')
+        self.assertFalse(HistorialMembresia.objects.exists())
+
+    def test_pagos_crear_usa_el_servicio(self):
+        self.client.force_login(self.admin)
+        respuesta = self.client.post(reverse('pagos_crear'), {
+            'documento': self.cliente.documento, 'metodo_pago': 'nequi', 'comprobante': 'AB-12',
+        })
+        self.assertRedirects(respuesta, reverse('pagos_listar'), fetch_redirect_response=False)
+        pago = Pago.objects.get(cliente=self.cliente)
+        self.assertEqual((pago.metodo_pago, pago.comprobante, pago.estado), ('nequi', 'AB-12', 'pendiente'))
+        self.assertTrue(HistorialMembresia.objects.filter(cliente=self.cliente).exists())
+
+    def test_bloquea_al_cliente_dentro_de_la_transaccion(self):
+        original = ClienteQuerySet.select_for_update
+        with mock.patch.object(ClienteQuerySet, 'select_for_update', autospec=True, side_effect=original) as bloqueo:
+            self.registrar(None)
+        bloqueo.assert_called_once()
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_bloquea_al_cliente(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.registrar(None)
+        bloqueo = [c['sql'] for c in consultas.captured_queries if 'FOR UPDATE' in c['sql']]
+        self.assertEqual(len(bloqueo), 1)
+        self.assertIn(Cliente._meta.db_table, bloqueo[0])
+
+
+class ResumenClienteTest(TestCase):
+    """El resumen incremental debe coincidir siempre con el recalculado desde las tablas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.membresia, cls.cliente = crear_basicos()
+
+    def resumen(self):
+        resumen = ResumenClienteDAO.obtener(self.cliente)
+        return resumen.total_pagado, resumen.total_pagos, resumen.total_asistencias, resumen.ultima_asistencia
+
+    def assertIgualAlRecalculado(self):
+        incremental = self.resumen()
+        ResumenClienteDAO.recalcular(self.cliente.pk)
+        self.assertEqual(incremental, self.resumen())
+        return incremental
+
+    def pago(self, monto='80000'):
+        return Pago.objects.create(
+            cliente=self.cliente, membresia=self.membresia, concepto='Mensualidad',
+            monto=Decimal(monto), metodo_pago='efectivo', usuario_registro=self.admin,
+        )
+
+    def test_actualizar_estados_invalida_el_perfil(self):
+        Cliente.objects.filter(pk=self.cliente.pk).update(estado='activo', fecha_fin_membresia=timezone.localdate() - timedelta(days=1))
+        self.cliente.refresh_from_db()
+        cache.clear()
+        self.assertEqual(json.loads(ResumenClienteDAO.obtener_perfil_json(self.cliente))['estado'], 'activo')
+
+        actualizar_estados_clientes()
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(json.loads(ResumenClienteDAO.obtener_perfil_json(self.cliente))['estado'], 'inactivo')
+
+    def test_pago_validado_rechazado_y_eliminado(self):
+        pago = self.pago()
+        self.assertEqual(self.assertIgualAlRecalculado()[:2], (0, 0))
+        pago.validar_pago(self.admin)
+        self.assertEqual(self.assertIgualAlRecalculado()[:2], (Decimal('80000'), 1))
+        pago.rechazar_pago(self.admin, 'Comprobante falso')
+        self.assertEqual(self.assertIgualAlRecalculado()[:2], (0, 0))
+
+        otro = self.pago('50000')
+        otro.validar_pago(self.admin)
+        otro.delete()
+        self.assertEqual(self.assertIgualAlRecalculado()[:2], (0, 0))
+
+    def test_cambio_de_monto_de_un_pago_validado(self):
+        pago = self.pago()
+        pago.validar_pago(self.admin)
+        PagoDAO.actualizar(pago.id, {'monto': 95000.0})
+        self.assertEqual(self.assertIgualAlRecalculado()[:2], (Decimal('95000'), 1))
+
+    def test_cambio_de_cliente_de_un_pago_validado(self):
+        pago = self.pago()
+        pago.validar_pago(self.admin)
+        otro = Cliente.objects.create(documento='10000002', nombres='Beto', apellidos='Prueba', celular='3000000001')
+        PagoDAO.actualizar(pago.id, {'cliente': otro})
+        self.assertEqual(self.assertIgualAlRecalculado()[:2], (0, 0))
+        self.assertEqual(ResumenClienteDAO.obtener(otro).total_pagado, Decimal('80000'))
+
+    def test_asistencia_creada_y_eliminada(self):
+        ayer = timezone.localdate() - timedelta(days=1)
+        anterior = Asistencia.objects.create(cliente=self.cliente, usuario_registro=self.admin)
+        Asistencia.objects.filter(pk=anterior.pk).update(fecha=ayer)
+        ResumenClienteDAO.recalcular(self.cliente.pk)
+        hoy = Asistencia.objects.create(cliente=self.cliente, usuario_registro=self.admin)
+        self.assertEqual(self.assertIgualAlRecalculado()[2:], (2, hoy.fecha))
+
+        hoy.delete()
+        self.assertEqual(self.assertIgualAlRecalculado()[2:], (1, ayer))
+        Asistencia.objects.get(pk=anterior.pk).delete()
+        self.assertEqual(self.assertIgualAlRecalculado()[2:], (0, None))
+
+    def test_eliminar_cliente_no_recrea_su_resumen(self):
+        self.pago().validar_pago(self.admin)
+        Asistencia.objects.create(cliente=self.cliente, usuario_registro=self.admin)
+        self.cliente.delete()
+        self.assertFalse(ResumenCliente.objects.exists())
+
+
+class FechasInvalidasTest(TestCase):
+    """Los filtros de fecha mal formados no deben terminar en un 500"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.membresia, cls.cliente = crear_basicos()
+        Asistencia.objects.create(cliente=cls.cliente, usuario_registro=cls.admin)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get(self, nombre, parametros, **kwargs):
+        return self.client.get(reverse(nombre, kwargs=kwargs), parametros)
+
+    def test_cliente_asistencias_ignora_el_filtro(self):
+        respuesta = self.get(
+            'cliente_asistencias', {'fecha_desde': '2026-13-45', 'fecha_hasta': 'ayer'},
+            documento=self.cliente.documento,
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['total_asistencias'], 1)
+        self.assertIsNone(respuesta.context['fecha_desde'])
+
+    def test_estadisticas_json_responde_400(self):
+        respuesta = self.get(
+            'cliente_asistencias_estadisticas', {'fecha_desde': '19/10/2026'}, documento=self.cliente.documento,
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(respuesta.json()['success'])
+
+    def test_estadisticas_json_con_rango_valido(self):
+        hoy = timezone.localdate().isoformat()
+        respuesta = self.get(
+            'cliente_asistencias_estadisticas', {'fecha_desde': hoy, 'fecha_hasta': hoy},
+            documento=self.cliente.documento,
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['estadisticas']['total_asistencias'], 1)
+
+    def test_reporte_de_pagos_ignora_el_rango(self):
+        respuesta = self.get('pagos_reportes', {'fecha_inicio': '2026-02-30', 'fecha_fin': '2026-10-19'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['pagos_reporte'], [])
+        self.assertEqual(respuesta.context['fecha_inicio'], '')
+
+    def test_descargas_de_asistencias_vuelven_con_el_error(self):
+        for nombre in ('asistencias_exportar_excel', 'asistencias_exportar_pdf'):
+            with self.subTest(nombre):
+                respuesta = self.get(nombre, {'fecha_inicio': 'hoy', 'fecha_fin': '2026-10-19'})
+                self.assertRedirects(respuesta, reverse('asistencias_listar'), fetch_redirect_response=False)
+
+    def test_reporte_de_pagos_con_rango_valido(self):
+        Pago.objects.create(
+            cliente=self.cliente, membresia=self.membresia, concepto='Mensualidad', monto=Decimal('80000'),
+            metodo_pago='efectivo', estado='validado', usuario_registro=self.admin,
+        )
+        hoy = timezone.localdate().isoformat()
+        respuesta = self.get('pagos_reportes', {'fecha_inicio': hoy, 'fecha_fin': hoy})
+        self.assertEqual(len(respuesta.context['pagos_reporte']), 1)
+        self.assertEqual(respuesta.context['fecha_fin'], hoy)
+
+
+class RollupAsistenciasTest(TestCase):
+    """Los rollups incrementales deben coincidir con los recalculados desde las filas crudas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.membresia, cls.cliente = crear_basicos()
+        cls.otro = Cliente.objects.create(documento='10000002', nombres='Beto', apellidos='Prueba', celular='3000000001')
+        cls.norte, cls.sur = Sede.objects.bulk_create([Sede(nombre='Norte'), Sede(nombre='Sur')])
+
+    def rollups(self):
+        diarios = {
+            (f['sede_id'], f['fecha'], f['hora_bucket']): (f['total'], f['clientes_unicos'])
+            for f in AsistenciaDiaria.objects.filter(total__gt=0).values()
+        }
+        mensuales = {
+            (f['sede_id'], f['anio'], f['mes']): (f['total'], f['clientes_unicos'])
+            for f in AsistenciaMensual.objects.filter(total__gt=0).values()
+        }
+        return diarios, mensuales
+
+    def assertIgualAlCompactado(self):
+        incrementales = self.rollups()
+        hoy = timezone.localdate()
+        AsistenciaRollupDAO.compactar(hoy, hoy)
+        self.assertEqual(incrementales, self.rollups())
+
+    def registrar(self, cliente, sede):
+        return AsistenciaDAO.crear(cliente, self.admin, sede.id)
+
+    def test_creadas_y_eliminadas(self):
+        primera = self.registrar(self.cliente, self.norte)
+        self.registrar(self.cliente, self.norte)
+        self.registrar(self.cliente, self.sur)
+        otra = self.registrar(self.otro, self.norte)
+        self.assertIgualAlCompactado()
+        self.assertEqual(AsistenciaRollupDAO.contar_rango(primera.fecha, primera.fecha, self.norte.id), 3)
+
+        primera.delete()
+        self.assertIgualAlCompactado()
+        otra.delete()
+        self.assertIgualAlCompactado()
+        Asistencia.objects.filter(cliente=self.cliente).delete()
+        self.assertIgualAlCompactado()
+        self.assertEqual(self.rollups(), ({}, {}))
+
+    def test_fila_repetida_sin_sede_no_duplica_totales(self):
+        primera = AsistenciaDAO.crear(self.cliente, self.admin, None)
+        # Lo que deja una carrera en la primera inserción: la llave única no aplica con sede NULL.
+        diaria = AsistenciaDiaria.objects.get(sede=None)
+        AsistenciaDiaria.objects.create(sede=None, fecha=diaria.fecha, hora_bucket=diaria.hora_bucket, total=1, clientes_unicos=1)
+        AsistenciaMensual.objects.create(sede=None, anio=primera.fecha.year, mes=primera.fecha.month, total=1, clientes_unicos=1)
+        Asistencia.objects.bulk_create([Asistencia(cliente=self.otro, usuario_registro=self.admin, sede=None)])
+        self.assertEqual(AsistenciaDiaria.objects.filter(sede=None).count(), 2)
+
+        AsistenciaDAO.crear(self.cliente, self.admin, None)
+        AsistenciaDAO.crear(self.otro, self.admin, None)
+        primera.delete()
+
+        total = Asistencia.objects.count()
+        for modelo in (AsistenciaDiaria, AsistenciaMensual):
+            self.assertEqual(modelo.objects.aggregate(t=Sum('total'))['t'], total)
+            self.assertEqual(modelo.objects.aggregate(u=Sum('clientes_unicos'))['u'], 2)
+
+    def test_hora_promedio_con_minutos(self):
+        for hora in ('18:40', '18:55', '19:10'):
+            asistencia = self.registrar(self.cliente, self.norte)
+            Asistencia.objects.filter(pk=asistencia.pk).update(hora=hora)
+        estadisticas_cliente = AsistenciaDAO.obtener_estadisticas_cliente(self.cliente)
+        self.assertEqual(estadisticas_cliente['hora_promedio'], '18:55')
+
+    def test_archivo_conserva_los_totales(self):
+        for _ in range(3):
+            self.registrar(self.cliente, self.norte)
+        self.registrar(self.otro, self.sur)
+        hoy = timezone.localdate()
+        antes = particiones.sumar_meses(hoy, -2)
+        Asistencia.objects.filter(cliente=self.cliente).update(fecha=antes)
+        AsistenciaRollupDAO.compactar(antes, hoy)
+        rollups = self.rollups()
+
+        self.assertEqual(ArchivoDAO.archivar_asistencias(hoy.replace(day=1)), 3)
+
+        self.assertEqual(self.rollups(), rollups)
+        self.assertEqual(AsistenciaRollupDAO.contar_rango(antes, hoy), Asistencia.objects.count() + AsistenciaArchivada.objects.count())
+        self.assertEqual(AsistenciaRollupDAO.contar_rango(antes, antes, self.norte.id), 3)
+        self.assertEqual(AsistenciaRollupDAO.contar_total(), 4)
+
+
+class ArchivoTest(TestCase):
+    """Archivar mueve las filas por lotes sin tocar rollups ni resúmenes, y las lecturas por rango las siguen viendo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.membresia, cls.cliente = crear_basicos()
+        cls.hoy = timezone.localdate()
+        cls.corte = cls.hoy.replace(day=1)
+        cls.antes = particiones.sumar_meses(cls.hoy, -2)
+        for _ in range(5):
+            AsistenciaDAO.crear(cls.cliente, cls.admin)
+        # Tres asistencias y tres pagos quedan antes del corte
+        viejas = list(Asistencia.objects.order_by('id').values_list('id', flat=True)[:3])
+        Asistencia.objects.filter(id__in=viejas).update(fecha=cls.antes)
+        for estado in ('validado', 'validado', 'rechazado', 'pendiente', 'validado'):
+            Pago.objects.create(
+                cliente=cls.cliente, membresia=cls.membresia, concepto='Mensualidad', monto=Decimal('80000'),
+                metodo_pago='efectivo', estado=estado, usuario_registro=cls.admin,
+            )
+        viejos = list(Pago.objects.order_by('id').values_list('id', flat=True)[:4])
+        Pago.objects.filter(id__in=viejos).update(fecha_pago=F('fecha_pago') - timedelta(days=70))
+        AsistenciaRollupDAO.compactar(cls.antes, cls.hoy)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_archivar_por_lotes(self):
+        ids_asistencias = set(Asistencia.objects.values_list('id', flat=True))
+        total_antes = AsistenciaRollupDAO.contar_total()
+        rango_antes = AsistenciaRollupDAO.contar_rango(self.antes, self.hoy)
+        resumen = ResumenCliente.objects.values('total_pagado', 'total_pagos', 'total_asistencias').get(
+            cliente=self.cliente
+        )
+
+        self.assertEqual(ArchivoDAO.archivar_asistencias(self.corte, lote=2), 3)
+        # El pago pendiente sigue vivo aunque sea anterior al corte
+        self.assertEqual(ArchivoDAO.archivar_pagos(self.corte, lote=2), 3)
+
+        self.assertEqual((Asistencia.objects.count(), AsistenciaArchivada.objects.count()), (2, 3))
+        self.assertEqual((Pago.objects.count(), PagoArchivado.objects.count()), (2, 3))
+        self.assertFalse(Asistencia.objects.filter(fecha__lt=self.corte).exists())
+
+        # Lectura por rango: UNION ALL de la tabla viva y el archivo
+        union = ArchivoDAO.consulta('asistencias', lambda asistencias: asistencias.filter(
+            fecha__gte=self.antes, fecha__lte=self.hoy
+        ).values_list('id', flat=True), self.antes, self.hoy)
+        self.assertEqual(set(union), ids_asistencias)
+        self.assertEqual(AsistenciaDAO.obtener_reporte_rango(self.antes, self.hoy).count(), 5)
+        self.assertEqual(AsistenciaDAO.obtener_reporte_rango(self.antes, self.antes).count(), 3)
+        self.assertEqual(PagoDAO.obtener_reporte_fechas(self.antes - timedelta(days=31), self.hoy).count(), 3)
+
+        # Sin señales: ni los rollups ni el resumen del cliente descuentan lo archivado
+        self.assertEqual(AsistenciaRollupDAO.contar_total(), total_antes)
+        self.assertEqual(AsistenciaRollupDAO.contar_rango(self.antes, self.hoy), rango_antes)
+        self.assertEqual(
+            ResumenCliente.objects.values('total_pagado', 'total_pagos', 'total_asistencias').get(cliente=self.cliente),
+            resumen,
+        )
+
+
+class VisitantesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.membresia, cls.cliente = crear_basicos()
+        cls.norte, cls.sur = Sede.objects.bulk_create([Sede(nombre='Norte'), Sede(nombre='Sur')])
+        cls.otro = Cliente.objects.create(
+            documento='10000002', nombres='Beto', apellidos='Prueba', celular='3000000001', sede=cls.norte,
+        )
+
+    def unicos(self, sede=None):
+        hoy = timezone.localdate()
+        return VisitantesDAO.contar_unicos(hoy, hoy, sede_id=sede and sede.id)
+
+    def test_unicos_por_sede_de_entrada(self):
+        # El cliente de la sede Norte entra en la Sur: cuenta como visitante de la Sur
+        AsistenciaDAO.crear(self.otro, self.admin, self.sur.id)
+        AsistenciaDAO.crear(self.cliente, self.admin, self.norte.id)
+        AsistenciaDAO.crear(self.cliente, self.admin, self.sur.id)
+        self.assertEqual((self.unicos(), self.unicos(self.norte), self.unicos(self.sur)), (2, 1, 2))
+
+        hoy = timezone.localdate()
+        VisitantesDAO.reconstruir(hoy, hoy)
+        self.assertEqual((self.unicos(), self.unicos(self.norte), self.unicos(self.sur)), (2, 1, 2))
+
+    def test_listado_cuenta_los_que_entraron_a_la_sede(self):
+        AsistenciaDAO.crear(self.otro, self.admin, self.sur.id)
+        self.client.force_login(self.admin)
+        sesion = self.client.session
+        sesion[SESION_SEDE] = self.sur.id
+        sesion.save()
+        respuesta = self.client.get(reverse('asistencias_listar'))
+        # Beto es de la sede Norte, pero entró a la Sur
+        self.assertEqual(respuesta.context['clientes_unicos'], 1)
+
+    def test_eliminar_la_unica_visita_apaga_el_bit(self):
+        primera = AsistenciaDAO.crear(self.cliente, self.admin, self.norte.id)
+        segunda = AsistenciaDAO.crear(self.cliente, self.admin, self.norte.id)
+        primera.delete()
+        self.assertEqual(self.unicos(self.norte), 1)
+        segunda.delete()
+        self.assertEqual(self.unicos(self.norte), 0)
+
+
+class CatalogoMembresiasTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.mensual = Membresia.objects.create(nombre='Mensual', duracion_dias=30, precio=Decimal('80000'))
+
+    def setUp(self):
+        cache.clear()
+        CatalogoMembresias.nueva_peticion()
+
+    def test_invalida_al_confirmar(self):
+        CatalogoMembresias.todas()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Membresia.objects.create(nombre='Anual', duracion_dias=365, precio=Decimal('750000'))
+            # Sin confirmar, el catálogo sigue siendo el anterior
+            self.assertEqual([m.nombre for m in CatalogoMembresias.todas()], ['Mensual'])
+        self.assertTrue(callbacks)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual({m.nombre for m in CatalogoMembresias.todas()}, {'Mensual', 'Anual'})
+
+    def test_cache_vaciado_no_reutiliza_la_version(self):
+        CatalogoMembresias.todas()
+        cache.clear()
+        Membresia.objects.filter(pk=self.mensual.pk).update(nombre='Mensual Plus')
+        CatalogoMembresias.nueva_peticion()
+        self.assertEqual(CatalogoMembresias.obtener(self.mensual.pk).nombre, 'Mensual Plus')
+
+    def test_entrega_instancias_nuevas(self):
+        primera = CatalogoMembresias.obtener(self.mensual.pk)
+        segunda = CatalogoMembresias.obtener(self.mensual.pk)
+        self.assertIsNot(primera, segunda)
+        self.assertIsNot(primera._state, segunda._state)
+        self.assertFalse(primera._state.adding)
+
+        primera.nombre = 'Cambiada'
+        self.assertEqual(CatalogoMembresias.obtener(self.mensual.pk).nombre, 'Mensual')
+        self.assertEqual(CatalogoMembresias.activas()[0], self.mensual)
+
+
+class EstadisticasTest(TestCase):
+    """Los agregados consolidados dan lo mismo que un COUNT o SUM por filtro sobre tabla viva y archivo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.membresia, _ = crear_basicos()
+        Usuario.objects.create_user('empleado@fittech.test', 'clave', nombre='Empleado', rol='empleado')
+        hoy = timezone.localdate()
+        estados = ['activo', 'activo', 'activo', 'inactivo', 'pendiente']
+        vencimientos = [hoy + timedelta(days=3), hoy - timedelta(days=2), hoy + timedelta(days=30), hoy, None]
+        clientes = [
+            Cliente.objects.create(
+                documento=f'2000000{i}', nombres='Cliente', apellidos=str(i), celular='3000000000',
+                membresia_actual=cls.membresia, estado=estado, fecha_fin_membresia=fin,
+            )
+            for i, (estado, fin) in enumerate(zip(estados, vencimientos))
+        ]
+        # (estado, método, tipo, monto, días atrás): los de más de un mes van al archivo
+        pagos = [
+            ('validado', 'efectivo', 'membresia', '80000', 0),
+            ('validado', 'nequi', 'renovacion', '50000', 0),
+            ('pendiente', 'efectivo', 'membresia', '80000', 0),
+            ('rechazado', 'tarjeta', 'membresia', '30000', 0),
+            ('validado', 'transferencia', 'membresia', '80000', 40),
+            ('validado', 'efectivo', 'renovacion', '60000', 70),
+            ('rechazado', 'nequi', 'membresia', '20000', 40),
+            ('pendiente', 'tarjeta', 'membresia', '10000', 70),
+        ]
+        for i, (estado, metodo, tipo, monto, dias) in enumerate(pagos):
+            pago = Pago.objects.create(
+                cliente=clientes[i % len(clientes)], membresia=cls.membresia, concepto='Mensualidad',
+                monto=Decimal(monto), metodo_pago=metodo, tipo_pago=tipo, estado=estado,
+                usuario_registro=cls.admin,
+            )
+            if dias:
+                Pago.objects.filter(pk=pago.pk).update(fecha_pago=F('fecha_pago') - timedelta(days=dias))
+        cls.archivados = ArchivoDAO.archivar_pagos(hoy.replace(day=1))
+
+    def setUp(self):
+        cache.clear()
+        CatalogoMembresias.nueva_peticion()
+
+    def contar(self, **filtros):
+        return sum(modelo.objects.filter(**filtros).count() for modelo in (Pago, PagoArchivado))
+
+    def sumar(self, **filtros):
+        return sum(
+            modelo.objects.filter(**filtros).aggregate(Sum('monto'))['monto__sum'] or 0
+            for modelo in (Pago, PagoArchivado)
+        )
+
+    def test_pagos_vivos_y_archivados(self):
+        self.assertEqual(self.archivados, 3)
+        self.assertEqual(PagoArchivado.objects.count(), 3)
+
+        stats = estadisticas.estadisticas_pagos()
+        ahora = timezone.localtime()
+        inicio_dia = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
+        manana = inicio_dia + timedelta(days=1)
+        self.assertEqual(stats['pagos_registrados'], Pago.objects.count() + PagoArchivado.objects.count())
+        self.assertEqual(stats['total_pagos'], self.contar(estado='validado'))
+        self.assertEqual(stats['total_ingresos'], float(self.sumar(estado='validado')))
+        self.assertEqual(stats['pagos_pendientes'], self.contar(estado='pendiente'))
+        self.assertEqual(stats['pagos_rechazados'], self.contar(estado='rechazado'))
+        hoy = Pago.objects.filter(estado='validado', fecha_pago__gte=inicio_dia, fecha_pago__lt=manana)
+        self.assertEqual(stats['pagos_hoy'], hoy.count())
+        self.assertEqual(stats['ingresos_hoy'], float(hoy.aggregate(Sum('monto'))['monto__sum'] or 0))
+        mes = Pago.objects.filter(estado='validado', fecha_pago__gte=inicio_dia.replace(day=1), fecha_pago__lt=manana)
+        self.assertEqual(stats['pagos_mes'], mes.count())
+        self.assertEqual(stats['ingresos_mes'], float(mes.aggregate(Sum('monto'))['monto__sum'] or 0))
+        grupos = (
+            ('metodo_pago', 'pagos_por_metodo', Pago.METODOS_PAGO),
+            ('tipo_pago', 'pagos_por_tipo', Pago.TIPOS_PAGO),
+        )
+        for campo, clave, opciones in grupos:
+            esperado = {
+                valor: (self.contar(estado='validado', **{campo: valor}), self.sumar(estado='validado', **{campo: valor}))
+                for valor, _ in opciones
+            }
+            self.assertEqual(
+                {grupo[campo]: (grupo['total'], grupo['monto_total']) for grupo in stats[clave]},
+                {valor: cuenta for valor, cuenta in esperado.items() if cuenta[0]},
+            )
+
+    def test_comparacion_entre_sedes_suma_los_totales(self):
+        norte = Sede.objects.create(nombre='Norte')
+        Cliente.objects.filter(documento__in=['20000000', '20000003']).update(sede=norte)
+        Pago.objects.filter(cliente__sede=norte).update(sede=norte)
+        filas = estadisticas.estadisticas_por_sede()
+        self.assertEqual([fila['sede'] for fila in filas], ['Norte', 'Sin sede'])
+
+        clientes = estadisticas.estadisticas_clientes()
+        pagos = estadisticas.estadisticas_pagos()
+        self.assertEqual(sum(fila['total_clientes'] for fila in filas), clientes['total_clientes'])
+        self.assertEqual(sum(fila['clientes_activos'] for fila in filas), clientes['clientes_activos'])
+        self.assertEqual(sum(fila['pagos_pendientes'] for fila in filas), pagos['pagos_pendientes'])
+        self.assertEqual(sum(fila['ingresos_hoy'] for fila in filas), pagos['ingresos_hoy'])
+        self.assertEqual(sum(fila['ingresos_mes'] for fila in filas), pagos['ingresos_mes'])
+        self.assertEqual(estadisticas.estadisticas_clientes(sede_id=norte.id)['total_clientes'], 2)
+
+    def test_clientes_y_usuarios(self):
+        hoy = timezone.localdate()
+        self.assertEqual(estadisticas.estadisticas_clientes(), {
+            'total_clientes': Cliente.objects.count(),
+            'clientes_activos': Cliente.objects.filter(estado='activo').count(),
+            'clientes_inactivos': Cliente.objects.filter(estado='inactivo').count(),
+            'clientes_pendientes': Cliente.objects.filter(estado='pendiente').count(),
+            'clientes_por_vencer': Cliente.objects.filter(
+                estado='activo', fecha_fin_membresia__gte=hoy, fecha_fin_membresia__lte=hoy + timedelta(days=7)
+            ).count(),
+            'clientes_vencidos': Cliente.objects.filter(estado='activo', fecha_fin_membresia__lt=hoy).count(),
+        })
+        self.assertEqual(estadisticas.estadisticas_usuarios(), {
+            'total_usuarios': Usuario.objects.count(),
+            'administradores': Usuario.objects.filter(rol='administrador').count(),
+            'empleados': Usuario.objects.filter(rol='empleado').count(),
+        })
+
+
+class MetricasTest(TestCase):
+    def muestra(self, segundos):
+        return {'duracion_segundos': segundos, 'db_segundos': 0, 'consultas': 1, 'respuesta_bytes': 10}
+
+    def serie(self, texto, prefijo):
+        return {
+            linea.rsplit(' ', 1)[0]: float(linea.rsplit(' ', 1)[1])
+            for linea in texto.splitlines() if linea.startswith(prefijo)
+        }
+
+    def test_histograma_acumulado_no_baja_con_la_ventana(self):
+        registro = RegistroMetricas(ventana=2)
+        for segundos in (0.005, 3, 3):
+            registro.registrar('dashboard', self.muestra(segundos))
+        antes = self.serie(registro.exportar_prometheus(), 'fittech_duracion_segundos_bucket')
+
+        # La muestra rápida ya salió de la ventana, pero sigue en el histograma
+        self.assertEqual(antes['fittech_duracion_segundos_bucket{vista="dashboard",le="0.01"}'], 1)
+        self.assertEqual(antes['fittech_duracion_segundos_bucket{vista="dashboard",le="+Inf"}'], 3)
+
+        registro.registrar('dashboard', self.muestra(3))
+        texto = registro.exportar_prometheus()
+        despues = self.serie(texto, 'fittech_duracion_segundos_bucket')
+        self.assertTrue(all(despues[serie] >= valor for serie, valor in antes.items()))
+        ventana = self.serie(texto, 'fittech_duracion_segundos_ventana')
+        self.assertEqual(ventana['fittech_duracion_segundos_ventana{vista="dashboard",quantile="0.5"}'], 3)
+        self.assertIn('# TYPE fittech_duracion_segundos_ventana gauge', texto)
+
+    def test_token_de_metricas(self):
+        url = reverse('metricas')
+        with self.settings(METRICAS_TOKEN='secreto'):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+            self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_mide_el_middleware_de_sesion(self):
+        self.assertEqual(settings.MIDDLEWARE[0], 'gestion.middleware.MetricasMiddleware')